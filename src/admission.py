@@ -0,0 +1,280 @@
+"""
+Process-wide admission control for generation work.
+
+Every pipeline stage that is expensive for the box or the provider (LLM calls,
+static analyzer processes, dynamic analysis) passes through a StageGate. A gate
+admits at most ``limit`` operations at once; the others wait in a FairQueue that
+serves sessions round robin, FIFO within a session, so one user queuing many
+requests does not starve the others. Overload turns into queueing with a
+predictable wait instead of every request slowing down together.
+
+Gates record their queue depth and wait times; ``get_admission_controller().snapshot()``
+exposes them. Caps default to DEFAULT_STAGE_LIMITS and can be overridden with the
+ADMISSION_LLM_LIMIT, ADMISSION_STATIC_LIMIT and ADMISSION_DYNAMIC_LIMIT environment
+variables.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from src.cancellation import CancellationToken, OperationCancelled
+from src.instrumentation import STAGE_ADMISSION_WAIT, observe
+
+STAGE_LLM = "llm"
+STAGE_STATIC = "static"
+STAGE_DYNAMIC = "dynamic"
+# Whole pipelines waiting for a job worker (see src/jobs.py)
+STAGE_JOBS = "jobs"
+STAGE_LABELS = {
+    STAGE_JOBS: "Generation jobs",
+    STAGE_LLM: "LLM",
+    STAGE_STATIC: "Static analysis",
+    STAGE_DYNAMIC: "Dynamic analysis",
+}
+
+# Analyzer processes are CPU-bound; LLM calls mostly wait on the network
+DEFAULT_STAGE_LIMITS: Dict[str, int] = {
+    STAGE_LLM: 8,
+    STAGE_STATIC: os.cpu_count() or 1,
+    STAGE_DYNAMIC: os.cpu_count() or 1,
+}
+# Operations allowed to wait at one gate; beyond that they are rejected
+DEFAULT_MAX_QUEUE = 256
+# Recent waits kept for the mean wait time
+WAIT_SAMPLES = 100
+
+DEFAULT_SESSION = "default"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a queue is full and the work cannot even wait for a slot."""
+
+
+class FairQueue:
+    """
+    Bounded queue served round robin across sessions, FIFO within a session.
+
+    Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size
+        self._queues: "OrderedDict[str, Deque[Any]]" = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def full(self) -> bool:
+        return self.max_size is not None and self._size >= self.max_size
+
+    def push(self, session_id: str, item: Any) -> None:
+        """Queue an item behind the other items of its session; raises AdmissionRejected if full."""
+        if self.full:
+            raise AdmissionRejected(f"queue full ({self._size} waiting)")
+        queue = self._queues.get(session_id)
+        if queue is None:
+            queue = self._queues[session_id] = deque()
+        queue.append(item)
+        self._size += 1
+
+    def pop(self) -> Any:
+        """Take the next item of the session whose turn it is; raises IndexError if empty."""
+        if not self._queues:
+            raise IndexError("pop from an empty FairQueue")
+        session_id, queue = next(iter(self._queues.items()))
+        item = queue.popleft()
+        self._size -= 1
+        # The session goes to the back of the round, or leaves it if it has nothing left
+        del self._queues[session_id]
+        if queue:
+            self._queues[session_id] = queue
+        return item
+
+    def remove(self, session_id: str, item: Any) -> bool:
+        """Remove a queued item; returns False if it is not queued."""
+        queue = self._queues.get(session_id)
+        if queue is None or item not in queue:
+            return False
+        queue.remove(item)
+        self._size -= 1
+        if not queue:
+            del self._queues[session_id]
+        return True
+
+    def depth_by_session(self) -> Dict[str, int]:
+        return {session_id: len(queue) for session_id, queue in self._queues.items()}
+
+
+class WaitStats:
+    """Admission counts and queue wait times of a gate. Not thread-safe."""
+
+    def __init__(self, samples: int = WAIT_SAMPLES):
+        self.admitted = 0
+        self.rejected = 0
+        self.max_wait = 0.0
+        self._recent: Deque[float] = deque(maxlen=samples)
+
+    def record(self, wait: float) -> None:
+        self.admitted += 1
+        self.max_wait = max(self.max_wait, wait)
+        self._recent.append(wait)
+
+    @property
+    def mean_wait(self) -> float:
+        """Mean of the recent waits, in seconds."""
+        return sum(self._recent) / len(self._recent) if self._recent else 0.0
+
+
+@dataclass
+class StageStats:
+    """Load of one stage at a point in time."""
+    stage: str
+    limit: int
+    active: int
+    queued: int
+    queued_by_session: Dict[str, int] = field(default_factory=dict)
+    admitted: int = 0
+    rejected: int = 0
+    mean_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def describe(self) -> str:
+        label = STAGE_LABELS.get(self.stage, self.stage)
+        sessions = f" from {len(self.queued_by_session)} session(s)" if self.queued else ""
+        return (
+            f"{label}: {self.active}/{self.limit} running, {self.queued} queued{sessions}, "
+            f"mean wait {self.mean_wait:.1f}s (max {self.max_wait:.1f}s)"
+        )
+
+
+class _Waiter:
+    """An operation waiting for a slot; the releasing thread hands it over."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.queued_at = time.monotonic()
+
+
+class StageGate:
+    """Caps the concurrent operations of one stage; waiting operations are served fairly."""
+
+    def __init__(self, stage: str, limit: int, max_queue: Optional[int] = DEFAULT_MAX_QUEUE):
+        self.stage = stage
+        self.limit = max(1, limit)
+        self._active = 0
+        self._waiting = FairQueue(max_queue)
+        self._stats = WaitStats()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(
+        self,
+        session_id: str = DEFAULT_SESSION,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[float]:
+        """
+        Hold a slot of the stage for the duration of the block.
+
+        Yields:
+            Seconds spent waiting for the slot
+
+        Raises:
+            AdmissionRejected: The wait queue is full
+            OperationCancelled: The token was cancelled while waiting
+        """
+        wait = self._acquire(session_id, cancel_token)
+        try:
+            yield wait
+        finally:
+            self._release()
+
+    def _acquire(self, session_id: str, cancel_token: Optional[CancellationToken]) -> float:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        with self._lock:
+            if self._active < self.limit and not self._waiting:
+                self._active += 1
+                self._stats.record(0.0)
+                observe(STAGE_ADMISSION_WAIT, 0.0, gate=self.stage)
+                return 0.0
+            waiter = _Waiter()
+            try:
+                self._waiting.push(session_id, waiter)
+            except AdmissionRejected as e:
+                self._stats.rejected += 1
+                raise AdmissionRejected(f"{STAGE_LABELS.get(self.stage, self.stage)} {e}") from None
+
+        label = f"Waiting for a {STAGE_LABELS.get(self.stage, self.stage)} slot"
+        with cancel_token.on_cancel(label, waiter.event.set) if cancel_token is not None else nullcontext():
+            waiter.event.wait()
+
+        with self._lock:
+            if not waiter.granted:
+                self._waiting.remove(session_id, waiter)
+                raise OperationCancelled(cancel_token.reason if cancel_token is not None else "cancelled")
+            wait = time.monotonic() - waiter.queued_at
+            self._stats.record(wait)
+        observe(STAGE_ADMISSION_WAIT, wait, gate=self.stage)
+        return wait
+
+    def _release(self) -> None:
+        with self._lock:
+            if self._waiting:
+                # Hand the slot over directly so a newcomer cannot take it first
+                waiter = self._waiting.pop()
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._active -= 1
+
+    def stats(self) -> StageStats:
+        with self._lock:
+            return StageStats(
+                self.stage, self.limit, self._active, len(self._waiting),
+                self._waiting.depth_by_session(), self._stats.admitted, self._stats.rejected,
+                self._stats.mean_wait, self._stats.max_wait
+            )
+
+
+class AdmissionController:
+    """The gates of every stage, shared by all sessions of the process."""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, max_queue: Optional[int] = DEFAULT_MAX_QUEUE):
+        limits = {**DEFAULT_STAGE_LIMITS, **(limits or {})}
+        self.gates = {stage: StageGate(stage, limit, max_queue) for stage, limit in limits.items()}
+
+    def admit(
+        self,
+        stage: str,
+        session_id: str = DEFAULT_SESSION,
+        cancel_token: Optional[CancellationToken] = None
+    ):
+        """Context manager holding a slot of ``stage`` (see StageGate.admit)."""
+        return self.gates[stage].admit(session_id or DEFAULT_SESSION, cancel_token)
+
+    def snapshot(self) -> List[StageStats]:
+        """Queue depth, active operations and wait times of every stage."""
+        return [gate.stats() for gate in self.gates.values()]
+
+
+def _limits_from_env() -> Dict[str, int]:
+    return {
+        stage: int(os.getenv(f"ADMISSION_{stage.upper()}_LIMIT", limit))
+        for stage, limit in DEFAULT_STAGE_LIMITS.items()
+    }
+
+
+_default_controller = AdmissionController(_limits_from_env())
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the admission controller shared by every session of the process."""
+    return _default_controller
@@ -5,13 +5,17 @@ This module provides a wrapper around the CodeAct functionality to integrate it
 with the dynamic analysis framework.
 """
 
+import ast
 import asyncio
+import json
 import sys
 import os
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
+from dataclasses import dataclass, field
 import time
+import threading
 import traceback
+from collections import OrderedDict
 
 # Add project root to path for imports
 _current_file_directory = os.path.dirname(os.path.abspath(__file__))
@@ -20,6 +24,10 @@ _project_root = os.path.abspath(os.path.join(_current_file_directory, '..', '..'
 if _project_root not in sys.path:
     sys.path.insert(0, _project_root)
 
+from src.cancellation import CancellationToken, OperationCancelled, await_cancellable
+from src.code_artifact import CodeArtifact, as_code_artifact
+from src.llm_client_pool import aclose_loop_http_client
+
 try:
     from src.analysis.dynamic_analyzer.codeact import (
         model, sandbox, eval_fn, code_act, agent, create_pyodide_eval_fn
@@ -46,6 +54,111 @@ class ExecutionResult:
     imports_used: List[str]
     functions_defined: List[str]
     security_issues: List[str]
+    segment: str = "main"
+    profile: Optional[Dict[str, Any]] = None
+
+
+# Marker prefixing the JSON profile line printed by the profiling harness
+PROFILE_MARKER = "__CODEACT_PROFILE__"
+
+# Thresholds above which profiled code is reported back as a performance issue
+PROFILE_SLOW_FUNCTION_SECONDS = 0.5
+PROFILE_PEAK_MEMORY_BYTES = 100 * 1024 * 1024
+
+# Runs inside the sandbox. Every name is underscore-prefixed so the eval wrapper
+# does not report harness internals as variables of the generated code.
+_PROFILING_HARNESS = """
+import json as _json
+import time as _time
+_profile = {"cpu_time": None, "peak_memory_bytes": None, "hot_functions": [], "allocation_sites": [], "errors": []}
+try:
+    import cProfile as _cprofile
+    import pstats as _pstats
+    _profiler = _cprofile.Profile()
+except Exception as _exc:
+    _profiler = None
+    _profile["errors"].append("cProfile unavailable: " + str(_exc))
+try:
+    import tracemalloc as _tracemalloc
+    _tracemalloc.start()
+except Exception as _exc:
+    _tracemalloc = None
+    _profile["errors"].append("tracemalloc unavailable: " + str(_exc))
+_namespace = {"__name__": "__main__"}
+_start = _time.process_time()
+if _profiler is not None:
+    _profiler.enable()
+try:
+    exec(compile(__SOURCE__, "<generated>", "exec"), _namespace)
+finally:
+    if _profiler is not None:
+        _profiler.disable()
+    _profile["cpu_time"] = round(_time.process_time() - _start, 6)
+    if _tracemalloc is not None:
+        _profile["peak_memory_bytes"] = _tracemalloc.get_traced_memory()[1]
+        _snapshot = _tracemalloc.take_snapshot().filter_traces([_tracemalloc.Filter(True, "<generated>")])
+        _tracemalloc.stop()
+        for _stat in _snapshot.statistics("lineno")[:__TOP_N__]:
+            _profile["allocation_sites"].append({"line": _stat.traceback[0].lineno, "size_bytes": _stat.size, "count": _stat.count})
+    if _profiler is not None:
+        _skip = ("<built-in method builtins.exec>", "<built-in method builtins.compile>", "<method 'disable' of '_lsprof.Profiler' objects>")
+        _rows = [(_key, _value) for _key, _value in _pstats.Stats(_profiler).stats.items() if _key[2] not in _skip]
+        _rows.sort(key=lambda _row: _row[1][2], reverse=True)
+        for (_file, _line, _func), (_cc, _nc, _tt, _ct, _callers) in _rows[:__TOP_N__]:
+            _profile["hot_functions"].append({"function": _func, "file": _file, "line": _line, "calls": _nc, "self_time": round(_tt, 6), "cumulative_time": round(_ct, 6)})
+    print("__MARKER__" + _json.dumps(_profile))
+"""
+
+
+def build_profiling_harness(code: str, top_n: int = 10) -> str:
+    """
+    Wrap code so it runs under cProfile and tracemalloc inside the sandbox.
+
+    The harness prints the collected profile as a single JSON line prefixed with
+    PROFILE_MARKER, which parse_profile_output strips from the captured stdout.
+    Variables of the profiled code live in a private namespace and are not reported.
+
+    Args:
+        code: Python code to profile
+        top_n: Number of hot functions and allocation sites to keep
+
+    Returns:
+        Python source of the profiling harness
+    """
+    return (
+        _PROFILING_HARNESS
+        .replace("__SOURCE__", repr(code))
+        .replace("__TOP_N__", str(int(top_n)))
+        .replace("__MARKER__", PROFILE_MARKER)
+    )
+
+
+def parse_profile_output(output: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Separate the profile emitted by the profiling harness from the program output.
+
+    Returns:
+        Tuple of (output without the profile line, profile dictionary or None)
+    """
+    profile = None
+    kept_lines = []
+    for line in output.split('\n'):
+        if line.startswith(PROFILE_MARKER):
+            try:
+                profile = json.loads(line[len(PROFILE_MARKER):])
+            except json.JSONDecodeError:
+                profile = {"errors": ["Profile output could not be parsed"]}
+        else:
+            kept_lines.append(line)
+    return '\n'.join(kept_lines), profile
+
+
+@dataclass
+class CodeSegment:
+    """A group of top-level statements that must be executed together, in order."""
+    name: str
+    code: str
+    statement_lines: List[Tuple[int, int]] = field(default_factory=list)
 
 
 @dataclass
@@ -58,46 +171,425 @@ class AnalysisResult:
     execution_results: List[ExecutionResult]
 
 
-def extract_imports_and_functions(code: str) -> tuple[List[str], List[str]]:
-    """Extract imports and function definitions from code."""
-    imports = []
-    functions = []
-    
-    lines = code.split('\n')
-    for line in lines:
-        stripped = line.strip()
-        if stripped.startswith('import ') or stripped.startswith('from '):
-            imports.append(stripped)
-        elif stripped.startswith('def '):
-            func_name = stripped.split('(')[0].replace('def ', '').strip()
-            functions.append(func_name)
-    
+# Calls reported by detect_security_issues, by fully qualified name
+DANGEROUS_FUNCTIONS = ('eval', 'exec', 'compile', '__import__')
+DANGEROUS_MODULE_FUNCTIONS = ('os.system', 'subprocess.call', 'subprocess.run')
+USER_INPUT_FUNCTIONS = ('input',)
+
+# Number of analyzed sources kept by code_facts
+CODE_FACTS_CACHE_SIZE = 256
+
+
+@dataclass
+class ImportInfo:
+    """One name bound by an import statement."""
+    module: str
+    name: Optional[str]
+    alias: Optional[str]
+    line: int
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.module}.{self.name}" if self.name else self.module
+
+    @property
+    def bound_name(self) -> str:
+        """The name the import binds in the importing scope."""
+        if self.alias:
+            return self.alias
+        return self.name if self.name else self.module.split('.')[0]
+
+
+@dataclass
+class DefinitionInfo:
+    """A function, method or class definition, with its qualified name."""
+    name: str
+    kind: str  # "function", "async function", "method", "async method" or "class"
+    line: int
+
+
+@dataclass
+class CallSite:
+    """A call of a function, resolved through the imports to its qualified name."""
+    name: str
+    line: int
+
+
+@dataclass
+class CodeFacts:
+    """Imports, definitions and calls of interest found in one source."""
+    imports: List[ImportInfo] = field(default_factory=list)
+    definitions: List[DefinitionInfo] = field(default_factory=list)
+    dangerous_calls: List[CallSite] = field(default_factory=list)
+    input_calls: List[CallSite] = field(default_factory=list)
+    parsed: bool = True
+
+
+class _CodeFactsVisitor(ast.NodeVisitor):
+    """Collects CodeFacts in a single pass over the AST."""
+
+    def __init__(self):
+        self.facts = CodeFacts()
+        self._scope: List[Tuple[str, bool]] = []  # (name, is_class)
+        self._aliases: Dict[str, str] = {}
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            info = ImportInfo(alias.name, None, alias.asname, node.lineno)
+            self.facts.imports.append(info)
+            self._aliases[info.bound_name] = alias.name if alias.asname else info.bound_name
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        module = "." * node.level + (node.module or "")
+        for alias in node.names:
+            info = ImportInfo(module, alias.name, alias.asname, node.lineno)
+            self.facts.imports.append(info)
+            if alias.name != '*':
+                self._aliases[info.bound_name] = info.qualified_name
+
+    def _visit_definition(self, node: ast.AST, kind: str) -> None:
+        in_class = bool(self._scope) and self._scope[-1][1]
+        if kind != "class" and in_class:
+            kind = kind.replace("function", "method")
+        name = ".".join([scope for scope, _ in self._scope] + [node.name])
+        self.facts.definitions.append(DefinitionInfo(name, kind, node.lineno))
+        self._scope.append((node.name, kind == "class"))
+        self.generic_visit(node)
+        self._scope.pop()
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self._visit_definition(node, "function")
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
+        self._visit_definition(node, "async function")
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._visit_definition(node, "class")
+
+    def _qualified_name(self, node: ast.AST) -> Optional[str]:
+        """Dotted name of a called expression (``sp.run`` -> ``subprocess.run``), if it has one."""
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return None
+        parts.append(self._aliases.get(node.id, node.id))
+        name = ".".join(reversed(parts))
+        return name[len("builtins."):] if name.startswith("builtins.") else name
+
+    def visit_Call(self, node: ast.Call) -> None:
+        name = self._qualified_name(node.func)
+        if name in DANGEROUS_FUNCTIONS or name in DANGEROUS_MODULE_FUNCTIONS:
+            self.facts.dangerous_calls.append(CallSite(name, node.lineno))
+        elif name in USER_INPUT_FUNCTIONS:
+            self.facts.input_calls.append(CallSite(name, node.lineno))
+        self.generic_visit(node)
+
+
+_code_facts_cache: "OrderedDict[str, CodeFacts]" = OrderedDict()
+_code_facts_lock = threading.Lock()
+
+
+def code_facts(code: Union[str, CodeArtifact]) -> CodeFacts:
+    """
+    Collect the imports, definitions and dangerous call sites of code.
+
+    The AST is visited once per distinct source: results are memoized by content
+    hash, so the same code analyzed again (another segment run, a retry that
+    returns unchanged code) costs a dictionary lookup.
+
+    Returns:
+        CodeFacts; ``parsed`` is False (and the tables empty) if the code does not parse
+    """
+    artifact = as_code_artifact(code)
+    key = artifact.content_hash
+    with _code_facts_lock:
+        facts = _code_facts_cache.get(key)
+        if facts is not None:
+            _code_facts_cache.move_to_end(key)
+            return facts
+
+    if artifact.tree is None:
+        facts = CodeFacts(parsed=False)
+    else:
+        visitor = _CodeFactsVisitor()
+        visitor.visit(artifact.tree)
+        facts = visitor.facts
+
+    with _code_facts_lock:
+        _code_facts_cache[key] = facts
+        while len(_code_facts_cache) > CODE_FACTS_CACHE_SIZE:
+            _code_facts_cache.popitem(last=False)
+    return facts
+
+
+def extract_imports_and_functions(code: Union[str, CodeArtifact]) -> tuple[List[str], List[str]]:
+    """
+    Extract imported names and function definitions from code.
+
+    Imports are fully qualified (``os.path``, ``sys.argv``), multi-line imports
+    included; functions include methods (``Class.method``), nested and async
+    functions.
+    """
+    facts = code_facts(code)
+    imports = [info.qualified_name for info in facts.imports]
+    functions = [definition.name for definition in facts.definitions if definition.kind != "class"]
     return imports, functions
 
 
-def detect_security_issues(code: str) -> List[str]:
-    """Detect potential security issues in code."""
+def detect_security_issues(code: Union[str, CodeArtifact]) -> List[str]:
+    """
+    Detect potential security issues in code.
+
+    Only real call sites are reported, with their line, resolved through import
+    aliases (``from os import system as run_cmd`` still reports ``os.system``).
+    Code that does not parse falls back to matching identifiers.
+    """
+    artifact = as_code_artifact(code)
+    facts = code_facts(artifact)
     issues = []
     
-    dangerous_functions = ['eval', 'exec', 'compile', '__import__']
-    dangerous_modules = ['os.system', 'subprocess.call', 'subprocess.run']
-    
-    for func in dangerous_functions:
-        if func in code:
-            issues.append(f"Dangerous function '{func}' detected")
+    if not facts.parsed:
+        names = artifact.names
+        issues.extend(f"Dangerous function '{func}' detected" for func in DANGEROUS_FUNCTIONS if func in names)
+        issues.extend(
+            f"Potentially dangerous module usage '{module}' detected"
+            for module in DANGEROUS_MODULE_FUNCTIONS if module in names
+        )
+        if any(func in names for func in USER_INPUT_FUNCTIONS):
+            issues.append("User input detected - ensure proper validation")
+        return issues
     
-    for module in dangerous_modules:
-        if module in code:
-            issues.append(f"Potentially dangerous module usage '{module}' detected")
+    for call in facts.dangerous_calls:
+        if call.name in DANGEROUS_FUNCTIONS:
+            issues.append(f"Dangerous function '{call.name}' called at line {call.line}")
+        else:
+            issues.append(f"Potentially dangerous module usage '{call.name}' at line {call.line}")
     
-    if 'input(' in code:
-        issues.append("User input detected - ensure proper validation")
+    if facts.input_calls:
+        lines = ", ".join(str(call.line) for call in facts.input_calls)
+        issues.append(f"User input detected at line(s) {lines} - ensure proper validation")
     
     return issues
 
 
-async def execute_code_with_codeact(code: str) -> ExecutionResult:
-    """Execute code using CodeAct and return execution results."""
+def _statement_names(node: ast.stmt) -> Tuple[Set[str], Set[str]]:
+    """
+    Return the module-level names a top-level statement defines and the names it reads.
+
+    Function and class bodies are only scanned for reads (plus ``global``
+    declarations), since their local assignments never reach module scope.
+    Over-approximating reads is safe: it can only merge segments, never split
+    statements that share state.
+    """
+    defined: Set[str] = set()
+    used: Set[str] = set()
+
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        defined.add(node.name)
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+                used.add(child.id)
+            elif isinstance(child, ast.Global):
+                defined.update(child.names)
+                used.update(child.names)
+        return defined, used
+
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        for alias in node.names:
+            defined.add(alias.asname or alias.name.split('.')[0])
+        return defined, used
+
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            if isinstance(child.ctx, ast.Load):
+                used.add(child.id)
+            else:
+                defined.add(child.id)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            defined.add(child.name)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            for alias in child.names:
+                defined.add(alias.asname or alias.name.split('.')[0])
+    return defined, used
+
+
+_EFFECT_NODES = (ast.Call, ast.Await, ast.Yield, ast.YieldFrom)
+_EFFECT_STATEMENTS = (ast.Expr, ast.Raise, ast.Assert, ast.Delete, ast.Global, ast.Nonlocal)
+
+
+def _has_side_effects(node: ast.stmt) -> bool:
+    """
+    Return whether a top-level statement may act on state no name tracks.
+
+    Any call can print, seed a random generator, change directory or write a
+    file, so every statement that calls something (or is a bare expression) is
+    assumed to. Definitions and imports are not: their bodies only run when called.
+    """
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Import, ast.ImportFrom)):
+        return False
+    if isinstance(node, _EFFECT_STATEMENTS):
+        return True
+    return any(isinstance(child, _EFFECT_NODES) for child in ast.walk(node))
+
+
+def build_segment_dependency_graph(statements: List[ast.stmt]) -> Dict[int, Set[int]]:
+    """
+    Build the dependency graph between top-level statements.
+
+    Statement ``i`` depends on every other statement that defines a name ``i`` reads.
+    Definitions made later in the file are included too, because functions resolve
+    globals at call time. Statements with side effects also depend on the previous
+    one, which keeps them in one segment in program order (``random.seed`` before
+    ``random.random``, ``os.chdir`` before ``open``, prints in sequence). Import
+    statements are left out of the graph: they are replicated into every segment
+    that needs them instead of tying segments together.
+
+    Args:
+        statements: Top-level statements of the parsed module
+
+    Returns:
+        Mapping from statement index to the indices it depends on
+    """
+    names = [_statement_names(stmt) for stmt in statements]
+    definers: Dict[str, Set[int]] = {}
+    for index, (defined, _) in enumerate(names):
+        if isinstance(statements[index], (ast.Import, ast.ImportFrom)):
+            continue
+        for name in defined:
+            definers.setdefault(name, set()).add(index)
+
+    graph: Dict[int, Set[int]] = {}
+    previous_effect: Optional[int] = None
+    for index, (defined, used) in enumerate(names):
+        if isinstance(statements[index], (ast.Import, ast.ImportFrom)):
+            graph[index] = set()
+            continue
+        dependencies: Set[int] = set()
+        for name in used | defined:
+            dependencies.update(definers.get(name, set()))
+        if _has_side_effects(statements[index]):
+            if previous_effect is not None:
+                dependencies.add(previous_effect)
+            previous_effect = index
+        dependencies.discard(index)
+        graph[index] = dependencies
+    return graph
+
+
+def _statement_line_range(stmt: ast.stmt) -> Tuple[int, int]:
+    """Return the 1-based (first, last) source lines of a statement, decorators included."""
+    first = stmt.lineno
+    for decorator in getattr(stmt, 'decorator_list', []):
+        first = min(first, decorator.lineno)
+    return first, stmt.end_lineno or stmt.lineno
+
+
+def split_code_into_segments(code_string: Union[str, CodeArtifact]) -> List[CodeSegment]:
+    """
+    Split code into independently executable segments using its AST.
+
+    Top-level statements are grouped into the connected components of the
+    dependency graph, so each segment carries all the state it needs and
+    statements with side effects run together, in source order. Imports a
+    segment relies on are prepended to it. Code that cannot be split safely
+    (syntax errors, star imports, a single component) is returned whole.
+
+    Args:
+        code_string: Python code to split, or its CodeArtifact
+
+    Returns:
+        List of CodeSegment objects in source order
+    """
+    artifact = as_code_artifact(code_string)
+    if not artifact.source.strip():
+        return []
+
+    whole = [CodeSegment(name="main", code=artifact.source)]
+    tree = artifact.tree
+    if tree is None:
+        return whole
+
+    statements = tree.body
+    if len(statements) < 2:
+        return whole
+    for stmt in statements:
+        if isinstance(stmt, ast.ImportFrom) and any(alias.name == '*' for alias in stmt.names):
+            return whole
+
+    graph = build_segment_dependency_graph(statements)
+
+    # Union-find over the (undirected) dependency edges
+    parent = list(range(len(statements)))
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for index, dependencies in graph.items():
+        for dependency in dependencies:
+            parent[find(index)] = find(dependency)
+
+    is_import = [isinstance(stmt, (ast.Import, ast.ImportFrom)) for stmt in statements]
+    components: Dict[int, List[int]] = {}
+    for index in range(len(statements)):
+        if not is_import[index]:
+            components.setdefault(find(index), []).append(index)
+
+    if len(components) < 2:
+        return whole
+
+    source_lines = artifact.lines
+    names = [_statement_names(stmt) for stmt in statements]
+    import_indices = [index for index, flag in enumerate(is_import) if flag]
+
+    segments = []
+    for members in sorted(components.values(), key=lambda m: m[0]):
+        used: Set[str] = set()
+        for index in members:
+            used |= names[index][1]
+        needed_imports = [i for i in import_indices if names[i][0] & used]
+
+        ordered = sorted(needed_imports + members)
+        line_ranges = [_statement_line_range(statements[i]) for i in ordered]
+        code = '\n'.join(
+            '\n'.join(source_lines[first - 1:last]) for first, last in line_ranges
+        )
+
+        defs = [
+            statements[i].name for i in members
+            if isinstance(statements[i], (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        ]
+        first_line = _statement_line_range(statements[members[0]])[0]
+        last_line = _statement_line_range(statements[members[-1]])[1]
+        if defs:
+            name = ", ".join(defs)
+        else:
+            name = f"line {first_line}" if first_line == last_line else f"lines {first_line}-{last_line}"
+
+        segments.append(CodeSegment(name=name, code=code, statement_lines=line_ranges))
+
+    return segments
+
+
+async def execute_code_with_codeact(
+    code: str,
+    segment: str = "main",
+    profile: bool = False,
+    profile_top_n: int = 10
+) -> ExecutionResult:
+    """
+    Execute code using CodeAct and return execution results.
+
+    Args:
+        code: Python code to execute
+        segment: Name of the code segment, reported on the result
+        profile: If True, run the code under cProfile and tracemalloc in the sandbox
+        profile_top_n: Number of hot functions and allocation sites to report
+    """
     if not CODEACT_AVAILABLE:
         return ExecutionResult(
             success=False,
@@ -107,30 +599,42 @@ async def execute_code_with_codeact(code: str) -> ExecutionResult:
             variables={},
             imports_used=[],
             functions_defined=[],
-            security_issues=[]
+            security_issues=[],
+            segment=segment
         )
     
     start_time = time.time()
     
     try:
         # Use the CodeAct eval function to execute code
-        output, new_vars = await eval_fn(code, {})
+        executed_code = build_profiling_harness(code, profile_top_n) if profile else code
+        output, new_vars = await eval_fn(executed_code, {})
         
         execution_time = time.time() - start_time
         
-        # Extract additional information
-        imports, functions = extract_imports_and_functions(code)
-        security_issues = detect_security_issues(code)
+        profile_data = None
+        if profile:
+            output, profile_data = parse_profile_output(output)
+        
+        # Extract additional information, from a single parse of the code
+        artifact = CodeArtifact(code)
+        imports, functions = extract_imports_and_functions(artifact)
+        security_issues = detect_security_issues(artifact)
+        
+        # The eval function reports sandbox errors through its output
+        failed = output.startswith("Error during")
         
         return ExecutionResult(
-            success=True,
+            success=not failed,
             output=output,
-            error="",
+            error=output if failed else "",
             execution_time=execution_time,
             variables=new_vars,
             imports_used=imports,
             functions_defined=functions,
-            security_issues=security_issues
+            security_issues=security_issues,
+            segment=segment,
+            profile=profile_data
         )
     
     except Exception as e:
@@ -145,10 +649,54 @@ async def execute_code_with_codeact(code: str) -> ExecutionResult:
             variables={},
             imports_used=[],
             functions_defined=[],
-            security_issues=detect_security_issues(code)
+            security_issues=detect_security_issues(code),
+            segment=segment
         )
 
 
+def generate_performance_feedback(
+    execution_results: List[ExecutionResult],
+    slow_function_seconds: float = PROFILE_SLOW_FUNCTION_SECONDS,
+    peak_memory_bytes: int = PROFILE_PEAK_MEMORY_BYTES
+) -> List[str]:
+    """
+    Turn profiles of executed segments into concrete performance feedback.
+
+    Only results that were executed with profiling enabled contribute.
+
+    Returns:
+        List of issue strings (compatible with the other analyzers' format)
+    """
+    feedback = []
+    for result in execution_results:
+        if not result.profile:
+            continue
+        
+        for hot in result.profile.get("hot_functions", []):
+            if hot.get("file") != "<generated>" or hot.get("function") == "<module>":
+                continue
+            if hot.get("self_time", 0) < slow_function_seconds:
+                continue
+            feedback.append(
+                f"Dynamic Analysis [PERFORMANCE]: '{hot['function']}' (line {hot['line']}) spent "
+                f"{hot['self_time']:.2f}s over {hot['calls']} call(s) in segment '{result.segment}'"
+            )
+        
+        peak = result.profile.get("peak_memory_bytes") or 0
+        if peak >= peak_memory_bytes:
+            message = f"Dynamic Analysis [MEMORY]: peak memory {peak / (1024 * 1024):.1f} MB in segment '{result.segment}'"
+            sites = result.profile.get("allocation_sites", [])
+            if sites:
+                top_site = sites[0]
+                message += (
+                    f"; largest allocation site is line {top_site['line']} "
+                    f"({top_site['size_bytes'] / (1024 * 1024):.1f} MB in {top_site['count']} blocks)"
+                )
+            feedback.append(message)
+    
+    return feedback
+
+
 def generate_analysis_summary(execution_results: List[ExecutionResult]) -> str:
     """Generate a summary of the analysis results."""
     if not execution_results:
@@ -168,6 +716,10 @@ def generate_analysis_summary(execution_results: List[ExecutionResult]) -> str:
         avg_time = total_time / total_executions
         summary_parts.append(f"Average execution time: {avg_time:.4f} seconds")
     
+    failed_segments = [result.segment for result in execution_results if not result.success]
+    if failed_segments:
+        summary_parts.append(f"Failed segments: {', '.join(failed_segments)}")
+    
     # Count security issues
     total_security_issues = sum(len(result.security_issues) for result in execution_results)
     if total_security_issues > 0:
@@ -192,6 +744,8 @@ def generate_recommendations(execution_results: List[ExecutionResult]) -> List[s
     if slow_executions:
         recommendations.append("Consider optimizing slow-running code segments")
     
+    recommendations.extend(generate_performance_feedback(execution_results))
+    
     # Security recommendations
     security_issues = []
     for result in execution_results:
@@ -239,8 +793,17 @@ def generate_security_assessment(execution_results: List[ExecutionResult]) -> st
     return assessment
 
 
-def calculate_performance_metrics(execution_results: List[ExecutionResult]) -> Dict[str, Any]:
-    """Calculate performance metrics from execution results."""
+def calculate_performance_metrics(
+    execution_results: List[ExecutionResult],
+    wall_clock_time: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Calculate performance metrics from execution results.
+
+    Args:
+        execution_results: Per-segment execution results
+        wall_clock_time: Elapsed time for the whole analysis, if segments ran concurrently
+    """
     if not execution_results:
         return {}
     
@@ -248,6 +811,7 @@ def calculate_performance_metrics(execution_results: List[ExecutionResult]) -> D
     successful_executions = sum(1 for result in execution_results if result.success)
     total_time = sum(result.execution_time for result in execution_results)
     total_security_issues = sum(len(result.security_issues) for result in execution_results)
+    slowest = max(execution_results, key=lambda result: result.execution_time)
     
     metrics = {
         "total_executions": total_executions,
@@ -255,19 +819,45 @@ def calculate_performance_metrics(execution_results: List[ExecutionResult]) -> D
         "success_rate": successful_executions / total_executions if total_executions > 0 else 0,
         "total_execution_time": total_time,
         "average_execution_time": total_time / total_executions if total_executions > 0 else 0,
-        "total_security_issues": total_security_issues
+        "total_security_issues": total_security_issues,
+        "slowest_segment": slowest.segment,
+        "segment_execution_times": {result.segment: result.execution_time for result in execution_results}
     }
     
+    if wall_clock_time is not None:
+        metrics["wall_clock_time"] = wall_clock_time
+    
+    profiles = [result.profile for result in execution_results if result.profile]
+    if profiles:
+        metrics["profiled_cpu_time"] = sum(p.get("cpu_time") or 0 for p in profiles)
+        metrics["peak_memory_bytes"] = max(p.get("peak_memory_bytes") or 0 for p in profiles)
+    
     return metrics
 
 
-async def run_codeact_analysis_async(code_string: str, analysis_goal: str = "Comprehensive dynamic analysis") -> AnalysisResult:
+async def run_codeact_analysis_async(
+    code_string: Union[str, CodeArtifact],
+    analysis_goal: str = "Comprehensive dynamic analysis",
+    max_concurrent_segments: int = 4,
+    profile: bool = False,
+    profile_top_n: int = 10,
+    cancel_token: Optional[CancellationToken] = None
+) -> AnalysisResult:
     """
     Run CodeAct analysis on the provided code.
     
+    The code is split into independent segments (see split_code_into_segments)
+    which are executed concurrently. Each sandbox execution runs in its own
+    Pyodide process, so a slow or failing segment does not hide the others.
+    
     Args:
-        code_string: Python code to analyze
+        code_string: Python code to analyze, or its CodeArtifact
         analysis_goal: Goal for the analysis
+        max_concurrent_segments: Maximum number of segments executing at once
+        profile: If True, collect a cProfile/tracemalloc profile for each segment
+        profile_top_n: Number of hot functions and allocation sites to report
+        cancel_token: Cancelling it cancels every segment task, which stops their
+            sandbox executions, and raises OperationCancelled
         
     Returns:
         AnalysisResult containing the analysis results
@@ -281,25 +871,28 @@ async def run_codeact_analysis_async(code_string: str, analysis_goal: str = "Com
             execution_results=[]
         )
     
-    # Split code into logical segments for analysis
-    code_segments = []
+    # Split code into independent segments based on its dependency graph
+    code_segments = split_code_into_segments(code_string)
+    
+    semaphore = asyncio.Semaphore(max(1, max_concurrent_segments))
     
-    # For now, treat the entire code as one segment
-    # In a more sophisticated implementation, we could split by functions, classes, etc.
-    if code_string.strip():
-        code_segments.append(code_string)
+    async def execute_segment(segment: CodeSegment) -> ExecutionResult:
+        async with semaphore:
+            return await execute_code_with_codeact(segment.code, segment.name, profile, profile_top_n)
     
-    # Execute each code segment
-    execution_results = []
-    for segment in code_segments:
-        result = await execute_code_with_codeact(segment)
-        execution_results.append(result)
+    # Execute the segments concurrently
+    start_time = time.time()
+    execution_results = list(await await_cancellable(
+        asyncio.gather(*(execute_segment(segment) for segment in code_segments)),
+        cancel_token, f"CodeAct sandbox ({len(code_segments)} segments)"
+    ))
+    wall_clock_time = time.time() - start_time
     
     # Generate analysis components
     analysis_summary = generate_analysis_summary(execution_results)
     recommendations = generate_recommendations(execution_results)
     security_assessment = generate_security_assessment(execution_results)
-    performance_metrics = calculate_performance_metrics(execution_results)
+    performance_metrics = calculate_performance_metrics(execution_results, wall_clock_time)
     
     return AnalysisResult(
         analysis_summary=analysis_summary,
@@ -310,13 +903,21 @@ async def run_codeact_analysis_async(code_string: str, analysis_goal: str = "Com
     )
 
 
-def run_codeact_analysis(code_string: str, analysis_goal: str = "Comprehensive dynamic analysis") -> AnalysisResult:
+def run_codeact_analysis(
+    code_string: Union[str, CodeArtifact],
+    analysis_goal: str = "Comprehensive dynamic analysis",
+    profile: bool = False,
+    cancel_token: Optional[CancellationToken] = None
+) -> AnalysisResult:
     """
     Synchronous wrapper for CodeAct analysis.
     
     Args:
-        code_string: Python code to analyze
+        code_string: Python code to analyze, or its CodeArtifact
         analysis_goal: Goal for the analysis
+        profile: If True, profile CPU time and memory of each segment in the sandbox
+        cancel_token: Cancelling it stops the sandbox executions; the result then
+            reports the analysis as cancelled
         
     Returns:
         AnalysisResult containing the analysis results
@@ -326,10 +927,22 @@ def run_codeact_analysis(code_string: str, analysis_goal: str = "Comprehensive d
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
-            result = loop.run_until_complete(run_codeact_analysis_async(code_string, analysis_goal))
+            result = loop.run_until_complete(
+                run_codeact_analysis_async(code_string, analysis_goal, profile=profile, cancel_token=cancel_token)
+            )
             return result
         finally:
+            # The shared async HTTP connections of this loop cannot outlive it
+            loop.run_until_complete(aclose_loop_http_client())
             loop.close()
+    except OperationCancelled as e:
+        return AnalysisResult(
+            analysis_summary=f"Analysis cancelled: {str(e)}",
+            recommendations=[],
+            security_assessment="Unable to assess security: analysis cancelled",
+            performance_metrics={},
+            execution_results=[]
+        )
     except Exception as e:
         # Return error result if something goes wrong
         return AnalysisResult(
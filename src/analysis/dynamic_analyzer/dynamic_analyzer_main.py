@@ -2,15 +2,14 @@
 """
 Dynamic Analysis Framework Main Module
 
-This module serves as the main entry point for dynamic analysis tools,
-currently supporting DynaPyt with space for future CodeAct integration.
+This module serves as the main entry point for dynamic analysis tools.
 
 Available Analyzers:
 - DynaPyt: Runtime analysis and instrumentation for Python code
-- CodeAct: [Future] Multi-language dynamic analysis framework
+- CodeAct: Sandboxed execution of the code, optionally profiled for CPU time and memory
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 import sys
 from pathlib import Path
 
@@ -22,12 +21,13 @@ except ImportError:
     # Fallback to absolute import (when run directly)
     from dynapyt_analyzer import DynaPytAnalyzer, run_dynapyt_analysis
 
-# CodeAct Integration - Future Implementation
-# TODO: Add CodeAct integration when available
-# try:
-#     from .codeact_analyzer import CodeActAnalyzer, run_codeact_analysis
-# except ImportError:
-#     from codeact_analyzer import CodeActAnalyzer, run_codeact_analysis
+from src.code_artifact import CodeArtifact
+
+
+def _codeact_wrapper():
+    """Import the CodeAct wrapper on first use; its sandbox dependencies are optional."""
+    from src.analysis.dynamic_analyzer import codeact_wrapper
+    return codeact_wrapper
 
 
 class DynamicAnalysisFramework:
@@ -36,16 +36,12 @@ class DynamicAnalysisFramework:
     
     Currently supports:
     - DynaPyt for Python runtime analysis
-    
-    Future support planned for:
-    - CodeAct for multi-language dynamic analysis
+    - CodeAct for sandboxed execution and profiling
     """
     
     def __init__(self):
         """Initialize the dynamic analysis framework."""
         self.dynapyt_analyzer = DynaPytAnalyzer()
-        # TODO: Initialize CodeAct analyzer when available
-        # self.codeact_analyzer = CodeActAnalyzer()
         
     def get_available_analyzers(self) -> List[str]:
         """Get list of available analyzers."""
@@ -55,15 +51,14 @@ class DynamicAnalysisFramework:
         if self.dynapyt_analyzer.is_available():
             analyzers.append("dynapyt")
             
-        # TODO: Check CodeAct availability when implemented
-        # if hasattr(self, 'codeact_analyzer') and self.codeact_analyzer.is_available():
-        #     analyzers.append("codeact")
+        if _codeact_wrapper().CODEACT_AVAILABLE:
+            analyzers.append("codeact")
             
         return analyzers
         
     def run_analysis(
         self, 
-        code: str, 
+        code: Union[str, CodeArtifact], 
         analyzer: str = "dynapyt", 
         analysis_type: str = "comprehensive",
         **kwargs
@@ -72,7 +67,7 @@ class DynamicAnalysisFramework:
         Run dynamic analysis using the specified analyzer.
         
         Args:
-            code: Source code to analyze
+            code: Source code to analyze, or its CodeArtifact
             analyzer: Analyzer to use ("dynapyt" or "codeact")
             analysis_type: Type of analysis to perform
             **kwargs: Additional analyzer-specific arguments
@@ -89,7 +84,7 @@ class DynamicAnalysisFramework:
     
     def _run_dynapyt_analysis(
         self, 
-        code: str, 
+        code: Union[str, CodeArtifact], 
         analysis_type: str = "comprehensive",
         **kwargs
     ) -> Dict[str, Any]:
@@ -104,26 +99,48 @@ class DynamicAnalysisFramework:
     
     def _run_codeact_analysis(
         self, 
-        code: str, 
+        code: Union[str, CodeArtifact], 
         analysis_type: str = "comprehensive",
         **kwargs
     ) -> Dict[str, Any]:
-        """Run CodeAct analysis - Future Implementation."""
-        # TODO: Implement CodeAct integration
+        """
+        Run CodeAct analysis.
+
+        With ``profile=True`` each segment runs under cProfile and tracemalloc,
+        and slow functions and high peak memory are reported as performance
+        feedback. The "performance" analysis type reports only that feedback.
+        """
+        wrapper = _codeact_wrapper()
+        if not wrapper.CODEACT_AVAILABLE:
+            return {
+                "error": "CodeAct not available",
+                "suggestion": "Install with: pip install langchain-sandbox"
+            }
+
+        cancel_token = kwargs.get("cancel_token")
+        result = wrapper.run_codeact_analysis(
+            code, profile=kwargs.get("profile", False), cancel_token=cancel_token
+        )
+        if cancel_token is not None and cancel_token.cancelled:
+            return {"cancelled": True}
+        if result.analysis_summary.startswith("Analysis failed"):
+            return {"error": result.analysis_summary}
+
+        feedback = wrapper.generate_performance_feedback(result.execution_results)
+        recommendations = [] if analysis_type == "performance" else [
+            rec for rec in result.recommendations if rec not in feedback
+        ]
         return {
-            "error": "CodeAct analyzer not yet implemented",
-            "suggestion": "Use DynaPyt analyzer for now",
-            "planned_features": [
-                "Multi-language support",
-                "Advanced control flow analysis",
-                "Cross-language vulnerability detection",
-                "Performance profiling"
-            ]
+            "analyzer": "codeact",
+            "summary": result.analysis_summary,
+            "performance_metrics": result.performance_metrics,
+            "performance_feedback": feedback,
+            "recommendations": recommendations
         }
 
 
 def run_dynamic_analysis(
-    code: str,
+    code: Union[str, CodeArtifact],
     analyzer: str = "dynapyt",
     analysis_type: str = "comprehensive",
     **kwargs
@@ -132,10 +149,10 @@ def run_dynamic_analysis(
     Convenience function to run dynamic analysis and return issues list.
     
     Args:
-        code: Source code to analyze
+        code: Source code to analyze, or its CodeArtifact
         analyzer: Analyzer to use ("dynapyt" or "codeact")
         analysis_type: Type of analysis to perform
-        **kwargs: Additional analyzer-specific arguments
+        **kwargs: Additional analyzer-specific arguments (e.g. ``cancel_token``)
         
     Returns:
         List of issue strings (compatible with pylint/bandit format)
@@ -149,6 +166,9 @@ def run_dynamic_analysis(
     if "error" in results:
         issues.append(f"Dynamic Analysis Error: {results['error']}")
         return issues
+    if results.get("cancelled"):
+        issues.append("Dynamic Analysis: cancelled before completion.")
+        return issues
     
     # Extract issues from DynaPyt results
     dynapyt_results = results.get("dynapyt_results", {})
@@ -172,6 +192,9 @@ def run_dynamic_analysis(
         if uncovered > 0:
             issues.append(f"Dynamic Analysis [INFO]: {uncovered} uncovered branches detected ({coverage_pct:.1f}% coverage)")
     
+    # Slow functions and memory peaks found by profiling (CodeAct)
+    issues.extend(results.get("performance_feedback", []))
+    
     # General recommendations as informational issues
     recommendations = results.get("recommendations", [])
     for rec in recommendations:
@@ -182,7 +205,7 @@ def run_dynamic_analysis(
 
 
 def run_dynamic_analysis_full(
-    code: str,
+    code: Union[str, CodeArtifact],
     analyzer: str = "dynapyt", 
     analysis_type: str = "comprehensive",
     **kwargs
@@ -191,7 +214,7 @@ def run_dynamic_analysis_full(
     Run dynamic analysis and return full results dictionary.
     
     Args:
-        code: Source code to analyze
+        code: Source code to analyze, or its CodeArtifact
         analyzer: Analyzer to use ("dynapyt" or "codeact")
         analysis_type: Type of analysis to perform
         **kwargs: Additional analyzer-specific arguments
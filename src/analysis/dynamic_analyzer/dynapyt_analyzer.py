@@ -34,16 +34,26 @@ results = analyzer.run_analysis(code, "security_taint")
 ```
 """
 
+import ast
 import os
 import sys
 import tempfile
-import subprocess
 import time
 import inspect
 import shutil
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from pathlib import Path
 
+# Add project root to path for imports
+_current_file_directory = os.path.dirname(os.path.abspath(__file__))
+_project_root = os.path.abspath(os.path.join(_current_file_directory, '..', '..', '..'))
+
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from src.cancellation import CancellationToken, OperationCancelled, run_process
+from src.code_artifact import CodeArtifact, as_code_artifact
+
 try:
     from dynapyt.analyses.BaseAnalysis import BaseAnalysis
     import dynapyt.run_instrumentation
@@ -265,8 +275,13 @@ class {analysis_class.__name__}(BaseAnalysis):
         
         return content
         
-    def instrument_code(self, code_string: str, analysis_name: str = "TraceAll") -> str:
-        """Instrument Python code using DynaPyt."""
+    def instrument_code(
+        self,
+        code_string: Union[str, CodeArtifact],
+        analysis_name: str = "TraceAll",
+        cancel_token: Optional[CancellationToken] = None
+    ) -> str:
+        """Instrument Python code using DynaPyt; cancelling ``cancel_token`` kills the instrumentation process."""
         if not self.available:
             raise RuntimeError("DynaPyt is not available. Install with: pip install dynapyt")
             
@@ -275,7 +290,7 @@ class {analysis_class.__name__}(BaseAnalysis):
         # Write code to temporary file
         code_file = os.path.join(temp_dir, "program.py")
         with open(code_file, 'w') as f:
-            f.write(code_string)
+            f.write(as_code_artifact(code_string).source)
             
         # Create analysis file
         analysis_class = self.ANALYSIS_CLASSES.get(analysis_name, TraceAllAnalysis)
@@ -298,18 +313,30 @@ class {analysis_class.__name__}(BaseAnalysis):
             pythonpath = env.get("PYTHONPATH", "")
             env["PYTHONPATH"] = f"{temp_dir}:{pythonpath}" if pythonpath else temp_dir
                 
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd=temp_dir, env=env)
+            result = run_process(cmd, cancel_token, label=f"DynaPyt instrumentation ({analysis_name})", cwd=temp_dir, env=env)
             
             if result.returncode != 0:
                 raise RuntimeError(f"Instrumentation failed: {result.stderr}")
                 
             return code_file
             
+        except OperationCancelled:
+            raise
         except Exception as e:
             raise RuntimeError(f"Failed to instrument code: {str(e)}")
     
-    def run_analysis(self, code_string: str, analysis_type: str = "comprehensive") -> Dict[str, Any]:
-        """Run DynaPyt analysis on Python code."""
+    def run_analysis(
+        self,
+        code_string: Union[str, CodeArtifact],
+        analysis_type: str = "comprehensive",
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Dict[str, Any]:
+        """
+        Run DynaPyt analysis on Python code (source or a CodeArtifact shared with other analyses).
+
+        The token is checked before each analysis; once cancelled, the remaining ones
+        are skipped and ``results["cancelled"]`` is set.
+        """
         if not self.available:
             return {
                 "error": "DynaPyt not available",
@@ -321,17 +348,27 @@ class {analysis_class.__name__}(BaseAnalysis):
             "dynapyt_results": {},
             "summary": "",
             "recommendations": [],
-            "errors": []
+            "errors": [],
+            "cancelled": False
         }
         
+        # Every analysis reads the same parsed artifact
+        artifact = as_code_artifact(code_string)
+        
         # Determine analyses to run
         analyses_to_run = self._get_analyses_for_type(analysis_type)
         
         # Run each analysis
         for analysis_name in analyses_to_run:
             try:
-                analysis_result = self._simulate_analysis_results(analysis_name, code_string)
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                analysis_result = self._simulate_analysis_results(analysis_name, artifact)
                 results["dynapyt_results"][analysis_name] = analysis_result
+            except OperationCancelled as e:
+                results["cancelled"] = True
+                results["errors"].append(f"Cancelled before {analysis_name}: {str(e)}")
+                break
             except Exception as e:
                 results["errors"].append(f"Error running {analysis_name}: {str(e)}")
                 
@@ -354,34 +391,33 @@ class {analysis_class.__name__}(BaseAnalysis):
         else:
             return ["TraceAll"]
     
-    def _simulate_analysis_results(self, analysis_name: str, code_string: str) -> Dict[str, Any]:
-        """Simulate analysis results using fast pattern matching."""
-        code_lower = code_string.lower()
-        code_lines = len(code_string.split('\n'))
-        
+    def _simulate_analysis_results(self, analysis_name: str, artifact: CodeArtifact) -> Dict[str, Any]:
+        """Simulate analysis results from the artifact's AST and tokens."""
         if analysis_name == "TraceAll":
-            return self._simulate_trace_all(code_string, code_lower, code_lines)
+            return self._simulate_trace_all(artifact)
         elif analysis_name == "BranchCoverage":
-            return self._simulate_branch_coverage(code_string, code_lower)
+            return self._simulate_branch_coverage(artifact)
         elif analysis_name == "SecurityTaint":
-            return self._simulate_security_taint(code_string, code_lower)
+            return self._simulate_security_taint(artifact)
         
         return {}
     
-    def _simulate_trace_all(self, code_string: str, code_lower: str, code_lines: int) -> Dict[str, Any]:
+    def _simulate_trace_all(self, artifact: CodeArtifact) -> Dict[str, Any]:
         """Simulate TraceAll analysis results."""
-        function_defs = code_string.count('def ')
-        if_count = code_string.count('if ')
-        for_count = code_string.count('for ')
-        while_count = code_string.count('while ')
-        assignments = code_string.count('=') - code_string.count('==') - code_string.count('!=')
-        function_calls = max(0, code_string.count('(') - function_defs)
+        counts = artifact.node_counts
+        code_lines = len(artifact.lines)
+        function_defs = counts["FunctionDef"] + counts["AsyncFunctionDef"]
+        if_count = counts["If"] + counts["IfExp"]
+        for_count = counts["For"] + counts["AsyncFor"] + counts["comprehension"]
+        while_count = counts["While"]
+        assignments = counts["Assign"] + counts["AugAssign"] + counts["AnnAssign"] + counts["NamedExpr"]
+        function_calls = counts["Call"]
         
         return {
             "total_events": code_lines * 2,
             "control_flow_events": if_count + for_count + while_count,
             "function_calls": function_calls,
-            "variable_assignments": max(0, assignments),
+            "variable_assignments": assignments,
             "function_definitions": function_defs,
             "execution_paths": max(1, if_count),
             "runtime_hooks_triggered": code_lines,
@@ -389,15 +425,27 @@ class {analysis_class.__name__}(BaseAnalysis):
                 "loops_detected": for_count + while_count,
                 "conditional_statements": if_count,
                 "method_invocations": function_calls,
-                "variable_writes": max(0, assignments)
+                "variable_writes": assignments
             }
         }
     
-    def _simulate_branch_coverage(self, code_string: str, code_lower: str) -> Dict[str, Any]:
+    def _simulate_branch_coverage(self, artifact: CodeArtifact) -> Dict[str, Any]:
         """Simulate BranchCoverage analysis results."""
-        if_count = code_string.count('if ')
-        elif_count = code_string.count('elif ')
-        else_count = code_string.count('else:')
+        if_count = 0
+        elif_count = 0
+        else_count = 0
+        for node in artifact.nodes:
+            if isinstance(node, ast.If):
+                # An elif is an If that is the only statement of its parent's else branch
+                if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If) and \
+                        artifact.lines[node.orelse[0].lineno - 1].lstrip().startswith("elif"):
+                    elif_count += 1
+                elif node.orelse:
+                    else_count += 1
+                if_count += 1
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.Try)) and node.orelse:
+                else_count += 1
+        if_count -= elif_count
         total_branches = max(1, (if_count + elif_count) * 2 + else_count)
         covered_branches = int(total_branches * 0.8)  # Assume 80% coverage
         
@@ -415,7 +463,7 @@ class {analysis_class.__name__}(BaseAnalysis):
             }
         }
     
-    def _simulate_security_taint(self, code_string: str, code_lower: str) -> Dict[str, Any]:
+    def _simulate_security_taint(self, artifact: CodeArtifact) -> Dict[str, Any]:
         """Simulate SecurityTaint analysis results."""
         security_patterns = {
             'eval': 'Code injection risk',
@@ -429,8 +477,10 @@ class {analysis_class.__name__}(BaseAnalysis):
         sources = 0
         sinks = 0
         
+        # Names come from the token stream, so 'evaluated' does not match 'eval'
+        names = artifact.names
         for pattern, risk_desc in security_patterns.items():
-            if pattern in code_lower:
+            if pattern in names:
                 if pattern in ['input', 'raw_input']:
                     sources += 1
                 else:
@@ -551,17 +601,19 @@ class {analysis_class.__name__}(BaseAnalysis):
 
 
 def run_dynapyt_analysis(
-    code_string: str, 
+    code_string: Union[str, CodeArtifact], 
     analysis_type: str = "comprehensive", 
-    use_real_instrumentation: bool = False
+    use_real_instrumentation: bool = False,
+    cancel_token: Optional[CancellationToken] = None
 ) -> Dict[str, Any]:
     """
     Convenience function to run DynaPyt analysis.
     
     Args:
-        code_string: Python code to analyze
+        code_string: Python code to analyze, or its CodeArtifact
         analysis_type: Type of analysis to perform
         use_real_instrumentation: If True, attempts real DynaPyt instrumentation
+        cancel_token: Cancelling it skips the remaining analyses and kills a running instrumentation
         
     Returns:
         Analysis results dictionary
@@ -574,7 +626,7 @@ def run_dynapyt_analysis(
         print("⚠️  Using real DynaPyt instrumentation - this may be slow...")
         original_simulate = analyzer._simulate_analysis_results
         
-        def real_analysis_wrapper(analysis_name: str, code_string: str) -> Dict[str, Any]:
+        def real_analysis_wrapper(analysis_name: str, code_string: CodeArtifact) -> Dict[str, Any]:
             try:
                 # Check timeout
                 if time.time() - start_time > 10:
@@ -583,16 +635,20 @@ def run_dynapyt_analysis(
                     
                 # Attempt real instrumentation
                 try:
-                    analyzer.instrument_code(code_string, analysis_name)
+                    analyzer.instrument_code(code_string, analysis_name, cancel_token)
                     result = original_simulate(analysis_name, code_string)
                     result["note"] = "Real instrumentation completed successfully"
                     return result
+                except OperationCancelled:
+                    raise
                 except Exception as inst_error:
                     # If instrumentation fails, fall back to simulation
                     result = original_simulate(analysis_name, code_string)
                     result["note"] = f"Real instrumentation failed, using simulation: {str(inst_error)[:100]}"
                     return result
                     
+            except OperationCancelled:
+                raise
             except Exception as e:
                 print(f"Real instrumentation failed for {analysis_name}: {e}")
                 print("Falling back to fast simulation...")
@@ -601,7 +657,7 @@ def run_dynapyt_analysis(
         analyzer._simulate_analysis_results = real_analysis_wrapper
     
     try:
-        return analyzer.run_analysis(code_string, analysis_type)
+        return analyzer.run_analysis(code_string, analysis_type, cancel_token)
     finally:
         analyzer.cleanup()
         elapsed_time = time.time() - start_time
@@ -1,24 +1,42 @@
-import subprocess
 import json
 import sys
 import os
-from typing import List
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 
 # Add the project root to Python path to enable imports
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+from src.cancellation import CancellationToken, OperationCancelled, run_process
 from src.utils import temporary_python_file
 
-def run_pylint(code_string: str) -> List[str]:
+
+@contextmanager
+def _code_file(code_string: str, filepath: Optional[str] = None) -> Iterator[str]:
+    """Yield ``filepath`` if the code was already written there, else a temporary file holding it."""
+    if filepath is not None:
+        yield filepath
+        return
+    with temporary_python_file(code_string) as temp_path:
+        yield temp_path
+
+
+def run_pylint(
+    code_string: str,
+    filepath: Optional[str] = None,
+    cancel_token: Optional[CancellationToken] = None
+) -> List[str]:
     """
     Runs Pylint on the given Python code string and returns a list of issues.
     Focuses on Errors (E), Warnings (W), and Fatal (F) messages.
+    If ``filepath`` already holds the code, it is analyzed instead of a new temporary file.
+    Cancelling ``cancel_token`` kills the tool's process group.
     """
     issues = []
     try:
-        with temporary_python_file(code_string) as filepath:
+        with _code_file(code_string, filepath) as filepath:
             # Using a message template for consistent, parsable output.
             # Disabling all messages first, then enabling specific categories (E, W, F).
             msg_template = "{path}:{line}:{column}: [{msg_id}({symbol})] {msg}"
@@ -29,7 +47,7 @@ def run_pylint(code_string: str) -> List[str]:
                 '--disable=all',
                 '--enable=E,W,F' # Errors, Warnings, Fatal
             ]
-            process = subprocess.run(command, capture_output=True, text=True, check=False)
+            process = run_process(command, cancel_token, label="Pylint")
             
             output_lines = process.stdout.strip().split('\n')
             # Filter out empty lines or lines that are not actual issues (headers/footers might be added depending on Pylint version/config)
@@ -43,21 +61,29 @@ def run_pylint(code_string: str) -> List[str]:
                 # provide a generic message with some output.
                 issues.append(f"Pylint indicated issues (exit code {process.returncode}), but no specific messages were parsed. Raw output snippet: {process.stdout.strip()[:200]}...")
 
+    except OperationCancelled:
+        issues.append("Pylint: cancelled before completion.")
     except FileNotFoundError:
         issues.append("Pylint not found. Please ensure it's installed and in your system's PATH.")
     except Exception as e:
         issues.append(f"An error occurred while running Pylint: {str(e)}")
     return issues
 
-def run_bandit(code_string: str) -> List[str]:
+def run_bandit(
+    code_string: str,
+    filepath: Optional[str] = None,
+    cancel_token: Optional[CancellationToken] = None
+) -> List[str]:
     """
     Runs Bandit on the given Python code string and returns a list of security issues.
+    If ``filepath`` already holds the code, it is analyzed instead of a new temporary file.
+    Cancelling ``cancel_token`` kills the tool's process group.
     """
     issues = []
     try:
-        with temporary_python_file(code_string) as filepath:
+        with _code_file(code_string, filepath) as filepath:
             command = ['bandit', '-r', filepath, '-f', 'json']
-            process = subprocess.run(command, capture_output=True, text=True, check=False)
+            process = run_process(command, cancel_token, label="Bandit")
 
             # Bandit exits with 0 if no issues, 1 if issues are found.
             # Other exit codes might indicate errors.
@@ -81,6 +107,8 @@ def run_bandit(code_string: str) -> List[str]:
                     error_message += f" Stderr: {process.stderr.strip()[:200]}..."
                 issues.append(error_message)
 
+    except OperationCancelled:
+        issues.append("Bandit: cancelled before completion.")
     except FileNotFoundError:
         issues.append("Bandit not found. Please ensure it's installed and in your system's PATH.")
     except Exception as e:
@@ -88,13 +116,19 @@ def run_bandit(code_string: str) -> List[str]:
     return issues
 
 
-def run_mypy(code_string: str) -> List[str]:
+def run_mypy(
+    code_string: str,
+    filepath: Optional[str] = None,
+    cancel_token: Optional[CancellationToken] = None
+) -> List[str]:
     """
     Runs MyPy on the given Python code string and returns a list of type checking issues.
+    If ``filepath`` already holds the code, it is analyzed instead of a new temporary file.
+    Cancelling ``cancel_token`` kills the tool's process group.
     """
     issues = []
     try:
-        with temporary_python_file(code_string) as filepath:
+        with _code_file(code_string, filepath) as filepath:
             command = [
                 'mypy', filepath,
                 '--show-error-codes',
@@ -102,7 +136,7 @@ def run_mypy(code_string: str) -> List[str]:
                 '--no-color-output'
             ]
             
-            process = subprocess.run(command, capture_output=True, text=True, check=False)
+            process = run_process(command, cancel_token, label="MyPy")
             
             output_lines = process.stdout.strip().split('\n')
             for line in output_lines:
@@ -112,6 +146,8 @@ def run_mypy(code_string: str) -> List[str]:
             if not issues and process.returncode != 0 and process.stdout.strip():
                 issues.append(f"MyPy indicated issues (exit code {process.returncode}), but no specific messages were parsed.")
 
+    except OperationCancelled:
+        issues.append("MyPy: cancelled before completion.")
     except FileNotFoundError:
         issues.append("MyPy not found. Please ensure it's installed and in your system's PATH.")
     except Exception as e:
@@ -0,0 +1,191 @@
+"""
+Parquet and Arrow IPC (Feather v2) attachments for the LLM context.
+
+These formats carry their schema, and Parquet also carries per-row-group column
+statistics, in the file metadata. Summaries are built from that metadata without
+loading the data, and sample rows are decoded from the first and last row groups
+(or record batches) only. Attachments reach parse_file as bytes (Streamlit keeps
+uploads in memory, the batch runner reads its files), which are wrapped zero-copy;
+a path given instead is memory-mapped, so the columns are not even read from disk.
+
+pyarrow is optional; without it these files are reported as unsupported.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pa_ipc = None
+    pq = None
+    PYARROW_AVAILABLE = False
+
+from src.context_summarizer import DEFAULT_SUMMARY_CHAR_BUDGET, SUMMARY_SAMPLE_ROWS, cap_text
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_IPC_EXTENSIONS = ('.feather', '.arrow', '.ipc')
+
+
+def _open_source(source: Any) -> Any:
+    """Memory-map a path, or wrap bytes without copying them."""
+    if isinstance(source, (str, os.PathLike)):
+        return pa.memory_map(str(source), 'r')
+    return pa.BufferReader(pa.py_buffer(source))
+
+
+def _schema_lines(schema: Any, null_counts: Optional[Dict[str, int]] = None) -> List[str]:
+    lines = ["Columns (name: type" + (", nulls):" if null_counts is not None else "):")]
+    for arrow_field in schema:
+        nulls = ""
+        if null_counts is not None:
+            count = null_counts.get(arrow_field.name)
+            nulls = f", nulls={count}" if count is not None else ", nulls=unknown"
+        lines.append(f"- {arrow_field.name}: {arrow_field.type}{nulls}")
+    return lines
+
+
+def _metadata(schema: Any, rows: int, **extra: Any) -> Dict[str, Any]:
+    return {
+        "rows": rows,
+        "columns": [arrow_field.name for arrow_field in schema],
+        "dtypes": {arrow_field.name: str(arrow_field.type) for arrow_field in schema},
+        **extra,
+    }
+
+
+def _parquet_statistics(metadata: Any) -> Tuple[Dict[str, int], Dict[str, Tuple[Any, Any]]]:
+    """
+    Combine the column statistics of every row group.
+
+    Returns:
+        Tuple of (null count per column, (min, max) per column); columns missing
+        statistics in any row group are left out
+    """
+    null_counts: Dict[str, int] = {}
+    ranges: Dict[str, Tuple[Any, Any]] = {}
+    missing_nulls = set()
+    missing_ranges = set()
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            name = column.path_in_schema
+            statistics = column.statistics
+            if statistics is None or not statistics.has_null_count:
+                missing_nulls.add(name)
+            else:
+                null_counts[name] = null_counts.get(name, 0) + statistics.null_count
+            if statistics is None or not statistics.has_min_max:
+                missing_ranges.add(name)
+            elif name in ranges:
+                low, high = ranges[name]
+                try:
+                    ranges[name] = (min(low, statistics.min), max(high, statistics.max))
+                except TypeError:
+                    missing_ranges.add(name)
+            else:
+                ranges[name] = (statistics.min, statistics.max)
+    for name in missing_nulls:
+        null_counts.pop(name, None)
+    for name in missing_ranges:
+        ranges.pop(name, None)
+    return null_counts, ranges
+
+
+def summarize_parquet(
+    source: Any,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET,
+    sample_rows: int = SUMMARY_SAMPLE_ROWS
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Summarize a Parquet file from its footer metadata and rows of its first and last row groups.
+
+    Args:
+        source: Path (memory-mapped) or bytes of the file
+        char_budget: Maximum length of the summary in characters
+        sample_rows: Rows shown from each sampled row group
+
+    Returns:
+        Tuple of (summary text, table metadata)
+    """
+    parquet_file = pq.ParquetFile(_open_source(source))
+    metadata = parquet_file.metadata
+    schema = parquet_file.schema_arrow
+    null_counts, ranges = _parquet_statistics(metadata)
+
+    compression = ""
+    if metadata.num_row_groups and metadata.row_group(0).num_columns:
+        compression = f", {metadata.row_group(0).column(0).compression} compression"
+    lines = [
+        f"Summary: {metadata.num_rows} rows x {len(schema)} columns "
+        f"(Parquet, {metadata.num_row_groups} row groups{compression})"
+    ]
+    lines += _schema_lines(schema, null_counts)
+    if ranges:
+        lines.append("Column ranges from row-group statistics (min, max):")
+        lines += [f"- {name}: min={low!r}, max={high!r}" for name, (low, high) in ranges.items()]
+
+    for index in sorted({0, metadata.num_row_groups - 1}) if metadata.num_row_groups else []:
+        batch = next(parquet_file.iter_batches(batch_size=sample_rows, row_groups=[index]), None)
+        if batch is not None:
+            lines.append(f"First {batch.num_rows} rows of row group {index}:\n{batch.to_pandas().to_string()}")
+
+    return cap_text("\n".join(lines) + "\n", char_budget), _metadata(schema, metadata.num_rows, row_groups=metadata.num_row_groups)
+
+
+def summarize_arrow_ipc(
+    source: Any,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET,
+    sample_rows: int = SUMMARY_SAMPLE_ROWS
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Summarize an Arrow IPC / Feather v2 file.
+
+    The row count is read from the record batch headers and only the first and
+    last batches are decoded for samples; with a memory map the other batches are
+    never read (nor decompressed, for lz4/zstd Feather files).
+
+    Returns:
+        Tuple of (summary text, table metadata)
+    """
+    reader = pa_ipc.open_file(_open_source(source))
+    schema = reader.schema
+    batches = reader.num_record_batches
+    # Only the batch headers are read; get_batch() would decode every column
+    rows = reader.count_rows()
+
+    lines = [f"Summary: {rows} rows x {len(schema)} columns (Arrow IPC, {batches} record batches)"]
+    lines += _schema_lines(schema)
+    for index in sorted({0, batches - 1}) if batches else []:
+        batch = reader.get_batch(index).slice(0, sample_rows)
+        lines.append(f"First {batch.num_rows} rows of record batch {index}:\n{batch.to_pandas().to_string()}")
+
+    return cap_text("\n".join(lines) + "\n", char_budget), _metadata(schema, rows, record_batches=batches)
+
+
+def summarize_arrow_file(
+    filename: str,
+    source: Any,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Summarize a Parquet or Arrow IPC file, chosen by its extension.
+
+    Args:
+        filename: Name of the file; its extension selects the format
+        source: Path (memory-mapped) or bytes of the file (wrapped without a copy)
+        char_budget: Maximum length of the summary in characters
+
+    Returns:
+        Tuple of (summary text, table metadata)
+    """
+    if not PYARROW_AVAILABLE:
+        return "Unsupported file type (install pyarrow to read Parquet and Arrow files).\n", {}
+    if filename.endswith(PARQUET_EXTENSIONS):
+        return summarize_parquet(source, char_budget)
+    return summarize_arrow_ipc(source, char_budget)
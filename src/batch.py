@@ -0,0 +1,356 @@
+"""
+Headless batch runs of the generation pipeline.
+
+Reads requests from a JSONL file, one object per line:
+
+    {"id": "fib", "prompt": "Write a fibonacci function", "attachments": ["data/sales.csv"]}
+
+Only ``prompt`` is required. ``id`` defaults to the line number, attachment paths
+are relative to the input file, and ``model`` / ``max_attempts`` override the
+command-line settings for one request. Requests run concurrently through the same
+run_generation_pipeline as the web app, and each result is appended to the output
+JSONL as soon as it finishes. The output doubles as the checkpoint: with
+``--resume``, requests whose ID is already in it are skipped, so an interrupted
+sweep continues where it stopped. Results of runs ended by a failed LLM call
+(network, quota, rate limit, overload) are written with ``"retryable": true`` and
+run again on resume, which appends their new result.
+
+Usage:
+    python -m src.batch prompts.jsonl -o results.jsonl --model gpt-4o-mini --concurrency 8 --resume
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+# Add the project root to Python path to enable imports when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dotenv import load_dotenv
+
+from src.cancellation import CancellationToken
+from src.context_handler import DEFAULT_RETRIEVAL_TOKEN_BUDGET, parse_files_to_context_string
+from src.context_summarizer import DEFAULT_SUMMARY_CHAR_BUDGET
+from src.instrumentation import enable_metrics, trace_request, write_prometheus_file
+from src.pipeline import MAX_ATTEMPTS, PipelineConfig, run_generation_pipeline
+
+DEFAULT_BATCH_CONCURRENCY = 4
+DEFAULT_BATCH_MODEL = "gpt-4o-mini"
+BATCH_SESSION_ID = "batch"
+
+
+@dataclass
+class BatchRequest:
+    """One line of the input file."""
+    request_id: str
+    prompt: str
+    attachments: List[str] = field(default_factory=list)
+    model_name: Optional[str] = None
+    max_attempts: Optional[int] = None
+
+
+@dataclass
+class LocalFile:
+    """A file on disk, with the ``name``/``getvalue()`` interface of a Streamlit upload."""
+    name: str
+    data: bytes
+
+    def getvalue(self) -> bytes:
+        return self.data
+
+    @classmethod
+    def from_path(cls, path: str) -> "LocalFile":
+        with open(path, "rb") as f:
+            return cls(os.path.basename(path), f.read())
+
+
+def read_requests(path: str) -> Iterator[Tuple[Optional[BatchRequest], Optional[str]]]:
+    """
+    Parse the input JSONL lazily.
+
+    Yields:
+        (request, None) for each valid line, or (None, error message) for an invalid one
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                prompt = record["prompt"]
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                yield None, f"line {line_number}: invalid request ({type(e).__name__}: {e})"
+                continue
+            raw_attachments = record.get("attachments", [])
+            if not isinstance(raw_attachments, list) or not all(isinstance(a, str) for a in raw_attachments):
+                yield None, f"line {line_number}: invalid request (attachments must be a list of paths)"
+                continue
+            attachments = [
+                attachment if os.path.isabs(attachment) else os.path.join(base_dir, attachment)
+                for attachment in raw_attachments
+            ]
+            yield BatchRequest(
+                request_id=str(record.get("id", f"line-{line_number}")),
+                prompt=prompt,
+                attachments=attachments,
+                model_name=record.get("model"),
+                max_attempts=record.get("max_attempts"),
+            ), None
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """
+    Return the IDs of the requests already in the output file.
+
+    Retryable results (failed LLM calls) do not count, so those requests run again.
+    A last line cut off by an interrupted run is removed so that appending resumes
+    on a clean line; that request runs again.
+    """
+    if not os.path.exists(path):
+        return set()
+    done: Set[str] = set()
+    valid_length = 0
+    with open(path, "rb") as f:
+        for raw_line in f:
+            if not raw_line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(raw_line)
+                request_id = str(record["id"])
+            except (json.JSONDecodeError, KeyError, TypeError, UnicodeDecodeError):
+                break
+            if record.get("retryable"):
+                done.discard(request_id)
+            else:
+                done.add(request_id)
+            valid_length += len(raw_line)
+    if valid_length < os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(valid_length)
+    return done
+
+
+def run_request(
+    request: BatchRequest,
+    base_config: PipelineConfig,
+    summarize: bool = True,
+    include_log: bool = False,
+    trace_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the file context of a request and run the pipeline on it.
+
+    With ``trace_dir``, the stage timings are written there as ``<id>.trace.json``
+    (Chrome trace format).
+
+    Returns:
+        The JSON-serializable result record
+    """
+    start = time.perf_counter()
+    config = dataclasses.replace(
+        base_config,
+        model_name=request.model_name or base_config.model_name,
+        max_attempts=request.max_attempts or base_config.max_attempts
+    )
+    record: Dict[str, Any] = {"id": request.request_id, "prompt": request.prompt, "model": config.model_name}
+    log_messages: List[str] = []
+
+    def log(message: str, level: str = "info") -> None:
+        if include_log:
+            log_messages.append(f"[{level.upper()}] {message}" if level != "info" else message)
+
+    try:
+        with trace_request(request.request_id) if trace_dir else nullcontext() as recorder:
+            files = [LocalFile.from_path(path) for path in request.attachments]
+            file_context = parse_files_to_context_string(
+                files,
+                summarize=summarize,
+                char_budget=DEFAULT_SUMMARY_CHAR_BUDGET,
+                query=request.prompt,
+                retrieval_token_budget=DEFAULT_RETRIEVAL_TOKEN_BUDGET,
+                model_name=config.model_name
+            )
+            result = run_generation_pipeline(request.prompt, file_context, config, log=log)
+        if recorder is not None:
+            trace_path = os.path.join(trace_dir, re.sub(r"[^\w.-]", "_", request.request_id) + ".trace.json")
+            recorder.write(trace_path)
+            record["trace"] = trace_path
+        record.update(
+            success=result.success,
+            cancelled=result.cancelled,
+            retryable=result.llm_error or result.overloaded,
+            attempts=result.attempt,
+            max_attempts=result.max_attempts,
+            code=result.generated_code,
+            issues=result.analysis_issues,
+        )
+    except Exception as e:
+        record.update(success=False, cancelled=False, retryable=False, error=f"{type(e).__name__}: {e}")
+    record["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    if include_log:
+        record["log"] = log_messages
+    return record
+
+
+def _write_record(output: TextIO, record: Dict[str, Any]) -> None:
+    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    output.flush()
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    base_config: PipelineConfig,
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    resume: bool = False,
+    summarize: bool = True,
+    include_log: bool = False,
+    trace_dir: Optional[str] = None,
+    metrics_path: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Run every request of ``input_path`` and append the results to ``output_path``.
+
+    At most ``concurrency`` requests are read ahead of the results, so memory stays
+    bounded whatever the size of the input. Cancelled requests (e.g. on Ctrl-C)
+    are not written and run again on resume; retryable ones are written, flagged,
+    and also run again on resume. With ``metrics_path``, the stage
+    timing histograms are rewritten there (Prometheus text format) after each result.
+
+    Returns:
+        Counts of written, succeeded, failed, retryable, skipped and invalid requests
+    """
+    done = load_checkpoint(output_path) if resume else set()
+    counts = {"written": 0, "succeeded": 0, "failed": 0, "retryable": 0, "skipped": 0, "invalid": 0}
+    token = CancellationToken()
+    config = dataclasses.replace(base_config, cancel_token=token, session_id=BATCH_SESSION_ID)
+    seen: Set[str] = set()
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as output, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as executor:
+        pending: Set[Future] = set()
+
+        def collect(finished: Set[Future]) -> None:
+            for future in finished:
+                record = future.result()
+                if record.get("cancelled"):
+                    continue
+                _write_record(output, record)
+                if metrics_path:
+                    write_prometheus_file(metrics_path)
+                counts["written"] += 1
+                if record.get("retryable"):
+                    counts["retryable"] += 1
+                    outcome = "LLM call failed (retryable)"
+                else:
+                    counts["succeeded" if record.get("success") else "failed"] += 1
+                    outcome = "ok" if record.get("success") else "issues"
+                print(
+                    f"[{counts['written']}] {record['id']}: {outcome} in {record['elapsed_seconds']:.1f}s",
+                    file=sys.stderr
+                )
+
+        try:
+            for request, error in read_requests(input_path):
+                if request is None:
+                    counts["invalid"] += 1
+                    print(f"Skipping {error}", file=sys.stderr)
+                    continue
+                if request.request_id in done or request.request_id in seen:
+                    counts["skipped"] += 1
+                    continue
+                seen.add(request.request_id)
+                while len(pending) >= max(1, concurrency):
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending.add(executor.submit(run_request, request, config, summarize, include_log, trace_dir))
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        except KeyboardInterrupt:
+            interrupted = token.cancel("batch interrupted")
+            print(f"Interrupted; cancelled {len(interrupted)} in-flight operation(s). Rerun with --resume to continue.",
+                  file=sys.stderr)
+            finished, _ = wait(pending)
+            collect(finished)
+    return counts
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the generate -> analyze -> retry pipeline over a JSONL file of prompts.")
+    parser.add_argument("input", help="JSONL file with one request per line ({\"id\", \"prompt\", \"attachments\"})")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file receiving one result per request")
+    parser.add_argument("--model", default=DEFAULT_BATCH_MODEL, help="Model used unless a request names its own")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_BATCH_CONCURRENCY, help="Requests run at the same time")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="Generation attempts per request")
+    parser.add_argument("--resume", action="store_true", help="Skip requests already in the output file and append to it")
+    parser.add_argument("--speculative", type=int, default=0, metavar="K", help="Candidates per round (speculative mode)")
+    parser.add_argument("--conversational-retries", action="store_true", help="Retries send only issues and a diff")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for full responses instead of streaming")
+    parser.add_argument(
+        "--stop-at-first-block", action="store_true",
+        help="Stop streaming at the first complete code block (code split across blocks is cut)"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Also profile the code in the CodeAct sandbox and feed slow functions and memory peaks back"
+    )
+    parser.add_argument("--bypass-cache", action="store_true", help="Do not read or write the LLM response cache")
+    parser.add_argument("--no-summarize", action="store_true", help="Send CSV/Excel attachments in full")
+    parser.add_argument("--include-log", action="store_true", help="Add the pipeline log to each result")
+    parser.add_argument("--metrics-file", help="Write per-stage timing histograms here (Prometheus text format)")
+    parser.add_argument("--trace-dir", help="Write a Chrome trace of each request to this directory")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    load_dotenv(dotenv_path=os.path.join(project_root, 'config', '.env'))
+    args = parse_args(argv)
+    config = PipelineConfig(
+        model_name=args.model,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        max_attempts=args.max_attempts,
+        stream_responses=not args.no_stream,
+        stop_at_first_block=args.stop_at_first_block,
+        bypass_cache=args.bypass_cache,
+        speculative_candidates=args.speculative,
+        conversational_retries=args.conversational_retries,
+        profile_performance=args.profile
+    )
+    if args.metrics_file:
+        enable_metrics()
+    if args.trace_dir:
+        os.makedirs(args.trace_dir, exist_ok=True)
+    start = time.perf_counter()
+    counts = run_batch(
+        args.input, args.output, config,
+        concurrency=args.concurrency,
+        resume=args.resume,
+        summarize=not args.no_summarize,
+        include_log=args.include_log,
+        trace_dir=args.trace_dir,
+        metrics_path=args.metrics_file
+    )
+    print(
+        f"Done in {time.perf_counter() - start:.1f}s: {counts['written']} written "
+        f"({counts['succeeded']} passed, {counts['failed']} with issues, "
+        f"{counts['retryable']} failed LLM calls to retry with --resume), "
+        f"{counts['skipped']} skipped (already done or duplicate ID), {counts['invalid']} invalid -> {args.output}",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Cooperative cancellation of generation work.
+
+A CancellationToken is created per pipeline run and passed down to every blocking
+operation (LLM calls, analyzer subprocesses, sandbox executions). Operations
+register a callback for as long as they run; cancelling the token runs those
+callbacks at once, from the cancelling thread, so a request is abandoned and a
+process group killed within milliseconds rather than after it completes. The
+token records what each callback interrupted, to report what was cancelled.
+"""
+
+import asyncio
+import itertools
+import os
+import signal
+import subprocess
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class OperationCancelled(Exception):
+    """Raised by an operation interrupted through its CancellationToken."""
+
+
+class CancellationToken:
+    """Thread-safe cancellation flag with callbacks for in-flight operations."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: Dict[int, Tuple[str, Callable[[], None]]] = {}
+        self._ids = itertools.count()
+        self._children: "weakref.WeakSet[CancellationToken]" = weakref.WeakSet()
+        self.reason = ""
+        self.cancelled_operations: List[str] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> List[str]:
+        """
+        Cancel the token and interrupt every registered operation.
+
+        Returns:
+            Labels of the operations that were in flight
+        """
+        with self._lock:
+            if self._event.is_set():
+                return list(self.cancelled_operations)
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+            children = list(self._children)
+            self.cancelled_operations.extend(label for label, _ in callbacks)
+        for _, callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+        for child in children:
+            self.cancelled_operations.extend(child.cancel(reason))
+        return list(self.cancelled_operations)
+
+    def child(self) -> "CancellationToken":
+        """
+        Create a token that is cancelled along with this one but can also be cancelled alone.
+
+        Used to abandon one branch of the work (e.g. a losing speculative candidate)
+        without cancelling the whole run. Children are held weakly, so tokens of
+        finished branches don't accumulate on a long-lived parent.
+        """
+        child = CancellationToken()
+        with self._lock:
+            cancelled = self._event.is_set()
+            if not cancelled:
+                self._children.add(child)
+        if cancelled:
+            child.cancel(self.reason)
+        return child
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise OperationCancelled(self.reason)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the token is cancelled or ``timeout`` expires; True if cancelled."""
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def on_cancel(self, label: str, callback: Callable[[], None]) -> Iterator[None]:
+        """
+        Run ``callback`` if the token is cancelled while the block runs.
+
+        If the token is already cancelled, the callback runs immediately.
+        """
+        with self._lock:
+            registered = not self._event.is_set()
+            if registered:
+                callback_id = next(self._ids)
+                self._callbacks[callback_id] = (label, callback)
+        if not registered:
+            self.cancelled_operations.append(label)
+            callback()
+        try:
+            yield
+        finally:
+            if registered:
+                with self._lock:
+                    self._callbacks.pop(callback_id, None)
+
+
+def run_in_thread(call: Callable[[], str], cancel_token: Optional[CancellationToken], label: str) -> str:
+    """
+    Run a blocking call so that cancelling the token returns control at once.
+
+    The call runs in a daemon thread; on cancellation it is abandoned and
+    OperationCancelled is raised. Calls that check the token themselves (e.g.
+    between streamed chunks) stop and release their resources shortly after.
+    """
+    if cancel_token is None:
+        return call()
+    cancel_token.raise_if_cancelled()
+
+    wake = threading.Event()
+    outcome: Dict[str, object] = {}
+
+    def target() -> None:
+        try:
+            outcome["value"] = call()
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            wake.set()
+
+    threading.Thread(target=target, name=f"cancellable-{label}", daemon=True).start()
+    with cancel_token.on_cancel(label, wake.set):
+        wake.wait()
+    if "error" in outcome:
+        raise outcome["error"]
+    if "value" not in outcome:
+        raise OperationCancelled(cancel_token.reason)
+    return outcome["value"]
+
+
+def _kill_process_group(process: subprocess.Popen) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_process(
+    command: List[str],
+    cancel_token: Optional[CancellationToken] = None,
+    label: Optional[str] = None,
+    **kwargs
+) -> subprocess.CompletedProcess:
+    """
+    ``subprocess.run(command, capture_output=True, text=True)`` that a token can kill.
+
+    The command runs in its own session (process group); cancelling the token kills
+    the whole group, children included, and raises OperationCancelled.
+    """
+    if cancel_token is None:
+        return subprocess.run(command, capture_output=True, text=True, check=False, **kwargs)
+    cancel_token.raise_if_cancelled()
+
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True, **kwargs
+    )
+    with cancel_token.on_cancel(label or f"{os.path.basename(command[0])} (pid {process.pid})", lambda: _kill_process_group(process)):
+        stdout, stderr = process.communicate()
+    if cancel_token.cancelled:
+        raise OperationCancelled(cancel_token.reason)
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+
+async def await_cancellable(awaitable, cancel_token: Optional[CancellationToken], label: str):
+    """
+    Await ``awaitable`` as a task that cancelling the token cancels.
+
+    Task cancellation propagates into the awaited I/O (e.g. an HTTP request), which
+    is aborted; OperationCancelled is raised instead of CancelledError.
+    """
+    if cancel_token is None:
+        return await awaitable
+    if cancel_token.cancelled:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise OperationCancelled(cancel_token.reason)
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(awaitable)
+    with cancel_token.on_cancel(label, lambda: loop.call_soon_threadsafe(task.cancel)):
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if cancel_token.cancelled:
+                raise OperationCancelled(cancel_token.reason)
+            raise
@@ -0,0 +1,85 @@
+"""
+Generated code, parsed once and shared by every analysis of an attempt.
+
+Extraction validated the code with ``ast.parse``, then each analyzer split, counted
+and scanned the same source again with ``str.split``/``str.count``. A
+CodeArtifact is built once per attempt and carries the source with its content hash,
+and computes on first use, once, its AST, lines and tokens. Every in-process
+analysis reads those instead of re-scanning the text; imports, definitions and
+call sites are collected from the AST by ``codeact_wrapper.code_facts``.
+"""
+
+import ast
+import hashlib
+import io
+import tokenize
+from collections import Counter
+from dataclasses import dataclass
+from functools import cached_property
+from typing import FrozenSet, List, Optional, Union
+
+
+@dataclass(eq=False)
+class CodeArtifact:
+    """Source code with lazily computed, cached views of it."""
+    source: str
+
+    @cached_property
+    def content_hash(self) -> str:
+        return hashlib.sha256(self.source.encode("utf-8")).hexdigest()
+
+    @cached_property
+    def tree(self) -> Optional[ast.Module]:
+        """The module AST, or None if the source does not parse."""
+        try:
+            return ast.parse(self.source)
+        except (SyntaxError, ValueError):
+            return None
+
+    @cached_property
+    def nodes(self) -> List[ast.AST]:
+        """Every node of the AST, walked once."""
+        return list(ast.walk(self.tree)) if self.tree is not None else []
+
+    @cached_property
+    def node_counts(self) -> Counter:
+        """Number of AST nodes of each type, by class name (e.g. ``"If"``)."""
+        return Counter(type(node).__name__ for node in self.nodes)
+
+    @cached_property
+    def lines(self) -> List[str]:
+        return self.source.split("\n")
+
+    @cached_property
+    def tokens(self) -> List[tokenize.TokenInfo]:
+        """The token stream, or as much of it as tokenizes."""
+        tokens: List[tokenize.TokenInfo] = []
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(self.source).readline):
+                tokens.append(token)
+        except (tokenize.TokenError, SyntaxError):
+            pass
+        return tokens
+
+    @cached_property
+    def names(self) -> FrozenSet[str]:
+        """Identifiers and dotted names (``os.system``) used in the code."""
+        names = set()
+        chain: List[str] = []
+        after_dot = False
+        for token in self.tokens:
+            if token.type == tokenize.NAME:
+                chain = chain + [token.string] if after_dot else [token.string]
+                names.add(".".join(chain))
+                after_dot = False
+            elif token.type == tokenize.OP and token.string == "." and chain:
+                after_dot = True
+            else:
+                chain = []
+                after_dot = False
+        return frozenset(names)
+
+
+def as_code_artifact(code: Union[str, CodeArtifact]) -> CodeArtifact:
+    """Return ``code`` if it already is an artifact, else wrap the source in one."""
+    return code if isinstance(code, CodeArtifact) else CodeArtifact(code)
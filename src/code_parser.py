@@ -1,43 +1,289 @@
-import re
-from typing import Optional
+"""
+Extraction of Python code from LLM responses.
 
-def extract_python_code(llm_response: str) -> Optional[str]:
+Responses are scanned once, line by line, by a fence state machine that collects
+every fenced block. The same scanner consumes a complete response or the chunks
+of a stream. Python blocks (or bare blocks, when none is tagged) are merged and
+the result is validated with ``ast.parse``.
+"""
+
+import ast
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Union
+
+from src.code_artifact import CodeArtifact
+
+PYTHON_LANGUAGES = ("python", "py", "python3", "py3")
+FENCE_CHARS = "`~"
+MIN_FENCE_LENGTH = 3
+
+
+@dataclass
+class CodeBlock:
+    """A fenced block of a response."""
+    language: str
+    code: str
+    start_line: int
+    closed: bool = True
+
+    @property
+    def is_python(self) -> bool:
+        return self.language in PYTHON_LANGUAGES
+
+
+def _fence(stripped: str) -> Optional[str]:
+    """Return the fence (e.g. ``` or ~~~~) opening a stripped line, or None."""
+    if len(stripped) < MIN_FENCE_LENGTH or stripped[0] not in FENCE_CHARS:
+        return None
+    char = stripped[0]
+    length = len(stripped) - len(stripped.lstrip(char))
+    return char * length if length >= MIN_FENCE_LENGTH else None
+
+
+class FenceScanner:
+    """
+    Single-pass state machine over the lines of a response.
+
+    Outside a block, a line opening with three or more backticks (or tildes) starts
+    one; its info string gives the language. Inside, only a line made of the same
+    fence character, at least as long as the opening fence, closes it, so shorter
+    fences nested in the code are kept. Chunks are split on newlines as they are
+    fed, so every character is looked at once whatever the chunking.
+
+    A line that opens with a fence and also ends with it (```` ```python x = 1``` ````)
+    is a complete single-line block, backticks inside it included; a leading
+    Python language tag is taken as its language. Any other
+    opening line with a backtick in its info string is inline code, not a fence.
+    """
+
+    def __init__(self):
+        self.blocks: List[CodeBlock] = []
+        self._pending: List[str] = []
+        self._line_number = 0
+        self._fence: Optional[str] = None
+        self._language = ""
+        self._start_line = 0
+        self._block_lines: List[str] = []
+
+    @property
+    def in_block(self) -> bool:
+        return self._fence is not None
+
+    def feed(self, chunk: str) -> List[CodeBlock]:
+        """
+        Consume a chunk of the response.
+
+        Returns:
+            The blocks closed by this chunk.
+        """
+        closed_before = len(self.blocks)
+        lines = chunk.split("\n")
+        if len(lines) > 1:
+            self._pending.append(lines[0])
+            self._process_line("".join(self._pending))
+            for line in lines[1:-1]:
+                self._process_line(line)
+            self._pending = [lines[-1]] if lines[-1] else []
+        elif chunk:
+            self._pending.append(chunk)
+        return self.blocks[closed_before:]
+
+    def pending_closes_block(self) -> bool:
+        """Tell whether the unterminated last line is a closing fence."""
+        if not self.in_block or not self._pending:
+            return False
+        return self._closes_block("".join(self._pending).strip())
+
+    def flush_line(self) -> List[CodeBlock]:
+        """Process the unterminated last line as a complete line."""
+        closed_before = len(self.blocks)
+        if self._pending:
+            self._process_line("".join(self._pending))
+            self._pending = []
+        return self.blocks[closed_before:]
+
+    def close(self) -> List[CodeBlock]:
+        """
+        End the response; a block left open (e.g. cut by max_tokens) is kept as unclosed.
+
+        Returns:
+            All blocks of the response.
+        """
+        self.flush_line()
+        if self.in_block:
+            self.blocks.append(CodeBlock(self._language, "\n".join(self._block_lines).strip(), self._start_line, closed=False))
+            self._fence = None
+        return self.blocks
+
+    def _closes_block(self, stripped: str) -> bool:
+        fence = _fence(stripped)
+        return (
+            fence is not None and fence == stripped
+            and fence[0] == self._fence[0] and len(fence) >= len(self._fence)
+        )
+
+    def _process_line(self, line: str) -> None:
+        self._line_number += 1
+        stripped = line.strip()
+        if self._fence is None:
+            fence = _fence(stripped)
+            if fence is None:
+                return
+            rest = stripped[len(fence):]
+            if rest.endswith(fence) and rest[:-len(fence)].strip():
+                self._single_line_block(rest[:-len(fence)].strip())
+            elif "`" not in rest:
+                info = rest.strip().split()
+                self._fence = fence
+                self._language = info[0].lower() if info else ""
+                self._start_line = self._line_number
+                self._block_lines = []
+            return
+        if self._closes_block(stripped):
+            self.blocks.append(CodeBlock(self._language, "\n".join(self._block_lines).strip(), self._start_line))
+            self._fence = None
+            return
+        self._block_lines.append(line)
+
+    def _single_line_block(self, content: str) -> None:
+        language, _, code = content.partition(" ")
+        if language.lower() in PYTHON_LANGUAGES:
+            self.blocks.append(CodeBlock(language.lower(), code.strip(), self._line_number))
+        else:
+            self.blocks.append(CodeBlock("", content, self._line_number))
+
+
+def scan_code_blocks(response: Union[str, Iterable[str]]) -> List[CodeBlock]:
+    """
+    Collect every fenced block of a response.
+
+    Args:
+        response: The full response, or an iterable of its streamed chunks
+
+    Returns:
+        The blocks in order; the last one may be unclosed if the response was cut
+    """
+    scanner = FenceScanner()
+    for chunk in ([response] if isinstance(response, str) else response):
+        scanner.feed(chunk)
+    return scanner.close()
+
+
+def python_code_blocks(blocks: List[CodeBlock]) -> List[CodeBlock]:
+    """The Python blocks among ``blocks``, or the untagged ones if none is tagged."""
+    python_blocks = [block for block in blocks if block.is_python and block.code]
+    if python_blocks:
+        return python_blocks
+    return [block for block in blocks if not block.language and block.code]
+
+
+def _looks_like_code(artifact: CodeArtifact) -> bool:
+    """An unfenced response is taken as code only if it parses and is more than one expression."""
+    tree = artifact.tree
+    if tree is None or not tree.body:
+        return False
+    return not (len(tree.body) == 1 and isinstance(tree.body[0], ast.Expr))
+
+
+def extract_code_artifact(llm_response: Union[str, Iterable[str]], merge: bool = True) -> Optional[CodeArtifact]:
+    """
+    Extracts Python code from the LLM's response as a CodeArtifact.
+
+    Every ```python block (or, if none is tagged, every bare ``` block) is collected
+    and, with ``merge``, the blocks are joined in order so that code split across
+    several blocks is not truncated. The result is validated with ``ast.parse``: if
+    the merged code does not parse (e.g. the blocks are alternatives), the first
+    block that parses is returned instead, and if none does, the code is returned
+    as is so the analyzers report the syntax error. A response without fences is
+    returned whole only if it parses as Python. The AST built for the validation
+    stays on the artifact for the analyses.
+
+    Args:
+        llm_response: The full response, or an iterable of its streamed chunks
+        merge: Join all Python blocks instead of taking the first one
+
+    Returns:
+        The code, or None if the response contains none
+    """
+    blocks = scan_code_blocks(llm_response)
+    candidates = python_code_blocks(blocks)
+    if not candidates:
+        if blocks:
+            return None
+        text = llm_response.strip() if isinstance(llm_response, str) else ""
+        artifact = CodeArtifact(text)
+        return artifact if text and _looks_like_code(artifact) else None
+
+    if merge and len(candidates) > 1:
+        merged = CodeArtifact("\n\n".join(block.code for block in candidates))
+        if merged.tree is not None:
+            return merged
+    artifacts = [CodeArtifact(block.code) for block in candidates]
+    for artifact in artifacts:
+        if artifact.tree is not None:
+            return artifact
+    return artifacts[0]
+
+
+def extract_python_code(llm_response: Union[str, Iterable[str]], merge: bool = True) -> Optional[str]:
     """
     Extracts Python code from the LLM's response.
-    It looks for code enclosed in ```python ... ``` or ``` ... ```.
-    If multiple blocks are found, it returns the first one.
-    If no blocks are found but the response seems to be raw code, it returns the whole response.
-    """
-    # Pattern to find code blocks like ```python ... ```
-    python_block_pattern = re.compile(r"```python\s*(.*?)\s*```", re.DOTALL)
-    # Pattern to find generic code blocks like ``` ... ```
-    generic_block_pattern = re.compile(r"```\s*(.*?)\s*```", re.DOTALL)
-
-    match = python_block_pattern.search(llm_response)
-    if match:
-        return match.group(1).strip()
-
-    match = generic_block_pattern.search(llm_response)
-    if match:
-        return match.group(1).strip()
-
-    # If no markdown code blocks are found, assume the entire response might be code,
-    # especially if the prompt is very strict.
-
-    # This is a fallback and might need refinement based on llm behavior.
-   
-    # A simple check: if it contains typical Python keywords and doesn't look like conversational text.
-    # For now, if no blocks, return the whole thing if it's not too long and doesn't contain "sorry", "I can't", etc.
-   
-    # A simpler heuristic: if it contains 'def ' or 'import ' or 'class ' and is relatively short.
-    # However, the system prompt asks for ```python ... ```, so this fallback should ideally not be needed often.
-
-    if llm_response and not llm_response.startswith("```"): # A  very basic check
-        # Check if it looks like code (e.g., contains 'def ' or 'import ' or consists of multiple lines with indentation)
-        # Totally weak heuristic. The primary expectation is markdown blocks.
-        lines = llm_response.strip().split('\n')
-        if any(kw in llm_response for kw in ['def ', 'import ', 'class ', 'print(']) or \
-           (len(lines) > 1 and any(line.startswith(' ') for line in lines)):
-            return llm_response.strip()
-            
-    return None
\ No newline at end of file
+
+    Returns the source of extract_code_artifact (see there), or None.
+    """
+    artifact = extract_code_artifact(llm_response, merge)
+    return artifact.source if artifact is not None else None
+
+
+class IncrementalCodeBlockParser:
+    """
+    Incrementally scans streamed LLM output for the first fenced Python code block.
+
+    Chunks are fed as they arrive to a FenceScanner, so each character is looked
+    at once. As soon as the closing fence of the first ```python (or bare ```)
+    block has been received, feed() returns the extracted code and the caller can
+    stop the generation.
+    """
+
+    def __init__(self):
+        self.code: Optional[str] = None
+        self._parts: List[str] = []
+        self._scanner = FenceScanner()
+
+    @property
+    def text(self) -> str:
+        """All text received so far."""
+        return "".join(self._parts)
+
+    @property
+    def done(self) -> bool:
+        """True once the first code block has been closed."""
+        return self.code is not None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Consume the next chunk of the response.
+
+        Returns:
+            The extracted code once the first block is complete, otherwise None.
+        """
+        if self.done or not chunk:
+            return self.code
+        self._parts.append(chunk)
+        self._take(self._scanner.feed(chunk))
+        # A closing fence is complete even before its trailing newline arrives
+        if not self.done and self._scanner.pending_closes_block():
+            self._take(self._scanner.flush_line())
+        return self.code
+
+    def close(self) -> Optional[str]:
+        """Flush the last, unterminated line and return the code found, if any."""
+        if not self.done:
+            self._take(self._scanner.flush_line())
+        return self.code
+
+    def _take(self, blocks: List[CodeBlock]) -> None:
+        for block in blocks:
+            if block.is_python or not block.language:
+                self.code = block.code
+                return
@@ -1,12 +1,328 @@
+import ast
+import difflib
+import io
+import math
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 import pandas as pd
-from typing import List, Any
+from typing import List, Any, Dict, Optional, Tuple
 
-def parse_files_to_context_string(files: List[Any]) -> str:
+from src.arrow_reader import ARROW_IPC_EXTENSIONS, PARQUET_EXTENSIONS, summarize_arrow_file
+from src.context_summarizer import DEFAULT_SUMMARY_CHAR_BUDGET, summarize_csv_with_metadata
+from src.excel_reader import join_excel_sheets, read_excel_sheets
+from src.file_context_cache import FileContextKey, ParsedFile, get_file_context_cache, hash_file_content
+from src.token_budget import (
+    PRIORITY_FAILED_CODE, PRIORITY_FILE_CONTEXT, PRIORITY_ISSUES, PRIORITY_REQUEST, PRIORITY_TEMPLATE,
+    PromptSection, count_tokens, fit_sections_to_budget, render_prompt_sections
+)
+
+# Raw Excel content is capped so a large workbook cannot crowd out the rest of the prompt
+RAW_EXCEL_CHAR_BUDGET = 200_000
+# Files parsed at the same time; pandas releases the GIL for most of CSV parsing
+MAX_PARSE_WORKERS = 4
+
+# Retrieval over text/code attachments: chunk sizes and default prompt budget
+RETRIEVAL_CHUNK_LINES = 40
+DEFAULT_RETRIEVAL_TOKEN_BUDGET = 4000
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_CASE_PATTERN = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+@dataclass
+class ContextChunk:
+    """A contiguous range of lines of an attached file."""
+    filename: str
+    start_line: int
+    end_line: int
+    text: str
+    # Identifies the file when several attachments share a name
+    file_index: int = 0
+
+def _tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens for retrieval. Identifiers are also split into their
+    snake_case and camelCase parts so "load_sales_data" matches "sales data".
+    """
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(text):
+        tokens.append(word.lower())
+        parts = [part.lower() for piece in word.split("_") for part in _CAMEL_CASE_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+def chunk_text_by_lines(filename: str, text: str, lines_per_chunk: int = RETRIEVAL_CHUNK_LINES) -> List[ContextChunk]:
+    """
+    Splits a text into chunks of ``lines_per_chunk`` lines.
+    """
+    lines = text.splitlines()
+    return [
+        ContextChunk(filename, start + 1, min(start + lines_per_chunk, len(lines)), "\n".join(lines[start:start + lines_per_chunk]))
+        for start in range(0, len(lines), lines_per_chunk)
+    ]
+
+def chunk_python_source(filename: str, source: str, max_lines: int = RETRIEVAL_CHUNK_LINES * 2) -> List[ContextChunk]:
+    """
+    Splits Python source along top-level AST nodes: each function or class is one
+    chunk, and the statements between them are grouped together. Nodes longer than
+    ``max_lines`` are split by lines. Falls back to line chunks on syntax errors.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return chunk_text_by_lines(filename, source)
+
+    lines = source.splitlines()
+    ranges = []
+    group_start = None
+    for node in tree.body:
+        start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+        end = node.end_lineno or node.lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if group_start is not None:
+                ranges.append((group_start, start - 1))
+                group_start = None
+            ranges.append((start, end))
+        elif group_start is None:
+            group_start = start
+    if group_start is not None:
+        ranges.append((group_start, len(lines)))
+
+    chunks = []
+    for start, end in ranges:
+        for chunk_start in range(start, end + 1, max_lines):
+            chunk_end = min(chunk_start + max_lines - 1, end)
+            text = "\n".join(lines[chunk_start - 1:chunk_end])
+            if text.strip():
+                chunks.append(ContextChunk(filename, chunk_start, chunk_end, text))
+    return chunks
+
+class BM25Index:
+    """
+    In-memory BM25 index over context chunks.
+    """
+
+    def __init__(self, chunks: List[ContextChunk], k1: float = BM25_K1, b: float = BM25_B):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(_tokenize(chunk.text)) for chunk in chunks]
+        self.lengths = [sum(frequencies.values()) for frequencies in self.term_frequencies]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequencies: Counter = Counter()
+        for frequencies in self.term_frequencies:
+            document_frequencies.update(frequencies.keys())
+        count = len(chunks)
+        self.idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+
+    def score(self, query: str) -> List[float]:
+        """
+        Returns the BM25 score of every chunk for the query, in chunk order.
+        """
+        terms = set(_tokenize(query))
+        scores = []
+        for frequencies, length in zip(self.term_frequencies, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            scores.append(sum(
+                self.idf[term] * frequencies[term] * (self.k1 + 1) / (frequencies[term] + norm)
+                for term in terms if term in frequencies
+            ))
+        return scores
+
+def select_relevant_chunks(
+    chunks: List[ContextChunk],
+    query: str,
+    token_budget: int,
+    model_name: Optional[str] = None
+) -> List[ContextChunk]:
+    """
+    Picks the best-scoring chunks for the query that fit within the token budget.
+
+    Chunks sharing no term with the query are left out, so the budget is not filled
+    with unrelated text; if no chunk matches at all, chunks are taken in file order.
+
+    Returns:
+        The selected chunks in file and line order.
+    """
+    if not chunks:
+        return []
+    scores = BM25Index(chunks).score(query)
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+    any_match = scores[ranked[0]] > 0
+    selected = []
+    used = 0
+    for i in ranked:
+        if any_match and scores[i] <= 0:
+            break
+        tokens = count_tokens(chunks[i].text, model_name)
+        if used + tokens > token_budget:
+            continue
+        selected.append(i)
+        used += tokens
+    return [chunks[i] for i in sorted(selected)]
+
+def retrieve_file_excerpts(
+    texts: Dict[int, Tuple[str, str]],
+    query: str,
+    token_budget: int = DEFAULT_RETRIEVAL_TOKEN_BUDGET,
+    model_name: Optional[str] = None
+) -> Dict[int, str]:
+    """
+    Selects the chunks of text and code attachments most relevant to the query.
+
+    If every file fits within the token budget nothing is selected and the files are
+    included in full. Otherwise all files are chunked (``.py`` files along AST nodes,
+    others by lines), ranked together with BM25 and the top chunks that fit the
+    budget are kept.
+
+    Args:
+        texts: Mapping from file index (e.g. the position of the upload) to the file's
+            (name, content). Names may repeat, e.g. ``a/utils.py`` and ``b/utils.py``.
+        query: The user's request.
+        token_budget: Maximum tokens of the selected excerpts, over all files.
+        model_name: Name of the model, used to count tokens.
+
+    Returns:
+        Mapping from file index to the rendered excerpts, for the files that were cut.
+    """
+    if sum(count_tokens(text, model_name) for _, text in texts.values()) <= token_budget:
+        return {}
+
+    chunks = []
+    for index, (filename, text) in texts.items():
+        chunker = chunk_python_source if filename.endswith('.py') else chunk_text_by_lines
+        for chunk in chunker(filename, text):
+            chunk.file_index = index
+            chunks.append(chunk)
+    selected = select_relevant_chunks(chunks, query, token_budget, model_name)
+
+    excerpts = {}
+    for index, (filename, text) in texts.items():
+        file_chunks = [chunk for chunk in selected if chunk.file_index == index]
+        total_lines = len(text.splitlines())
+        if not file_chunks:
+            excerpts[index] = f"[No part of this file ({total_lines} lines) was relevant enough to include.]\n"
+            continue
+        ranges = ", ".join(f"{chunk.start_line}-{chunk.end_line}" for chunk in file_chunks)
+        parts = [f"[Excerpts relevant to the request: lines {ranges} of {total_lines}]\n"]
+        parts.extend(f"# --- lines {chunk.start_line}-{chunk.end_line} ---\n{chunk.text}\n" for chunk in file_chunks)
+        excerpts[index] = "".join(parts)
+    return excerpts
+
+def _table_metadata(df: pd.DataFrame) -> Dict[str, Any]:
+    return {
+        "rows": len(df),
+        "columns": [str(column) for column in df.columns],
+        "dtypes": {str(column): str(dtype) for column, dtype in df.dtypes.items()},
+    }
+
+def parse_file(filename: str, data: bytes, summarize: bool = False, char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET) -> ParsedFile:
+    """
+    Parses one file into its block of the LLM context, with metadata about its content.
+
+    Args:
+        filename: Name of the file; its extension selects the parser.
+        data: Raw content of the file.
+        summarize: Summarize CSV and Excel files instead of dumping them in full
+            (Parquet and Arrow files are always summarized).
+        char_budget: Maximum characters of a summary (see parse_files_to_context_string).
+
+    Returns:
+        ParsedFile whose context is the "START OF FILE" ... "END OF FILE" block.
+    """
+    context = f"--- START OF FILE: {filename} ---\n"
+    metadata: Dict[str, Any] = {}
+    try:
+        if filename.endswith('.csv'):
+            if summarize:
+                summary, metadata = summarize_csv_with_metadata(io.BytesIO(data), char_budget)
+                context += summary
+            else:
+                df = pd.read_csv(io.BytesIO(data))
+                metadata = _table_metadata(df)
+                context += df.to_string() + "\n"
+        elif filename.endswith('.xlsx'):
+            # Sheets are streamed in turn, sharing the budget and reading only what fits
+            excel_budget = char_budget if summarize else RAW_EXCEL_CHAR_BUDGET
+            sheets = read_excel_sheets(data, summarize=summarize, char_budget=excel_budget)
+            metadata = {"sheets": {sheet_name: sheet_metadata for sheet_name, _, sheet_metadata in sheets}}
+            context += join_excel_sheets(sheets, excel_budget)
+        elif filename.endswith(PARQUET_EXTENSIONS + ARROW_IPC_EXTENSIONS):
+            # Always summarized from the file metadata and sampled row groups; the
+            # upload buffer is wrapped without a copy and the columns are never loaded
+            summary, metadata = summarize_arrow_file(filename, data, char_budget)
+            context += summary
+        elif filename.endswith(('.txt', '.py')):
+            content = data.decode("utf-8")
+            metadata = {"lines": content.count("\n") + 1, "chars": len(content)}
+            context += content + "\n"
+        else:
+            context += "Unsupported file type.\n"
+    except Exception as e:
+        metadata = {"error": str(e)}
+        context += f"Error reading file: {e}\n"
+    context += f"--- END OF FILE: {filename} ---\n\n"
+    return ParsedFile(filename, context, metadata)
+
+def get_parsed_file(
+    file: Any,
+    summarize: bool = False,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET,
+    use_cache: bool = True
+) -> ParsedFile:
+    """
+    Returns the parsed form of an uploaded file, from the shared cache when the same
+    content was already parsed with the same settings.
+    """
+    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+    if not use_cache:
+        return parse_file(file.name, data, summarize, char_budget)
+
+    key = FileContextKey(hash_file_content(data), file.name, summarize, char_budget)
+    cache = get_file_context_cache()
+    parsed = cache.get(key)
+    if parsed is None:
+        parsed = parse_file(file.name, data, summarize, char_budget)
+        cache.put(key, parsed)
+    return parsed
+
+def parse_files_to_context_string(
+    files: List[Any],
+    summarize: bool = False,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET,
+    use_cache: bool = True,
+    max_workers: int = MAX_PARSE_WORKERS,
+    query: Optional[str] = None,
+    retrieval_token_budget: Optional[int] = None,
+    model_name: Optional[str] = None
+) -> str:
     """
     Parses a list of uploaded files (from Streamlit) into a single string for the LLM context.
+    Files are parsed concurrently and assembled in their original order; a file that
+    fails to parse is reported in its own block without affecting the others.
 
     Args:
         files: A list of Streamlit UploadedFile objects.
+        summarize: If True, CSV and Excel files are summarized (schema, stats, sample
+            rows) instead of being dumped in full. CSV files are streamed in chunks.
+        char_budget: Maximum characters of each file summary, split evenly between
+            the sheets of an Excel file. Only used when summarizing; raw Excel
+            content is capped at RAW_EXCEL_CHAR_BUDGET per file.
+        use_cache: Reuse earlier parses of the same content and settings, shared
+            across sessions, instead of parsing again.
+        max_workers: Maximum number of files parsed at the same time.
+        query: The user's request. With ``retrieval_token_budget``, only the parts of
+            .txt/.py files most relevant to it are included (see retrieve_file_excerpts).
+        retrieval_token_budget: Maximum tokens of text/code content, or None to include
+            those files in full.
+        model_name: Name of the model, used to count tokens.
 
     Returns:
         A formatted string containing the content of all files, or an empty string if no files.
@@ -14,62 +330,159 @@ def parse_files_to_context_string(files: List[Any]) -> str:
     if not files:
         return "No files were provided as context."
 
-    context_string = ""
-    for file in files:
-        filename = file.name
-        context_string += f"--- START OF FILE: {filename} ---\n"
+    excerpts: Dict[int, str] = {}
+    if query and retrieval_token_budget is not None:
+        texts = {}
+        for index, file in enumerate(files):
+            if file.name.endswith(('.txt', '.py')):
+                try:
+                    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+                    texts[index] = (file.name, data.decode("utf-8"))
+                except Exception:
+                    # Left to the regular parser, which reports the error
+                    continue
+        excerpts = retrieve_file_excerpts(texts, query, retrieval_token_budget, model_name)
+
+    def parse(index: int) -> str:
+        file = files[index]
         try:
-            if filename.endswith('.csv'):
-                df = pd.read_csv(file)
-                context_string += df.to_string() + "\n"
-            elif filename.endswith('.xlsx'):
-                # To read all sheets from an Excel file
-                xls = pd.ExcelFile(file)
-                for i, sheet_name in enumerate(xls.sheet_names):
-                    if i > 0:
-                        context_string += f"\n--- Content of sheet: {sheet_name} ---\n"
-                    df = pd.read_excel(xls, sheet_name=sheet_name)
-                    context_string += df.to_string() + "\n"
-            elif filename.endswith(('.txt', '.py')):
-                content = file.getvalue().decode("utf-8")
-                context_string += content + "\n"
-            else:
-                context_string += "Unsupported file type.\n"
+            if index in excerpts:
+                return f"--- START OF FILE: {file.name} ---\n{excerpts[index]}--- END OF FILE: {file.name} ---\n\n"
+            return get_parsed_file(file, summarize, char_budget, use_cache).context
         except Exception as e:
-            context_string += f"Error reading file: {e}\n"
-        context_string += f"--- END OF FILE: {filename} ---\n\n"
-    
-    return context_string
+            name = getattr(file, "name", "unknown")
+            return f"--- START OF FILE: {name} ---\nError reading file: {e}\n--- END OF FILE: {name} ---\n\n"
+
+    if len(files) == 1 or max_workers <= 1:
+        return "".join(parse(index) for index in range(len(files)))
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files)), thread_name_prefix="context-parse") as executor:
+        return "".join(executor.map(parse, range(len(files))))
 
-def create_initial_prompt(user_query: str, file_context: str) -> str:
+def initial_prompt_sections(user_query: str, file_context: str) -> List[PromptSection]:
+    """
+    Splits the initial prompt into sections for token accounting and budgeting.
+    """
+    return [
+        PromptSection("template", "A user wants to generate a Python script. Here is their request and the content of the files they provided.\n\n**USER'S REQUEST:**\n", PRIORITY_TEMPLATE, trimmable=False),
+        PromptSection("request", user_query, PRIORITY_REQUEST, trimmable=False),
+        PromptSection("template", "\n\n**FILE CONTEXT:**\n", PRIORITY_TEMPLATE, trimmable=False),
+        PromptSection("file_context", file_context, PRIORITY_FILE_CONTEXT),
+        PromptSection("template", "\n\nBased on the request and the file context, please generate the complete Python script.", PRIORITY_TEMPLATE, trimmable=False),
+    ]
+
+def create_initial_prompt(
+    user_query: str,
+    file_context: str,
+    token_budget: Optional[int] = None,
+    model_name: Optional[str] = None
+) -> str:
     """
     Creates the initial prompt for the LLM, combining the user's query and file context.
+    If a token budget is given, the file context is trimmed to fit it.
     """
-    return (
-        f"A user wants to generate a Python script. Here is their request and the content of the files they provided.\n\n"
-        f"**USER'S REQUEST:**\n{user_query}\n\n"
-        f"**FILE CONTEXT:**\n{file_context}\n\n"
-        "Based on the request and the file context, please generate the complete Python script."
-    )
+    sections = fit_sections_to_budget(initial_prompt_sections(user_query, file_context), token_budget, model_name)
+    return render_prompt_sections(sections)
 
-def create_feedback_prompt(
+def feedback_prompt_sections(
     original_user_query: str,
     file_context: str,
     failed_code: str,
     analysis_issues: List[str]
+) -> List[PromptSection]:
+    """
+    Splits the feedback prompt into sections for token accounting and budgeting.
+    """
+    issues_str = "\n- ".join(analysis_issues)
+    return [
+        PromptSection("template", "The Python code you previously generated for the request had issues.\n\n**ORIGINAL USER'S REQUEST:**\n", PRIORITY_TEMPLATE, trimmable=False),
+        PromptSection("request", original_user_query, PRIORITY_REQUEST, trimmable=False),
+        PromptSection("template", "\n\n**ORIGINAL FILE CONTEXT:**\n", PRIORITY_TEMPLATE, trimmable=False),
+        PromptSection("file_context", file_context, PRIORITY_FILE_CONTEXT),
+        PromptSection("template", "\n\n**THE FAILED CODE YOU WROTE:**\n```python\n", PRIORITY_TEMPLATE, trimmable=False),
+        PromptSection("failed_code", failed_code, PRIORITY_FAILED_CODE),
+        PromptSection("template", "\n```\n\n**ANALYSIS FOUND THESE ISSUES:**\n- ", PRIORITY_TEMPLATE, trimmable=False),
+        PromptSection("issues", issues_str, PRIORITY_ISSUES),
+        PromptSection("template", "\n\nPlease analyze the original request, the file context, and the errors. Provide a new, corrected version of the complete Python script.", PRIORITY_TEMPLATE, trimmable=False),
+    ]
+
+def create_feedback_prompt(
+    original_user_query: str,
+    file_context: str,
+    failed_code: str,
+    analysis_issues: List[str],
+    token_budget: Optional[int] = None,
+    model_name: Optional[str] = None
 ) -> str:
     """
     Creates a feedback prompt for the LLM when the previous code had issues.
-    It includes all original context plus the errors.
+    It includes all original context plus the errors. If a token budget is given,
+    the lowest-value sections (file context first, then issues, then the failed
+    code) are trimmed to fit it.
+    """
+    sections = fit_sections_to_budget(
+        feedback_prompt_sections(original_user_query, file_context, failed_code, analysis_issues),
+        token_budget,
+        model_name
+    )
+    return render_prompt_sections(sections)
+
+def delta_feedback_prompt_sections(
+    previous_code: Optional[str],
+    failed_code: Optional[str],
+    analysis_issues: List[str]
+) -> List[PromptSection]:
+    """
+    Splits a delta feedback prompt into sections for token accounting and budgeting.
     """
     issues_str = "\n- ".join(analysis_issues)
-    return (
-        f"The Python code you previously generated for the request had issues.\n\n"
-        f"**ORIGINAL USER'S REQUEST:**\n{original_user_query}\n\n"
-        f"**ORIGINAL FILE CONTEXT:**\n{file_context}\n\n"
-        f"**THE FAILED CODE YOU WROTE:**\n"
-        f"```python\n{failed_code}\n```\n\n"
-        f"**ANALYSIS FOUND THESE ISSUES:**\n- {issues_str}\n\n"
-        "Please analyze the original request, the file context, and the errors. "
-        "Provide a new, corrected version of the complete Python script."
-    )
\ No newline at end of file
+    if failed_code is None:
+        sections = [PromptSection("template", "Your last answer had issues.\n\n", PRIORITY_TEMPLATE, trimmable=False)]
+    elif previous_code is None:
+        sections = [
+            PromptSection("template", "Your latest attempt at the script was:\n```python\n", PRIORITY_TEMPLATE, trimmable=False),
+            PromptSection("failed_code", failed_code, PRIORITY_FAILED_CODE),
+            PromptSection("template", "\n```\n\n", PRIORITY_TEMPLATE, trimmable=False),
+        ]
+    elif failed_code == previous_code:
+        sections = [PromptSection("template", "The code in your previous answer had issues.\n\n", PRIORITY_TEMPLATE, trimmable=False)]
+    else:
+        diff = "".join(difflib.unified_diff(
+            previous_code.splitlines(keepends=True),
+            failed_code.splitlines(keepends=True),
+            fromfile="previous_answer.py",
+            tofile="latest_attempt.py",
+            n=2
+        ))
+        sections = [
+            PromptSection("template", "Your latest attempt at the script differs from the code in your previous answer by this diff:\n```diff\n", PRIORITY_TEMPLATE, trimmable=False),
+            PromptSection("failed_code", diff if diff.endswith("\n") else diff + "\n", PRIORITY_FAILED_CODE),
+            PromptSection("template", "```\n\n", PRIORITY_TEMPLATE, trimmable=False),
+        ]
+    sections += [
+        PromptSection("template", "**ANALYSIS FOUND THESE ISSUES:**\n- ", PRIORITY_TEMPLATE, trimmable=False),
+        PromptSection("issues", issues_str, PRIORITY_ISSUES),
+        PromptSection("template", "\n\nPlease provide a new, corrected version of the complete Python script.", PRIORITY_TEMPLATE, trimmable=False),
+    ]
+    return sections
+
+def create_delta_feedback_prompt(
+    previous_code: Optional[str],
+    failed_code: Optional[str],
+    analysis_issues: List[str],
+    token_budget: Optional[int] = None,
+    model_name: Optional[str] = None
+) -> str:
+    """
+    Creates a follow-up turn for a conversation whose first turn already holds the
+    request and file context, and whose first answer holds ``previous_code``.
+    Only the issues are sent, plus a unified diff when the failed code is not that
+    of the previous answer (or the full failed code if that answer had none).
+    ``failed_code`` is None when the last answer contained no code block.
+    """
+    sections = fit_sections_to_budget(
+        delta_feedback_prompt_sections(previous_code, failed_code, analysis_issues),
+        token_budget,
+        model_name
+    )
+    return render_prompt_sections(sections)
@@ -0,0 +1,218 @@
+"""
+Compact summaries of tabular files for the LLM context.
+
+Instead of dumping every row with ``df.to_string()``, a summary describes the data:
+shape, column schema and dtypes, null counts, numeric statistics, the most frequent
+categorical values and a few rows from the head and tail. CSV files are read in
+chunks and folded into a running accumulator, so memory stays flat regardless of
+file size, and the rendered summary is capped at a character budget.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SUMMARY_CHAR_BUDGET = 8_000
+SUMMARY_CHUNK_ROWS = 50_000
+SUMMARY_SAMPLE_ROWS = 5
+TOP_CATEGORICAL_VALUES = 5
+# Distinct values tracked per categorical column before the counts become approximate
+MAX_TRACKED_CATEGORIES = 10_000
+TRUNCATION_MARKER = "\n[... summary truncated at {chars} characters ...]\n"
+
+
+class TableSummaryAccumulator:
+    """
+    Running summary of a table fed chunk by chunk.
+
+    Only aggregates are kept (counts, sums, extremes, bounded value counts and a
+    few sample rows), never the chunks themselves.
+    """
+
+    def __init__(self, sample_rows: int = SUMMARY_SAMPLE_ROWS, top_values: int = TOP_CATEGORICAL_VALUES):
+        self.sample_rows = sample_rows
+        self.top_values = top_values
+        self.rows = 0
+        self.columns: List[str] = []
+        self.dtypes: Dict[str, List[str]] = {}
+        self.nulls: Dict[str, int] = {}
+        self.numeric_count: Dict[str, float] = {}
+        self.numeric_sum: Dict[str, float] = {}
+        self.numeric_sum_sq: Dict[str, float] = {}
+        self.numeric_min: Dict[str, float] = {}
+        self.numeric_max: Dict[str, float] = {}
+        self.value_counts: Dict[str, Counter] = {}
+        self.approximate_counts: Set[str] = set()
+        self.head: Optional[pd.DataFrame] = None
+        self.tail: Optional[pd.DataFrame] = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Fold one chunk of rows into the summary."""
+        if self.head is None:
+            self.columns = [str(column) for column in chunk.columns]
+            self.head = chunk.head(self.sample_rows)
+        elif len(self.head) < self.sample_rows:
+            # Chunks smaller than the sample fill the head in turn
+            self.head = pd.concat([self.head, chunk.head(self.sample_rows - len(self.head))])
+        self.rows += len(chunk)
+        if self.tail is None:
+            self.tail = chunk.tail(self.sample_rows)
+        else:
+            self.tail = pd.concat([self.tail, chunk.tail(self.sample_rows)]).tail(self.sample_rows)
+
+        for column, dtype in chunk.dtypes.items():
+            seen = self.dtypes.setdefault(str(column), [])
+            if str(dtype) not in seen:
+                seen.append(str(dtype))
+
+        for column, nulls in chunk.isna().sum().items():
+            self.nulls[str(column)] = self.nulls.get(str(column), 0) + int(nulls)
+
+        numeric = chunk.select_dtypes(include="number").astype("float64")
+        if not numeric.empty:
+            for stats, combine in (
+                (numeric.count(), self.numeric_count),
+                (numeric.sum(), self.numeric_sum),
+                ((numeric ** 2).sum(), self.numeric_sum_sq),
+            ):
+                for column, value in stats.items():
+                    combine[str(column)] = combine.get(str(column), 0.0) + float(value)
+            for column, value in numeric.min().items():
+                if not np.isnan(value):
+                    self.numeric_min[str(column)] = min(self.numeric_min.get(str(column), value), value)
+            for column, value in numeric.max().items():
+                if not np.isnan(value):
+                    self.numeric_max[str(column)] = max(self.numeric_max.get(str(column), value), value)
+
+        for column in chunk.select_dtypes(exclude="number").columns:
+            counts = self.value_counts.setdefault(str(column), Counter())
+            chunk_counts = chunk[column].value_counts(dropna=True)
+            if len(chunk_counts) > MAX_TRACKED_CATEGORIES:
+                chunk_counts = chunk_counts.head(MAX_TRACKED_CATEGORIES)
+                self.approximate_counts.add(str(column))
+            counts.update(chunk_counts.to_dict())
+            if len(counts) > MAX_TRACKED_CATEGORIES:
+                # Keep memory bounded for high-cardinality columns such as IDs
+                self.value_counts[str(column)] = Counter(dict(counts.most_common(MAX_TRACKED_CATEGORIES // 2)))
+                self.approximate_counts.add(str(column))
+
+    def metadata(self) -> Dict[str, Any]:
+        """Shape and schema of the table seen so far."""
+        return {
+            "rows": self.rows,
+            "columns": list(self.columns),
+            "dtypes": {column: " | ".join(self.dtypes.get(column, [])) for column in self.columns},
+        }
+
+    def _schema_section(self) -> str:
+        lines = ["Columns (name: dtype, nulls):"]
+        for column in self.columns:
+            lines.append(f"- {column}: {' | '.join(self.dtypes.get(column, []))}, nulls={self.nulls.get(column, 0)}")
+        return "\n".join(lines)
+
+    def _numeric_section(self) -> str:
+        if not self.numeric_count:
+            return ""
+        lines = ["Numeric columns (count, mean, std, min, max):"]
+        for column in self.columns:
+            count = self.numeric_count.get(column)
+            if not count:
+                continue
+            mean = self.numeric_sum[column] / count
+            variance = max(0.0, self.numeric_sum_sq[column] / count - mean ** 2)
+            std = (variance * count / (count - 1)) ** 0.5 if count > 1 else 0.0
+            lines.append(
+                f"- {column}: count={int(count)}, mean={mean:.6g}, std={std:.6g}, "
+                f"min={self.numeric_min.get(column, float('nan')):.6g}, max={self.numeric_max.get(column, float('nan')):.6g}"
+            )
+        return "\n".join(lines)
+
+    def _categorical_section(self) -> str:
+        if not self.value_counts:
+            return ""
+        lines = [f"Categorical columns (unique values, top {self.top_values}):"]
+        for column in self.columns:
+            counts = self.value_counts.get(column)
+            if counts is None:
+                continue
+            unique = f">{len(counts)}" if column in self.approximate_counts else str(len(counts))
+            top = ", ".join(f"{value!r}: {count}" for value, count in counts.most_common(self.top_values))
+            lines.append(f"- {column}: unique={unique}; {top}")
+        return "\n".join(lines)
+
+    def _sample_section(self) -> str:
+        if self.head is None or self.head.empty:
+            return ""
+        if self.rows <= 2 * self.sample_rows:
+            # Head and tail overlap or meet: show every row exactly once
+            rows = pd.concat([self.head, self.tail])
+            return f"All rows:\n{rows[~rows.index.duplicated()].to_string()}"
+        return (
+            f"First {len(self.head)} rows:\n{self.head.to_string()}\n"
+            f"Last {len(self.tail)} rows:\n{self.tail.to_string()}"
+        )
+
+    def render(self, char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET) -> str:
+        """
+        Render the summary as text of at most ``char_budget`` characters.
+
+        Sections are added in order of usefulness (shape, schema, numeric stats,
+        categorical values, sample rows) and the text is cut once the budget is used.
+        """
+        sections = [
+            f"Summary: {self.rows} rows x {len(self.columns)} columns",
+            self._schema_section(),
+            self._numeric_section(),
+            self._categorical_section(),
+            self._sample_section(),
+        ]
+        return cap_text("\n".join(section for section in sections if section) + "\n", char_budget)
+
+
+def cap_text(text: str, char_budget: int) -> str:
+    """Cut a summary to ``char_budget`` characters, marking the cut."""
+    if len(text) <= char_budget:
+        return text
+    marker = TRUNCATION_MARKER.format(chars=char_budget)
+    return text[:max(0, char_budget - len(marker))] + marker
+
+
+def summarize_dataframe(df: pd.DataFrame, char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET) -> str:
+    """Summarize an in-memory DataFrame, capped at ``char_budget`` characters."""
+    accumulator = TableSummaryAccumulator()
+    accumulator.update(df)
+    return accumulator.render(char_budget)
+
+
+def summarize_csv_with_metadata(
+    file: Any,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET,
+    chunksize: int = SUMMARY_CHUNK_ROWS
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Summarize a CSV file by streaming it in chunks.
+
+    Args:
+        file: Path or file-like object accepted by ``pd.read_csv``
+        char_budget: Maximum length of the summary in characters
+        chunksize: Rows parsed per chunk; bounds the memory used
+
+    Returns:
+        Tuple of (summary text, table metadata: rows, columns and dtypes)
+    """
+    accumulator = TableSummaryAccumulator()
+    with pd.read_csv(file, chunksize=chunksize) as reader:
+        for chunk in reader:
+            accumulator.update(chunk)
+    return accumulator.render(char_budget), accumulator.metadata()
+
+
+def summarize_csv(
+    file: Any,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET,
+    chunksize: int = SUMMARY_CHUNK_ROWS
+) -> str:
+    """Summarize a CSV file by streaming it in chunks; see summarize_csv_with_metadata."""
+    return summarize_csv_with_metadata(file, char_budget, chunksize)[0]
@@ -0,0 +1,198 @@
+"""
+Streaming Excel ingestion for the LLM context.
+
+``pd.read_excel`` loads every cell of every sheet into memory before anything is
+rendered. Here the sheets are read one after another from a single openpyxl
+workbook in read-only mode, row by row (``values_only``). The character budget
+is shared strictly between sheets: a sheet stops being read as soon as its share
+is spent, unused shares roll over to the following sheets, and sheets past
+``char_budget // MIN_SHEET_CHAR_BUDGET`` are listed by name instead of rendered.
+Summaries are folded chunk by chunk, so memory stays bounded.
+"""
+
+import io
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from src.context_summarizer import (
+    DEFAULT_SUMMARY_CHAR_BUDGET, SUMMARY_CHUNK_ROWS, TableSummaryAccumulator, cap_text
+)
+
+# Smallest share of the budget a sheet is rendered with; sheets beyond
+# char_budget // MIN_SHEET_CHAR_BUDGET are omitted and only named
+MIN_SHEET_CHAR_BUDGET = 600
+SHEET_TRUNCATION_MARKER = "\n[... sheet truncated after {rows} rows to fit the context budget ...]\n"
+SHEET_SEPARATOR = "\n--- Content of sheet: {name} ---\n"
+OMITTED_SHEETS_NOTE = "\n[... {count} more sheet(s) omitted to fit the context budget: {names} ...]\n"
+# Characters kept aside for OMITTED_SHEETS_NOTE when sheets are omitted
+OMITTED_NOTE_CHARS = 200
+
+
+def _header(row: Tuple[Any, ...]) -> List[str]:
+    """Column names from the first row, named like pandas for empty cells."""
+    return [str(value) if value is not None else f"Unnamed: {i}" for i, value in enumerate(row)]
+
+
+def _iter_sheet_rows(worksheet: Any) -> Iterator[Tuple[Any, ...]]:
+    """Yield the non-empty rows of a read-only worksheet as tuples of values."""
+    for row in worksheet.iter_rows(values_only=True):
+        if any(value is not None for value in row):
+            yield row
+
+
+def _render_sheet(worksheet: Any, char_budget: int) -> Tuple[str, Dict[str, Any]]:
+    """Render the rows of a sheet like ``df.to_string()``, reading only what fits the budget."""
+    rows = _iter_sheet_rows(worksheet)
+    columns = _header(next(rows, ()))
+    values: List[Tuple[Any, ...]] = []
+    estimated_chars = 0
+    truncated = False
+    for row in rows:
+        if estimated_chars >= char_budget:
+            truncated = True
+            break
+        values.append(row[:len(columns)])
+        estimated_chars += sum(len(str(value)) + 2 for value in row)
+    rows.close()
+
+    df = pd.DataFrame(values, columns=columns)
+    text = df.to_string() + "\n"
+    if truncated or len(text) > char_budget:
+        marker = SHEET_TRUNCATION_MARKER.format(rows=len(values))
+        text = text[:max(0, char_budget - len(marker))] + marker
+    metadata = {
+        "rows": len(df),
+        "columns": columns,
+        "dtypes": {str(column): str(dtype) for column, dtype in df.dtypes.items()},
+        "truncated": truncated,
+    }
+    return text, metadata
+
+
+def _summarize_sheet(
+    worksheet: Any,
+    char_budget: int,
+    chunksize: int = SUMMARY_CHUNK_ROWS
+) -> Tuple[str, Dict[str, Any]]:
+    """Summarize a sheet, folding rows into the accumulator in chunks."""
+    rows = _iter_sheet_rows(worksheet)
+    columns = _header(next(rows, ()))
+    accumulator = TableSummaryAccumulator()
+    batch: List[Tuple[Any, ...]] = []
+    offset = 0
+    for row in rows:
+        batch.append(row[:len(columns)])
+        if len(batch) >= chunksize:
+            accumulator.update(pd.DataFrame(batch, columns=columns, index=range(offset, offset + len(batch))))
+            offset += len(batch)
+            batch = []
+    if batch or accumulator.head is None:
+        accumulator.update(pd.DataFrame(batch, columns=columns, index=range(offset, offset + len(batch))))
+    return accumulator.render(char_budget), accumulator.metadata()
+
+
+def _process_sheet(worksheet: Any, summarize: bool, char_budget: int) -> Tuple[str, Dict[str, Any]]:
+    try:
+        if summarize:
+            return _summarize_sheet(worksheet, char_budget)
+        return _render_sheet(worksheet, char_budget)
+    except Exception as e:
+        return f"Error reading sheet: {e}\n", {"error": str(e)}
+
+
+def read_excel_sheets(
+    file: Any,
+    summarize: bool = False,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET
+) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Render the sheets of an Excel workbook within a shared character budget.
+
+    Args:
+        file: Path, bytes or file-like object (e.g. a Streamlit UploadedFile)
+        summarize: Summarize each sheet instead of rendering its rows
+        char_budget: Maximum characters for the whole workbook, separators included.
+            At most ``char_budget // MIN_SHEET_CHAR_BUDGET`` sheets are rendered;
+            each gets an equal share of what the previous ones left.
+
+    Returns:
+        List of (sheet name, rendered text, sheet metadata) in workbook order;
+        omitted sheets have empty text and ``{"omitted": True}`` as metadata
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            data = f.read()
+    elif isinstance(file, bytes):
+        data = file
+    else:
+        data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+
+    # One read-only workbook streams every sheet from the same zip archive; loading
+    # it scans all the sheets, so it is opened once and the sheets read in turn
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    sheets: List[Tuple[str, str, Dict[str, Any]]] = []
+    try:
+        sheet_names = list(workbook.sheetnames)
+        shown = min(len(sheet_names), max(1, char_budget // MIN_SHEET_CHAR_BUDGET))
+        remaining = char_budget - (OMITTED_NOTE_CHARS if shown < len(sheet_names) else 0)
+        for i, sheet_name in enumerate(sheet_names[:shown]):
+            if i > 0:
+                remaining -= len(SHEET_SEPARATOR.format(name=sheet_name))
+            share = max(0, remaining // (shown - i))
+            text, metadata = _process_sheet(workbook[sheet_name], summarize, share)
+            text = cap_text(text, share)
+            remaining -= len(text)
+            sheets.append((sheet_name, text, metadata))
+    finally:
+        workbook.close()
+
+    sheets.extend((sheet_name, "", {"omitted": True}) for sheet_name in sheet_names[shown:])
+    return sheets
+
+
+def read_excel_context(
+    file: Any,
+    summarize: bool = False,
+    char_budget: int = DEFAULT_SUMMARY_CHAR_BUDGET
+) -> str:
+    """
+    Render every sheet of an Excel workbook for the LLM context.
+
+    The output keeps the workbook's sheet order and the format of
+    ``parse_files_to_context_string`` (sheets after the first are introduced by a
+    "Content of sheet" line) and is at most ``char_budget`` characters long.
+    Arguments are those of read_excel_sheets.
+    """
+    return join_excel_sheets(read_excel_sheets(file, summarize, char_budget), char_budget)
+
+
+def join_excel_sheets(
+    sheets: List[Tuple[str, str, Dict[str, Any]]],
+    char_budget: Optional[int] = None
+) -> str:
+    """
+    Join the output of read_excel_sheets into one text, introducing each sheet after the first.
+
+    Omitted sheets are named in a closing note. The text is cut to ``char_budget``
+    characters if one is given.
+    """
+    parts = []
+    omitted = []
+    for sheet_name, text, metadata in sheets:
+        if metadata.get("omitted"):
+            omitted.append(sheet_name)
+            continue
+        if parts:
+            parts.append(SHEET_SEPARATOR.format(name=sheet_name))
+        parts.append(text)
+    if omitted:
+        names = ", ".join(omitted)
+        room = OMITTED_NOTE_CHARS - len(OMITTED_SHEETS_NOTE.format(count=len(omitted), names=""))
+        if len(names) > room:
+            names = names[:max(0, room - 3)] + "..."
+        parts.append(OMITTED_SHEETS_NOTE.format(count=len(omitted), names=names))
+    text = "".join(parts)
+    return cap_text(text, char_budget) if char_budget is not None else text
@@ -0,0 +1,120 @@
+"""
+Process-wide cache of parsed file contexts.
+
+Every Generate click, and every Streamlit rerun, used to parse the attached files
+again. Parsed files are cached here by content hash, file name and parsing settings,
+together with their table metadata (rows, columns, dtypes), in a bounded LRU shared
+by every session of the process. Unchanged attachments are served without any
+parsing work.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+DEFAULT_FILE_CONTEXT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileContextKey:
+    """Identifies one parse of a file: its content and the settings used."""
+    content_hash: str
+    filename: str
+    summarize: bool
+    char_budget: int
+
+
+@dataclass
+class ParsedFile:
+    """A file rendered for the LLM context, with metadata about its tables."""
+    filename: str
+    context: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate memory held by the entry."""
+        return len(self.context) + len(repr(self.metadata))
+
+
+def hash_file_content(data: bytes) -> str:
+    """Return the content hash used in FileContextKey."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class FileContextCache:
+    """
+    Thread-safe LRU cache of parsed files, bounded by total size.
+
+    Entries larger than the whole cache are not stored.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_FILE_CONTEXT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[FileContextKey, ParsedFile]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: FileContextKey) -> Optional[ParsedFile]:
+        """Return the cached parse for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: FileContextKey, parsed: ParsedFile) -> None:
+        """Store a parse, evicting least recently used entries to stay within max_bytes."""
+        size = parsed.size_bytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.size_bytes
+            self._entries[key] = parsed
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size_bytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count, size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_default_cache = FileContextCache()
+
+
+def get_file_context_cache() -> FileContextCache:
+    """Return the file context cache shared by every session of the process."""
+    return _default_cache
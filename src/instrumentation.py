@@ -0,0 +1,285 @@
+"""
+Per-stage timing of the generation pipeline.
+
+Pipeline stages (prompt building, LLM calls, code extraction, each analyzer,
+admission waits, attempts, whole runs) are wrapped in ``span(stage, **labels)``.
+A span feeds two optional sinks:
+
+- Histograms of stage durations, per stage and labels, rendered in the
+  Prometheus text exposition format by render_prometheus(). They can be served on
+  a local endpoint (start_metrics_server) or written to a file
+  (write_prometheus_file). Enabled by enable_metrics() or by setting
+  INSTRUMENTATION_ENABLED=1 (or METRICS_PORT) in the environment.
+- A TraceRecorder made current with ``trace_request()``, which records every span
+  of one request as Chrome trace events (chrome://tracing, Perfetto).
+
+With both disabled, span() returns a shared no-op context manager after one flag
+check and one context variable lookup.
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+METRIC_NAME = "codegen_stage_duration_seconds"
+METRIC_HELP = "Duration of generation pipeline stages in seconds."
+# LLM calls and whole runs take tens of seconds; extraction takes microseconds
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+STAGE_RUN = "pipeline_run"
+STAGE_ATTEMPT = "attempt"
+STAGE_PROMPT = "prompt_build"
+STAGE_LLM_CALL = "llm_call"
+STAGE_EXTRACTION = "code_extraction"
+STAGE_ANALYZER = "analyzer"
+STAGE_ADMISSION_WAIT = "admission_wait"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations for one label set. Not thread-safe."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Stage duration histograms, keyed by stage and labels."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[LabelKey, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+        key = (("stage", stage),) + tuple(sorted((name, str(value)) for name, value in labels.items()))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """The histograms in the Prometheus text exposition format (version 0.0.4)."""
+        lines = [f"# HELP {METRIC_NAME} {METRIC_HELP}", f"# TYPE {METRIC_NAME} histogram"]
+        with self._lock:
+            for key in sorted(self._histograms):
+                histogram = self._histograms[key]
+                labels = ",".join(f'{name}="{_escape_label(value)}"' for name, value in key)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{METRIC_NAME}_sum{{{labels}}} {histogram.total!r}")
+                lines.append(f"{METRIC_NAME}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class TraceRecorder:
+    """Spans of one request, exported as Chrome trace events."""
+
+    def __init__(self, name: str = "request"):
+        self.name = name
+        self.events: List[Dict[str, Any]] = []
+        self._origin_ns = time.perf_counter_ns()
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, start_ns: int, end_ns: int, labels: Dict[str, Any]) -> None:
+        thread = threading.current_thread()
+        label_text = ", ".join(str(value) for value in labels.values())
+        event = {
+            "name": f"{stage} ({label_text})" if label_text else stage,
+            "cat": stage,
+            "ph": "X",
+            "ts": (start_ns - self._origin_ns) / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": {name: str(value) for name, value in labels.items()},
+        }
+        with self._lock:
+            self.events.append(event)
+            self._threads.setdefault(thread.ident, thread.name)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """The trace as a Chrome trace JSON object (Trace Event Format)."""
+        with self._lock:
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ]
+            events = sorted(self.events, key=lambda event: event["ts"])
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms", "otherData": {"request": self.name}}
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+_registry = MetricsRegistry()
+_metrics_enabled = os.getenv("INSTRUMENTATION_ENABLED", "0") not in ("", "0") or bool(os.getenv("METRICS_PORT"))
+_current_trace: contextvars.ContextVar[Optional[TraceRecorder]] = contextvars.ContextVar("current_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("stage", "labels", "trace", "start_ns")
+
+    def __init__(self, stage: str, labels: Dict[str, Any], trace: Optional[TraceRecorder]):
+        self.stage = stage
+        self.labels = labels
+        self.trace = trace
+
+    def __enter__(self) -> "_Span":
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _record(self.stage, self.start_ns, time.perf_counter_ns(), self.labels, self.trace)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _record(stage: str, start_ns: int, end_ns: int, labels: Dict[str, Any], trace: Optional[TraceRecorder]) -> None:
+    if _metrics_enabled:
+        _registry.observe(stage, (end_ns - start_ns) / 1e9, labels)
+    if trace is not None:
+        trace.add(stage, start_ns, end_ns, labels)
+
+
+def span(stage: str, **labels: Any):
+    """
+    Time the enclosed block as a ``stage`` with the given labels.
+
+    Returns a shared no-op context manager when metrics are disabled and no trace
+    is being recorded.
+    """
+    trace = _current_trace.get()
+    if not _metrics_enabled and trace is None:
+        return _NOOP_SPAN
+    return _Span(stage, labels, trace)
+
+
+def observe(stage: str, seconds: float, **labels: Any) -> None:
+    """Record a stage that ended now and lasted ``seconds`` (e.g. a queue wait measured elsewhere)."""
+    trace = _current_trace.get()
+    if not _metrics_enabled and trace is None:
+        return
+    end_ns = time.perf_counter_ns()
+    _record(stage, end_ns - int(seconds * 1e9), end_ns, labels, trace)
+
+
+@contextmanager
+def trace_request(name: str = "request") -> Iterator[TraceRecorder]:
+    """
+    Record the spans of the enclosed block, and of the threads it hands work to
+    with ``contextvars.copy_context()``, in a new TraceRecorder.
+    """
+    recorder = TraceRecorder(name)
+    reset_token = _current_trace.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_trace.reset(reset_token)
+
+
+def enable_metrics(enabled: bool = True) -> None:
+    global _metrics_enabled
+    _metrics_enabled = enabled
+
+
+def metrics_enabled() -> bool:
+    return _metrics_enabled
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Return the registry shared by every session of the process."""
+    return _registry
+
+
+def render_prometheus() -> str:
+    return _registry.render()
+
+
+def write_prometheus_file(path: str) -> None:
+    """Write the metrics to ``path`` atomically (e.g. for the node exporter's textfile collector)."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(temp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+_servers: Dict[Tuple[str, int], ThreadingHTTPServer] = {}
+_servers_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = DEFAULT_METRICS_HOST) -> ThreadingHTTPServer:
+    """
+    Serve the metrics on ``http://host:port/metrics`` from a daemon thread and enable them.
+
+    Calling it again with the same address returns the running server, so a script
+    that reruns (Streamlit) can call it every time.
+    """
+    with _servers_lock:
+        server = _servers.get((host, port))
+        if server is None:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            _servers[(host, port)] = server
+    enable_metrics()
+    return server
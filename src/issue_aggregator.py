@@ -0,0 +1,163 @@
+"""
+Aggregation and compression of analyzer issues for the feedback prompt.
+
+Pylint and MyPy often report the same problem many times (the same unused
+variable, the same missing stub, a repeated W0621). Issues are grouped here by
+tool, message code and symbol, repeats are collapsed into one line listing where
+they occur, groups are ranked by severity (blocking issues first) and the list is
+cut to a token budget, so the LLM sees every distinct problem once and the
+blocking ones first.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.token_budget import count_tokens
+
+DEFAULT_ISSUE_TOKEN_BUDGET = 1500
+MAX_LISTED_LINES = 10
+
+_PYLINT_PATTERN = re.compile(r"^line (\d+):\d+: \[(([A-Z])\d+)(?:\(([\w-]+)\))?\] (.*)$")
+_MYPY_PATTERN = re.compile(r"^line (\d+)(?::\d+)?: (error|warning|note): (.*?)(?:\s+\[([\w-]+)\])?$")
+_BANDIT_PATTERN = re.compile(r"^Bandit: \[(\w+)/(\w+)\] (.*) \(ID: (\w+), Line: (\d+)\)$")
+_SYMBOL_PATTERN = re.compile(r"['\"]([^'\"]+)['\"]")
+
+_PYLINT_SEVERITY = {"F": 5, "E": 4, "W": 2, "R": 1, "C": 1, "I": 0}
+_MYPY_SEVERITY = {"error": 4, "warning": 2, "note": 0}
+_BANDIT_SEVERITY = {"HIGH": 5, "MEDIUM": 4, "LOW": 2}
+
+
+def is_blocking_issue(issue: str) -> bool:
+    """
+    Tell whether an analyzer issue must be fixed before code is accepted.
+
+    Blocking: Pylint errors/fatals, MyPy errors, medium or high Bandit findings,
+    high-risk or failed dynamic analysis. Warnings, low-severity findings and
+    informational dynamic analysis results are not blocking.
+    """
+    if issue.startswith("Bandit:"):
+        return "[HIGH/" in issue or "[MEDIUM/" in issue
+    if issue.startswith("Dynamic Analysis"):
+        return issue.startswith("Dynamic Analysis Error") or "[HIGH]" in issue
+    if "error:" in issue:
+        return True
+    if "[E" in issue or "[F" in issue:
+        return True
+    return False
+
+
+@dataclass
+class IssueGroup:
+    """Occurrences of the same problem reported by one tool."""
+    tool: str
+    code: str
+    symbol: str
+    message: str
+    severity: int
+    blocking: bool
+    first_issue: str
+    lines: List[int] = field(default_factory=list)
+    count: int = 0
+
+    def render(self) -> str:
+        """One line describing the group; a single occurrence keeps its original text."""
+        if self.count == 1:
+            return self.first_issue
+        code = f" [{self.code}]" if self.code else ""
+        where = ""
+        if self.lines:
+            lines = sorted(set(self.lines))
+            listed = ", ".join(str(line) for line in lines[:MAX_LISTED_LINES])
+            more = f" (+{len(lines) - MAX_LISTED_LINES} more)" if len(lines) > MAX_LISTED_LINES else ""
+            where = f" at line{'s' if len(lines) > 1 else ''} {listed}{more}"
+        return f"{self.tool}{code}: {self.message} ({self.count} occurrences{where})"
+
+
+def _parse_issue(issue: str) -> Tuple[str, str, str, int, Optional[int]]:
+    """
+    Split an issue into (tool, code, message, severity, line).
+
+    Issues not matching a known format keep their whole text as message.
+    """
+    match = _PYLINT_PATTERN.match(issue)
+    if match:
+        line, code, category, symbolic, message = match.groups()
+        full_code = f"{code}({symbolic})" if symbolic else code
+        return "Pylint", full_code, message, _PYLINT_SEVERITY.get(category, 1), int(line)
+    match = _MYPY_PATTERN.match(issue)
+    if match:
+        line, level, message, code = match.groups()
+        return "MyPy", code or level, message, _MYPY_SEVERITY[level], int(line)
+    match = _BANDIT_PATTERN.match(issue)
+    if match:
+        severity, confidence, message, test_id, line = match.groups()
+        return "Bandit", test_id, f"[{severity}/{confidence}] {message}", _BANDIT_SEVERITY.get(severity, 1), int(line)
+    if issue.startswith("Dynamic Analysis"):
+        severity = 4 if is_blocking_issue(issue) else (0 if "[INFO]" in issue or "[RECOMMENDATION]" in issue else 2)
+        return "Dynamic Analysis", "", issue, severity, None
+    return "", "", issue, 3 if is_blocking_issue(issue) else 1, None
+
+
+def aggregate_issues(issues: List[str]) -> List[IssueGroup]:
+    """
+    Group issues by tool, code and symbol, and rank the groups.
+
+    The symbol is the first quoted name in the message (e.g. the variable of an
+    unused-variable warning); messages without one are grouped by their text.
+
+    Returns:
+        Groups ordered by blocking first, then severity, then number of occurrences
+    """
+    groups: Dict[Tuple[str, str, str], IssueGroup] = {}
+    for issue in issues:
+        tool, code, message, severity, line = _parse_issue(issue)
+        symbol_match = _SYMBOL_PATTERN.search(message)
+        symbol = symbol_match.group(1) if symbol_match else ""
+        key = (tool, code, symbol if symbol and code else message)
+        group = groups.get(key)
+        if group is None:
+            group = IssueGroup(tool, code, symbol, message, severity, is_blocking_issue(issue), issue)
+            groups[key] = group
+        group.count += 1
+        if line is not None:
+            group.lines.append(line)
+
+    # sorted() is stable, so groups of equal rank keep the order they were first reported in
+    return sorted(groups.values(), key=lambda group: (not group.blocking, -group.severity, -group.count))
+
+
+def compress_issues(
+    issues: List[str],
+    token_budget: Optional[int] = DEFAULT_ISSUE_TOKEN_BUDGET,
+    model_name: Optional[str] = None
+) -> List[str]:
+    """
+    Aggregate issues into ranked, de-duplicated lines for the feedback prompt.
+
+    Groups are added in rank order until the token budget is used; blocking groups
+    are always kept. A final line says how many groups were left out.
+
+    Args:
+        issues: Issues reported by the analyzers
+        token_budget: Maximum tokens of the returned lines, or None for no limit
+        model_name: Name of the model, used to count tokens
+
+    Returns:
+        The lines to list in the feedback prompt
+    """
+    lines: List[str] = []
+    used = 0
+    omitted = 0
+    for group in aggregate_issues(issues):
+        line = group.render()
+        tokens = count_tokens(line, model_name)
+        # Once a group does not fit, every lower-ranked non-blocking group is left out too
+        if not group.blocking and (omitted or (token_budget is not None and used + tokens > token_budget)):
+            omitted += 1
+            continue
+        lines.append(line)
+        used += tokens
+    if omitted:
+        lines.append(f"... and {omitted} lower-severity issue group(s) omitted to keep this list short.")
+    return lines
@@ -0,0 +1,384 @@
+"""
+Background execution of generation pipelines.
+
+The Streamlit script used to run the whole generate -> analyze -> retry loop
+inline, so any widget interaction rerunning the script interrupted or blocked it.
+Pipelines are now submitted as jobs to a bounded pool of worker threads owned by
+the process. Each job has an ID, and its status, per-attempt progress, log and
+result live in a thread-safe store. A rerun only reads the store, so generations
+survive reruns, and one session can queue several requests.
+
+Queued jobs wait in a bounded FairQueue: workers take them round robin across
+sessions, and a full queue rejects new submissions (AdmissionRejected) instead of
+letting the backlog grow without limit.
+
+Each job owns a CancellationToken. Cancelling a job (or every job of a session)
+interrupts its LLM call and kills its analyzer processes. Sessions report that
+they are alive while they poll; the jobs of a session that stopped polling (the
+user left) are cancelled by a watchdog.
+"""
+
+import dataclasses
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from src.admission import STAGE_JOBS, AdmissionRejected, FairQueue, StageStats, WaitStats
+from src.cancellation import CancellationToken
+from src.instrumentation import STAGE_ADMISSION_WAIT, observe, trace_request
+from src.pipeline import PipelineConfig, PipelineResult, run_generation_pipeline
+
+DEFAULT_JOB_WORKERS = 4
+# Finished jobs kept in the store; older ones are dropped first
+MAX_FINISHED_JOBS = 200
+# Jobs allowed to wait for a worker; submissions beyond that are rejected
+MAX_QUEUED_JOBS = 64
+# Jobs of a session that has not polled for this long are cancelled
+SESSION_TIMEOUT_SECONDS = 30.0
+WATCHDOG_INTERVAL_SECONDS = 5.0
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+@dataclass
+class Job:
+    """A generation request and its progress, as seen by the UI."""
+    job_id: str
+    session_id: str
+    user_query: str
+    model_name: str
+    status: str = JOB_QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    attempt: int = 0
+    max_attempts: int = 0
+    status_message: str = "Waiting for a worker..."
+    log_messages: List[str] = field(default_factory=list)
+    result: Optional[PipelineResult] = None
+    error: Optional[str] = None
+    # Chrome trace JSON of the run, if one was requested
+    trace: Optional[Dict[str, Any]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the job started running (or waiting time while queued)."""
+        start = self.started_at or self.submitted_at
+        return (self.finished_at or time.time()) - start
+
+
+class JobStore:
+    """
+    Thread-safe store of jobs.
+
+    Workers update jobs in place under the lock; readers get copies, so the UI
+    never sees a job half-updated.
+    """
+
+    def __init__(self, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def add(self, job: Job) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a copy of the job, or None if it is unknown (or was pruned)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._copy(job) if job is not None else None
+
+    def session_jobs(self, session_id: str) -> List[Job]:
+        """Copies of the jobs of a session, oldest first."""
+        with self._lock:
+            jobs = [self._copy(job) for job in self._jobs.values() if job.session_id == session_id]
+        return sorted(jobs, key=lambda job: job.submitted_at)
+
+    def update(self, job_id: str, **changes) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, value in changes.items():
+                setattr(job, name, value)
+            if job.finished:
+                self._prune()
+
+    def append_log(self, job_id: str, message: str) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.log_messages.append(message)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each state."""
+        with self._lock:
+            counts = {state: 0 for state in (JOB_QUEUED, JOB_RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    @staticmethod
+    def _copy(job: Job) -> Job:
+        return dataclasses.replace(job, log_messages=list(job.log_messages))
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.finished]
+        if len(finished) <= self.max_finished:
+            return
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:len(finished) - self.max_finished]:
+            del self._jobs[job.job_id]
+
+
+@dataclass(eq=False)
+class _QueuedJob:
+    """Arguments of a job waiting for a worker."""
+    job_id: str
+    session_id: str
+    user_query: str
+    file_context: str
+    config: PipelineConfig
+    log: Optional[Callable[[str, str], None]]
+    trace: bool = False
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class JobRunner:
+    """Runs generation pipelines on a bounded pool of worker threads, serving sessions fairly."""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_JOB_WORKERS,
+        store: Optional[JobStore] = None,
+        max_queued: int = MAX_QUEUED_JOBS
+    ):
+        self.max_workers = max_workers
+        self.store = store if store is not None else JobStore()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation-job")
+        self._ids = itertools.count(1)
+        self._queue = FairQueue(max_queued)
+        self._queued: Dict[str, _QueuedJob] = {}
+        self._running = 0
+        self._waits = WaitStats()
+        self._tokens: Dict[str, CancellationToken] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def submit(
+        self,
+        session_id: str,
+        user_query: str,
+        file_context: str,
+        config: PipelineConfig,
+        log: Optional[Callable[[str, str], None]] = None,
+        trace: bool = False
+    ) -> str:
+        """
+        Queue a generation request.
+
+        Args:
+            session_id: Session the job belongs to
+            user_query: The user's code request
+            file_context: Context string built from the attached files
+            config: Pipeline settings
+            log: Optional extra log sink (e.g. a file logger), called from the worker thread
+            trace: Record the stage timings of the run as a Chrome trace (``Job.trace``)
+
+        Returns:
+            The job ID
+
+        Raises:
+            AdmissionRejected: Too many jobs are already waiting for a worker
+        """
+        job_id = f"{next(self._ids)}-{uuid.uuid4().hex[:8]}"
+        token = CancellationToken()
+        config = dataclasses.replace(config, cancel_token=token, session_id=session_id)
+        queued = _QueuedJob(job_id, session_id, user_query, file_context, config, log, trace)
+        with self._lock:
+            if self._queue.full:
+                self._waits.rejected += 1
+                raise AdmissionRejected(f"{len(self._queue)} generation requests are already waiting")
+            self.store.add(Job(job_id, session_id, user_query, config.model_name, max_attempts=config.max_attempts))
+            self._queue.push(session_id, queued)
+            self._queued[job_id] = queued
+            self._tokens[job_id] = token
+        # Each task runs whichever job is next in the fair queue, not necessarily this one
+        self._executor.submit(self._run_next)
+        return job_id
+
+    def queue_stats(self) -> StageStats:
+        """Workers busy, jobs waiting (per session) and recent waits for a worker."""
+        with self._lock:
+            return StageStats(
+                STAGE_JOBS, self.max_workers, self._running, len(self._queue),
+                self._queue.depth_by_session(), self._waits.admitted, self._waits.rejected,
+                self._waits.mean_wait, self._waits.max_wait
+            )
+
+    def cancel(self, job_id: str, reason: str = "cancelled by the user") -> List[str]:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            Labels of the operations that were interrupted (empty for a queued job)
+        """
+        with self._lock:
+            token = self._tokens.get(job_id)
+        if token is None:
+            return []
+        interrupted = token.cancel(reason)
+        with self._lock:
+            queued = self._queued.pop(job_id, None)
+            if queued is not None:
+                self._queue.remove(queued.session_id, queued)
+                self._tokens.pop(job_id, None)
+                self._finish_cancelled(job_id, token)
+        return interrupted
+
+    def cancel_session(self, session_id: str, reason: str = "cancelled by the user") -> Dict[str, List[str]]:
+        """
+        Cancel every unfinished job of a session.
+
+        Returns:
+            Mapping from job ID to the labels of its interrupted operations
+        """
+        return {
+            job.job_id: self.cancel(job.job_id, reason)
+            for job in self.store.session_jobs(session_id)
+            if not job.finished
+        }
+
+    def touch_session(self, session_id: str) -> None:
+        """
+        Record that a session is still polling its jobs.
+
+        Only sessions that poll are watched; jobs submitted by scripts are never
+        cancelled for inactivity.
+        """
+        with self._lock:
+            self._last_seen[session_id] = time.time()
+        self._start_watchdog()
+
+    def cancel_abandoned_sessions(self, timeout: float = SESSION_TIMEOUT_SECONDS) -> List[str]:
+        """
+        Cancel the jobs of sessions that have not polled for ``timeout`` seconds.
+
+        Returns:
+            The cancelled session IDs
+        """
+        now = time.time()
+        with self._lock:
+            abandoned = [session_id for session_id, seen in self._last_seen.items() if now - seen > timeout]
+            for session_id in abandoned:
+                del self._last_seen[session_id]
+        for session_id in abandoned:
+            self.cancel_session(session_id, f"session inactive for more than {timeout:.0f}s")
+        return abandoned
+
+    def _start_watchdog(self) -> None:
+        with self._lock:
+            if self._watchdog is not None:
+                return
+            self._watchdog = threading.Thread(target=self._watch_sessions, name="generation-job-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _watch_sessions(self) -> None:
+        while True:
+            time.sleep(WATCHDOG_INTERVAL_SECONDS)
+            self.cancel_abandoned_sessions()
+
+    def _finish_cancelled(self, job_id: str, token: CancellationToken, result: Optional[PipelineResult] = None) -> None:
+        interrupted = ", ".join(token.cancelled_operations) or "none in flight"
+        self.store.append_log(job_id, f"[WARNING] Job cancelled ({token.reason}). Interrupted operations: {interrupted}")
+        self.store.update(
+            job_id, status=JOB_CANCELLED, result=result, finished_at=time.time(),
+            status_message=f"Cancelled: {token.reason}."
+        )
+
+    def _run_next(self) -> None:
+        with self._lock:
+            if not self._queue:
+                # The job this task was submitted for was cancelled while queued
+                return
+            queued = self._queue.pop()
+            del self._queued[queued.job_id]
+            wait = time.monotonic() - queued.queued_at
+            self._waits.record(wait)
+            self._running += 1
+            self.store.update(queued.job_id, status=JOB_RUNNING, started_at=time.time(), status_message="Starting...")
+        observe(STAGE_ADMISSION_WAIT, wait, gate=STAGE_JOBS)
+        try:
+            self._execute(queued.job_id, queued.user_query, queued.file_context, queued.config, queued.log, queued.trace)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._tokens.pop(queued.job_id, None)
+
+    def _execute(
+        self,
+        job_id: str,
+        user_query: str,
+        file_context: str,
+        config: PipelineConfig,
+        log: Optional[Callable[[str, str], None]],
+        trace: bool = False
+    ) -> None:
+        store = self.store
+        token = config.cancel_token
+
+        def add_log(message: str, level: str = "info") -> None:
+            store.append_log(job_id, f"[{level.upper()}] {message}" if level != "info" else message)
+            if log is not None:
+                log(message, level)
+
+        try:
+            with trace_request(f"job {job_id}") if trace else nullcontext() as recorder:
+                try:
+                    result = run_generation_pipeline(
+                        user_query,
+                        file_context,
+                        config,
+                        log=add_log,
+                        status=lambda message: store.update(job_id, status_message=message),
+                        progress=lambda attempt, max_attempts: store.update(job_id, attempt=attempt, max_attempts=max_attempts)
+                    )
+                finally:
+                    if recorder is not None:
+                        store.update(job_id, trace=recorder.to_chrome_trace())
+        except Exception as e:
+            add_log(f"Generation job failed: {type(e).__name__}: {e}", "error")
+            store.update(job_id, status=JOB_FAILED, error=str(e), finished_at=time.time(), status_message="Failed.")
+            return
+        if result.cancelled or token.cancelled:
+            self._finish_cancelled(job_id, token, result)
+            return
+        store.update(job_id, status=JOB_COMPLETED, result=result, finished_at=time.time())
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+_default_runner = JobRunner()
+
+
+def get_job_runner() -> JobRunner:
+    """Return the job runner shared by every session of the process."""
+    return _default_runner
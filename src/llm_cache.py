@@ -0,0 +1,193 @@
+"""
+Persistent prompt -> response cache for LLM calls.
+
+With low sampling temperatures the same prompt usually produces the same code, and
+users (and offline evaluations) replay identical prompts. Responses are stored in a
+local SQLite database keyed by hashes of the model, system prompt, user prompt and
+sampling parameters, so a cache hit skips the network round-trip entirely.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+_project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_CACHE_PATH = os.path.join(_project_root, '.llm_cache', 'responses.sqlite3')
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+# Only responses sampled at or below this temperature are cached
+CACHEABLE_MAX_TEMPERATURE = 0.3
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(model_name: str, system_prompt: str, user_prompt: str, **sampling_params: Any) -> str:
+    """
+    Build the cache key for an LLM call.
+
+    Args:
+        model_name: Name of the model
+        system_prompt: System prompt sent with the request
+        user_prompt: User prompt (or serialized conversation) sent with the request
+        **sampling_params: Sampling parameters such as temperature and max_tokens
+
+    Returns:
+        Hex digest identifying the request
+    """
+    payload = json.dumps({
+        "model": model_name,
+        "system_prompt": _sha256(system_prompt),
+        "user_prompt": _sha256(user_prompt),
+        "params": sampling_params
+    }, sort_keys=True)
+    return _sha256(payload)
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed response cache with TTL and size-based LRU eviction.
+
+    A single connection is shared by all threads of the process and guarded by a
+    lock. Hit/miss counters are kept in memory for the lifetime of the process.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_accessed ON responses(last_accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for ``key``, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response and evict expired and least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), now, now)
+            )
+            self.stores += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used ones until within limits."""
+        cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.evictions += max(cursor.rowcount, 0)
+
+        count, total_size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_accessed ASC").fetchall()
+        for key, size in rows:
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total_size -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count, stored bytes and hit-rate metrics."""
+        with self._lock:
+            count, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": count,
+                "bytes": total_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """
+    Return the process-wide response cache, or None if caching is disabled.
+
+    The cache location can be overridden with the LLM_CACHE_PATH environment
+    variable, and caching turned off with LLM_CACHE_ENABLED=0.
+    """
+    global _default_cache
+    if os.getenv("LLM_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = LLMResponseCache(os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH))
+            except sqlite3.Error as e:
+                print(f"Warning: LLM response cache unavailable: {e}")
+                return None
+        return _default_cache
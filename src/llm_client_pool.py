@@ -0,0 +1,335 @@
+"""
+Pooled LLM client instances.
+
+Building a new ChatOpenAI / ChatGoogleGenerativeAI object on every attempt throws
+away its HTTP connection pool and TLS sessions, so every retry pays the connection
+setup again. This module keeps a bounded, thread-safe registry of client instances
+keyed by everything that changes their behaviour, so all Streamlit sessions of the
+process share warm keep-alive connections.
+
+Run this module directly to benchmark pooled vs. unpooled clients against a local
+stub HTTP server:
+
+    python -m src.llm_client_pool
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_CLIENTS = 16
+DEFAULT_IDLE_TIMEOUT_SECONDS = 300.0
+
+# Keep-alive limits of the shared HTTP transport used by OpenAI clients
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class ClientKey:
+    """Identifies a reusable LLM client instance."""
+    provider: str
+    model: str
+    key_fingerprint: str
+    temperature: float
+    max_tokens: int
+
+
+def fingerprint_api_key(api_key: Optional[str]) -> str:
+    """Return a short, non-reversible fingerprint of an API key for use in cache keys."""
+    if not api_key:
+        return ""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class LLMClientPool:
+    """
+    Bounded LRU registry of LLM client instances with idle eviction.
+
+    Clients are created lazily by a factory on first use and shared by every caller
+    using the same ClientKey. The least recently used client is dropped when the
+    pool is full, and clients unused for longer than ``idle_timeout`` seconds are
+    dropped on the next access.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_CLIENTS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT_SECONDS
+    ):
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self._clients: "OrderedDict[ClientKey, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: ClientKey, factory: Callable[[], Any]) -> Any:
+        """
+        Return the pooled client for ``key``, creating it with ``factory`` if needed.
+
+        Args:
+            key: Identity of the client
+            factory: Zero-argument callable building a new client
+
+        Returns:
+            The shared client instance
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._clients.get(key)
+            if entry is not None:
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            # Created under the lock so concurrent sessions never build duplicates
+            client = factory()
+            self.misses += 1
+            self._clients[key] = (client, now)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop clients that have not been used within the idle timeout."""
+        if self.idle_timeout <= 0:
+            return
+        expired = [key for key, (_, last_used) in self._clients.items() if now - last_used > self.idle_timeout]
+        for key in expired:
+            del self._clients[key]
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every pooled client."""
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._clients),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+_default_pool = LLMClientPool()
+_http_clients: Dict[str, Any] = {}
+_http_clients_lock = threading.Lock()
+
+
+def get_client_pool() -> LLMClientPool:
+    """Return the process-wide client pool shared by all sessions."""
+    return _default_pool
+
+
+def _http_limits() -> Any:
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def _loop_local_transport() -> Any:
+    """
+    Build an httpx transport that sends through a separate client per event loop.
+
+    Async connections belong to the loop that opened them, but a pooled ChatOpenAI
+    keeps the async client it was built with for every loop (each asyncio.run()
+    call, each analysis thread). The shared async client therefore has no
+    connection pool of its own: its transport forwards every request to an
+    httpx.AsyncClient of the running loop. Clients of closed loops are dropped,
+    never reused.
+    """
+    import httpx
+
+    class LoopLocalTransport(httpx.AsyncBaseTransport):
+        def __init__(self):
+            self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+                weakref.WeakKeyDictionary()
+            )
+            self._loop_clients_lock = threading.Lock()
+
+        def for_running_loop(self, create: bool = True) -> Optional[httpx.AsyncClient]:
+            loop = asyncio.get_running_loop()
+            with self._loop_clients_lock:
+                for closed_loop in [other for other in self._loop_clients if other.is_closed()]:
+                    del self._loop_clients[closed_loop]
+                client = self._loop_clients.get(loop)
+                if client is None and create:
+                    client = self._loop_clients[loop] = httpx.AsyncClient(limits=_http_limits())
+                return client
+
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            # Streamed, so the caller's client reads (and closes) the body itself
+            return await self.for_running_loop().send(request, stream=True)
+
+        async def aclose_for_running_loop(self) -> None:
+            client = self.for_running_loop(create=False)
+            if client is not None:
+                with self._loop_clients_lock:
+                    self._loop_clients.pop(asyncio.get_running_loop(), None)
+                await client.aclose()
+
+        async def aclose(self) -> None:
+            await self.aclose_for_running_loop()
+
+    return LoopLocalTransport()
+
+
+def get_shared_http_client(asynchronous: bool = False) -> Any:
+    """
+    Return the process-wide httpx client used as transport by pooled OpenAI clients.
+
+    Sharing one transport keeps keep-alive connections warm across models and
+    sampling settings, with bounded pool size and idle connection expiry. The async
+    client keeps one connection pool per event loop (see _loop_local_transport).
+    """
+    import httpx
+
+    kind = "async" if asynchronous else "sync"
+    with _http_clients_lock:
+        client = _http_clients.get(kind)
+        if client is None:
+            if asynchronous:
+                transport = _http_clients["async transport"] = _loop_local_transport()
+                client = httpx.AsyncClient(transport=transport)
+            else:
+                client = httpx.Client(limits=_http_limits())
+            _http_clients[kind] = client
+        return client
+
+
+async def aclose_loop_http_client() -> None:
+    """
+    Close the connections the shared async client opened on the running loop.
+
+    Await it last in a loop that is about to be closed (e.g. before loop.close()).
+    """
+    with _http_clients_lock:
+        transport = _http_clients.get("async transport")
+    if transport is not None:
+        await transport.aclose_for_running_loop()
+
+
+def _start_stub_server():
+    """Start a local OpenAI-compatible stub server that counts TCP connections."""
+    import json
+    import socket
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.server.counter_lock:
+                self.server.connections += 1
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "```python\nprint('hello')\n```"},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.connections = 0
+    server.counter_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """Benchmark pooled vs. unpooled clients against a local stub HTTP server."""
+    import httpx
+    from langchain_core.messages import HumanMessage
+    from langchain_openai import ChatOpenAI
+
+    calls = 50
+    server = _start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    messages = [HumanMessage(content="print hello")]
+
+    print(f"Benchmarking {calls} sequential calls against {base_url}")
+    print("=" * 60)
+
+    # Unpooled: a new client (and HTTP transport) on every attempt
+    server.connections = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        llm = ChatOpenAI(
+            model="stub", api_key="stub-key", base_url=base_url,
+            http_client=httpx.Client(), max_retries=0
+        )
+        llm.invoke(messages)
+    unpooled_time = time.perf_counter() - start
+    unpooled_connections = server.connections
+
+    # Pooled: one client and one keep-alive transport reused for every attempt
+    pool = LLMClientPool()
+    key = ClientKey("openai", "stub", fingerprint_api_key("stub-key"), 0.2, 2000)
+    server.connections = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        llm = pool.get(key, lambda: ChatOpenAI(
+            model="stub", api_key="stub-key", base_url=base_url,
+            http_client=get_shared_http_client(), max_retries=0
+        ))
+        llm.invoke(messages)
+    pooled_time = time.perf_counter() - start
+    pooled_connections = server.connections
+
+    server.shutdown()
+
+    print(f"Unpooled: {unpooled_time:.3f}s total, {unpooled_time / calls * 1000:.2f} ms/call, "
+          f"{unpooled_connections} connections")
+    print(f"Pooled:   {pooled_time:.3f}s total, {pooled_time / calls * 1000:.2f} ms/call, "
+          f"{pooled_connections} connections")
+    print(f"Speedup:  {unpooled_time / pooled_time:.2f}x")
+    print(f"Pool stats: {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain_core.messages import SystemMessage, HumanMessage
-from typing import Optional
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from src.cancellation import CancellationToken, OperationCancelled, await_cancellable, run_in_thread
+from src.code_parser import IncrementalCodeBlockParser
+from src.llm_cache import CACHEABLE_MAX_TEMPERATURE, LLMResponseCache, get_response_cache, make_cache_key
+from src.llm_client_pool import ClientKey, fingerprint_api_key, get_client_pool
+from src.model_registry import get_model_spec
+from src.rate_limiter import MAX_RATE_LIMIT_RETRIES, get_rate_limiter, handle_rate_limit_error, is_rate_limit_error
+from src.token_budget import count_tokens
 
 SYSTEM_PROMPT_TEMPLATE = (
     "You are an assistant that exclusively provides Python code. "
@@ -12,78 +20,402 @@ SYSTEM_PROMPT_TEMPLATE = (
     "Ensure the code is complete and directly usable."
 )
 
+def _get_llm(
+    model_name: str,
+    openai_api_key: Optional[str],
+    google_api_key: Optional[str],
+    temperature: float,
+    max_tokens: int
+) -> Tuple[Optional[Any], Optional[str]]:
+    """
+    Returns the pooled chat model for the given settings, built by the model registry.
+
+    Stateful models (the scripted stub) get a new client for every call.
+
+    Returns:
+        Tuple of (chat model, None) on success or (None, error message).
+    """
+    spec = get_model_spec(model_name)
+    if spec is None:
+        return None, f"Error: Unsupported model '{model_name}'."
+
+    api_key = {"openai": openai_api_key, "google": google_api_key}.get(spec.provider)
+    if spec.api_key_label and not api_key:
+        return None, f"Error: {spec.api_key_label} API Key not provided."
+
+    if spec.stateful:
+        return spec.factory(spec, api_key, temperature, max_tokens), None
+    key = ClientKey(spec.provider, spec.name, fingerprint_api_key(api_key), temperature, max_tokens)
+    return get_client_pool().get(key, lambda: spec.factory(spec, api_key, temperature, max_tokens)), None
+
+
+def _build_messages(user_query: str, history: Optional[List[Tuple[str, str]]] = None) -> List[Any]:
+    messages: List[Any] = [SystemMessage(content=SYSTEM_PROMPT_TEMPLATE)]
+    for human_turn, ai_turn in history or []:
+        messages.append(HumanMessage(content=human_turn))
+        messages.append(AIMessage(content=ai_turn))
+    messages.append(HumanMessage(content=user_query))
+    return messages
+
+
+def _conversation_text(user_query: str, history: Optional[List[Tuple[str, str]]]) -> str:
+    """The prompt text of a call, earlier turns included; the query alone without history."""
+    if not history:
+        return user_query
+    turns = [f"[user]\n{human_turn}\n[assistant]\n{ai_turn}" for human_turn, ai_turn in history]
+    return "\n".join(turns + [f"[user]\n{user_query}"])
+
+
+def _cache_for(
+    model_name: str,
+    user_query: str,
+    temperature: float,
+    max_tokens: int,
+    first_block_only: bool = False
+) -> Tuple[Optional[LLMResponseCache], str]:
+    """
+    Returns the response cache to use for a call (None if not cacheable) and the call's cache key.
+
+    Responses cut after their first code block get their own key, so they are never
+    served to calls that need the whole response. Responses of stateful models
+    (the scripted stub) are not cached: the same prompt may get another reply.
+    """
+    spec = get_model_spec(model_name)
+    cacheable = temperature <= CACHEABLE_MAX_TEMPERATURE and not (spec is not None and spec.stateful)
+    cache = get_response_cache() if cacheable else None
+    params: Dict[str, Any] = {"temperature": temperature, "max_tokens": max_tokens}
+    if first_block_only:
+        params["first_block_only"] = True
+    cache_key = make_cache_key(model_name, SYSTEM_PROMPT_TEMPLATE, user_query, **params)
+    return cache, cache_key
+
+
+def _estimate_request_tokens(model_name: str, user_query: str, max_tokens: int) -> int:
+    """Token cost of a call (prompt plus maximum output) for tokens-per-minute limiting."""
+    return count_tokens(SYSTEM_PROMPT_TEMPLATE, model_name) + count_tokens(user_query, model_name) + max_tokens
+
+
+def _call_with_rate_limit(model_name: str, user_query: str, max_tokens: int, call: Callable[[], str]) -> str:
+    """
+    Runs ``call`` behind the shared rate limiter of the model, retrying rate limit errors.
+
+    Other exceptions, and rate limit errors once retries are exhausted, propagate.
+    """
+    spec = get_model_spec(model_name)
+    if spec is not None and not spec.rate_limited:
+        return call()
+    limiter = get_rate_limiter(spec.provider if spec else "unknown", model_name)
+    tokens = _estimate_request_tokens(model_name, user_query, max_tokens)
+    for retry in range(MAX_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(tokens)
+        try:
+            return call()
+        except Exception as e:
+            if retry == MAX_RATE_LIMIT_RETRIES or not is_rate_limit_error(e):
+                raise
+            time.sleep(handle_rate_limit_error(e, limiter, retry))
+    raise RuntimeError("unreachable")
+
+
+async def _acall_with_rate_limit(
+    model_name: str,
+    user_query: str,
+    max_tokens: int,
+    call: Callable[[], Awaitable[str]]
+) -> str:
+    """Async version of _call_with_rate_limit; waiting never blocks the event loop."""
+    spec = get_model_spec(model_name)
+    if spec is not None and not spec.rate_limited:
+        return await call()
+    limiter = get_rate_limiter(spec.provider if spec else "unknown", model_name)
+    tokens = _estimate_request_tokens(model_name, user_query, max_tokens)
+    for retry in range(MAX_RATE_LIMIT_RETRIES + 1):
+        await limiter.acquire_async(tokens)
+        try:
+            return await call()
+        except Exception as e:
+            if retry == MAX_RATE_LIMIT_RETRIES or not is_rate_limit_error(e):
+                raise
+            await asyncio.sleep(handle_rate_limit_error(e, limiter, retry))
+    raise RuntimeError("unreachable")
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Returns the text of a streamed message chunk."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+    return str(content)
+
+
+def _cancelled_response(error: OperationCancelled) -> str:
+    """Error string returned by a cancelled call; never cached."""
+    return f"Error: LLM call cancelled ({error})."
+
+
+def _stream_text(llm: Any, messages: List[Any], cancel_token: CancellationToken) -> str:
+    """Collect a streamed response, stopping (and closing the stream) once the token is cancelled."""
+    parts = []
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            if cancel_token.cancelled:
+                break
+            parts.append(_chunk_text(chunk))
+    finally:
+        stream.close()
+    return "".join(parts)
+
+
 def get_llm_response(
     user_query: str,
     model_name: str,
     openai_api_key: Optional[str] = None,
     google_api_key: Optional[str] = None,
     temperature: float = 0.2, # Lower temperature for more deterministic code (we can experiment with 0.05 to 0.3)
-    max_tokens: int = 2000
+    max_tokens: int = 2000,
+    bypass_cache: bool = False,
+    history: Optional[List[Tuple[str, str]]] = None,
+    cancel_token: Optional[CancellationToken] = None
 ) -> str:
     """
     Gets a response from the specified LLM.
 
+    Client instances are shared through the process-wide client pool, so retries
+    and other sessions reuse warm keep-alive connections. Responses sampled at low
+    temperature are served from and stored in the persistent response cache. Calls
+    go through the shared per-model rate limiter and rate limit errors are retried
+    with backoff.
+
     Args:
         user_query (str): The user's query or the feedback prompt.
-        model_name (str): "gpt-4o-mini" or "gemini-1.5-flash-latest".
+        model_name (str): Name of a model in the model registry, e.g. "gpt-4o-mini".
         openai_api_key (Optional[str]): OpenAI API key.
         google_api_key (Optional[str]): Google API key.
         temperature (float): Sampling temperature for the LLM.
         max_tokens (int): Max tokens for the LLM response.
+        bypass_cache (bool): If True, skip the cache lookup and refresh the cached response.
+        history (Optional[List[Tuple[str, str]]]): Earlier (user prompt, LLM response) turns
+            of the conversation, sent before ``user_query``. Keeping them identical across
+            calls lets providers reuse their cached prefix.
+        cancel_token (Optional[CancellationToken]): Cancelling it returns at once with an
+            "Error: LLM call cancelled" string. The response is then streamed, so the
+            abandoned request is closed as soon as its next chunk arrives.
 
     Returns:
         str: The LLM's response content.
     """
     try:
-        if model_name == "gpt-4o-mini":
-            if not openai_api_key:
-                return "Error: OpenAI API Key not provided."
-            llm = ChatOpenAI(
-                model_name="gpt-4o-mini",
-                api_key=openai_api_key,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-        elif model_name == "gpt-3.5-turbo":
-            if not openai_api_key:
-                return "Error: OpenAI API Key not provided."
-            llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                api_key=openai_api_key,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-
-        elif model_name == "gemini-1.5-flash-latest":
-            if not google_api_key:
-                return "Error: Google API Key not provided."
-            llm = ChatGoogleGenerativeAI(
-                model="models/gemini-1.5-flash-latest",
-                google_api_key=google_api_key,
-                temperature=temperature,
-                max_output_tokens=max_tokens,
-            )
-        elif model_name == "gemini-2.0-flash":
-            if not google_api_key:
-                return "Error: Google API Key not provided."
-            llm = ChatGoogleGenerativeAI(
-                model="models/gemini-2.0-flash",
-                google_api_key=google_api_key,
-                temperature=temperature,
-                max_output_tokens=max_tokens,
-            )
-
-        else:
-            return f"Error: Unsupported model '{model_name}'."
-
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT_TEMPLATE),
-            HumanMessage(content=user_query),
-        ]
-        
-        response = llm.invoke(messages)
-        return response.content
+        llm, error = _get_llm(model_name, openai_api_key, google_api_key, temperature, max_tokens)
+        if error:
+            return error
+
+        prompt_text = _conversation_text(user_query, history)
+        cache, cache_key = _cache_for(model_name, prompt_text, temperature, max_tokens)
+        if cache is not None and not bypass_cache:
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        messages = _build_messages(user_query, history)
+
+        def invoke() -> str:
+            if cancel_token is None:
+                return llm.invoke(messages).content
+            return _stream_text(llm, messages, cancel_token)
+
+        content = run_in_thread(
+            lambda: _call_with_rate_limit(model_name, prompt_text, max_tokens, invoke),
+            cancel_token, f"LLM request ({model_name})"
+        )
+        if cache is not None and content:
+            cache.put(cache_key, content)
+        return content
     
+    except OperationCancelled as e:
+        return _cancelled_response(e)
     except Exception as e:
         # Catch potential API errors, configuration issues,  etc.
         return f"Error during LLM call: {str(e)}"
+
+
+async def aget_llm_response(
+    user_query: str,
+    model_name: str,
+    openai_api_key: Optional[str] = None,
+    google_api_key: Optional[str] = None,
+    temperature: float = 0.2,
+    max_tokens: int = 2000,
+    bypass_cache: bool = False,
+    history: Optional[List[Tuple[str, str]]] = None,
+    cancel_token: Optional[CancellationToken] = None
+) -> str:
+    """
+    Async version of get_llm_response, built on ``llm.ainvoke``.
+
+    Cancelling ``cancel_token`` cancels the request task, which aborts the HTTP request.
+
+    Waiting for the rate limiter and backing off after rate limit errors never
+    blocks the event loop, so many requests can be queued concurrently. Takes the
+    same arguments and follows the same error-string convention as get_llm_response.
+    """
+    try:
+        llm, error = _get_llm(model_name, openai_api_key, google_api_key, temperature, max_tokens)
+        if error:
+            return error
+
+        prompt_text = _conversation_text(user_query, history)
+        cache, cache_key = _cache_for(model_name, prompt_text, temperature, max_tokens)
+        if cache is not None and not bypass_cache:
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        messages = _build_messages(user_query, history)
+
+        async def invoke() -> str:
+            response = await llm.ainvoke(messages)
+            return response.content
+
+        content = await await_cancellable(
+            _acall_with_rate_limit(model_name, prompt_text, max_tokens, invoke),
+            cancel_token, f"LLM request ({model_name})"
+        )
+        if cache is not None and content:
+            cache.put(cache_key, content)
+        return content
+
+    except OperationCancelled as e:
+        return _cancelled_response(e)
+    except Exception as e:
+        return f"Error during LLM call: {str(e)}"
+
+
+def stream_llm_response(
+    user_query: str,
+    model_name: str,
+    openai_api_key: Optional[str] = None,
+    google_api_key: Optional[str] = None,
+    temperature: float = 0.2,
+    max_tokens: int = 2000,
+    bypass_cache: bool = False,
+    history: Optional[List[Tuple[str, str]]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    stop_at_first_block: bool = False
+) -> str:
+    """
+    Streams a response from the specified LLM.
+
+    Takes the same arguments and follows the same error-string convention as
+    get_llm_response; a cancelled ``cancel_token`` closes the stream at the next chunk.
+    With ``stop_at_first_block``, chunks are scanned by an IncrementalCodeBlockParser
+    and, as soon as the closing fence of the first Python block arrives, the stream
+    is closed, which cancels the rest of the generation. Code split across several
+    blocks is then cut to its first block, so the extraction cannot merge them.
+
+    Returns:
+        str: The whole response, or with ``stop_at_first_block`` the text up to and
+        including the first complete code block (the whole response if it contains none).
+    """
+    try:
+        llm, error = _get_llm(model_name, openai_api_key, google_api_key, temperature, max_tokens)
+        if error:
+            return error
+
+        prompt_text = _conversation_text(user_query, history)
+        cache, cache_key = _cache_for(model_name, prompt_text, temperature, max_tokens, stop_at_first_block)
+        if cache is not None and not bypass_cache:
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        messages = _build_messages(user_query, history)
+
+        def stream_response() -> str:
+            parser = IncrementalCodeBlockParser()
+            parts = []
+            stream = llm.stream(messages)
+            try:
+                for chunk in stream:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        break
+                    text = _chunk_text(chunk)
+                    parts.append(text)
+                    if stop_at_first_block and parser.feed(text) is not None:
+                        break
+            finally:
+                # Closing the generator aborts the underlying HTTP stream
+                stream.close()
+            return "".join(parts)
+
+        text = run_in_thread(
+            lambda: _call_with_rate_limit(model_name, prompt_text, max_tokens, stream_response),
+            cancel_token, f"LLM stream ({model_name})"
+        )
+        if cache is not None and text:
+            cache.put(cache_key, text)
+        return text
+
+    except OperationCancelled as e:
+        return _cancelled_response(e)
+    except Exception as e:
+        return f"Error during LLM call: {str(e)}"
+
+
+async def astream_llm_response(
+    user_query: str,
+    model_name: str,
+    openai_api_key: Optional[str] = None,
+    google_api_key: Optional[str] = None,
+    temperature: float = 0.2,
+    max_tokens: int = 2000,
+    bypass_cache: bool = False,
+    history: Optional[List[Tuple[str, str]]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    stop_at_first_block: bool = False
+) -> str:
+    """
+    Async version of stream_llm_response, built on ``llm.astream``.
+    """
+    try:
+        llm, error = _get_llm(model_name, openai_api_key, google_api_key, temperature, max_tokens)
+        if error:
+            return error
+
+        prompt_text = _conversation_text(user_query, history)
+        cache, cache_key = _cache_for(model_name, prompt_text, temperature, max_tokens, stop_at_first_block)
+        if cache is not None and not bypass_cache:
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        messages = _build_messages(user_query, history)
+
+        async def stream_response() -> str:
+            parser = IncrementalCodeBlockParser()
+            parts = []
+            stream = llm.astream(messages)
+            try:
+                async for chunk in stream:
+                    text = _chunk_text(chunk)
+                    parts.append(text)
+                    if stop_at_first_block and parser.feed(text) is not None:
+                        break
+            finally:
+                await stream.aclose()
+            return "".join(parts)
+
+        text = await await_cancellable(
+            _acall_with_rate_limit(model_name, prompt_text, max_tokens, stream_response),
+            cancel_token, f"LLM stream ({model_name})"
+        )
+        if cache is not None and text:
+            cache.put(cache_key, text)
+        return text
+
+    except OperationCancelled as e:
+        return _cancelled_response(e)
+    except Exception as e:
+        return f"Error during LLM call: {str(e)}"
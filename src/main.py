@@ -1,69 +1,23 @@
-#%%
-import os
-import re
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda
-#%%
-# Load environment variables from .env file
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', 'config', '.env'))
-#%%
-# Ensure the OPENAI_API_KEY is loaded (optional: add error handling)
-api_key = os.getenv("OPENAI_API_KEY")
-#%%
-if not api_key:
-    print("Error: OPENAI_API_KEY not found in .env file.")
-    exit()
-#%%
-llm = ChatOpenAI(openai_api_key=api_key)
-#%%
-prompt = ChatPromptTemplate.from_messages([
-    ("system", "You are a helpful assistant."),
-    ("user", "{input}")
-])
-#%%
-def extract_python_code(text: str) -> str:
-    """Extracts code from a Python Markdown code block.
-
-    Args:
-        text: The raw text response from the LLM.
-
-    Returns:
-        The extracted Python code, or the original text if no block is found.
-    """
-    match = re.search(r"```python\n(.*?)\n```", text, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    # Fallback or handle cases where no code block is found
-    print("Warning: No Python code block found in the response.") 
-    # Decide on fallback: return original text, empty string, or raise error?
-    # Returning original text for now, but might need adjustment.
-    return text # Or return "" or raise ValueError("No Python code block found")
-
-output_parser = StrOutputParser()
-codeparser = RunnableLambda(extract_python_code)
+"""
+Command-line entry point.
 
-chain = prompt | llm | output_parser | codeparser
-#%%
-input_text = "generate a python code to print hello world"
-print(f"Invoking chain with input: '{input_text}'")
-response = chain.invoke({"input": input_text})
+Runs the generation pipeline headlessly over a JSONL file of prompts; see
+src/batch.py for the input and output formats. The web interface lives in
+web/streamlit/app.py.
 
-print("\nResponse:")
-print(response)
+Usage:
+    python -m src.main prompts.jsonl -o results.jsonl --concurrency 8 --resume
+"""
 
-# %%
-
-from openevals.code.pyright import create_pyright_evaluator
-
-evaluator = create_pyright_evaluator()
-
-response = "print('Hello, World!')" 
+import os
+import sys
 
-result = evaluator(outputs=response)
+# Add the project root to Python path to enable imports when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-print(result)
+from src.batch import main
 
-# %%
\ No newline at end of file
+if __name__ == "__main__":
+    main()
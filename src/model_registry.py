@@ -0,0 +1,108 @@
+"""
+Declarative registry of the LLMs the pipeline can use.
+
+Each entry describes a model (provider, model id, context window, output limit,
+pricing) and how to build its chat client. The Streamlit app, the LLM handler and
+the prompt budgeting all read from this table, so adding a model is one entry.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# Label of the API key each provider needs; providers missing here need no key
+PROVIDER_API_KEY_LABELS = {
+    "openai": "OpenAI",
+    "google": "Google",
+}
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Description of a model and the factory building its chat client."""
+    name: str
+    provider: str
+    model_id: str
+    context_window: int
+    max_output_tokens: int
+    input_price_per_million: float
+    output_price_per_million: float
+    # factory(spec, api_key, temperature, max_tokens) -> chat model
+    factory: Callable[["ModelSpec", Optional[str], float, int], Any]
+    rate_limited: bool = True
+    # Replies depend on more than the prompt (e.g. a scripted sequence): a client is
+    # built for every call instead of pooled, and responses are never cached
+    stateful: bool = False
+
+    @property
+    def api_key_label(self) -> Optional[str]:
+        """Label of the API key this model needs, or None if it needs none."""
+        return PROVIDER_API_KEY_LABELS.get(self.provider)
+
+    def estimate_cost(self, input_tokens: int, output_tokens: int) -> float:
+        """Estimated cost in USD of a call with the given token counts."""
+        return (
+            input_tokens * self.input_price_per_million
+            + output_tokens * self.output_price_per_million
+        ) / 1_000_000
+
+
+def _openai_factory(spec: ModelSpec, api_key: Optional[str], temperature: float, max_tokens: int) -> Any:
+    from langchain_openai import ChatOpenAI
+    from src.llm_client_pool import get_shared_http_client
+
+    return ChatOpenAI(
+        model_name=spec.model_id,
+        api_key=api_key,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        http_client=get_shared_http_client(),
+        http_async_client=get_shared_http_client(asynchronous=True)
+    )
+
+
+def _google_factory(spec: ModelSpec, api_key: Optional[str], temperature: float, max_tokens: int) -> Any:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=spec.model_id,
+        google_api_key=api_key,
+        temperature=temperature,
+        max_output_tokens=max_tokens,
+    )
+
+
+def _stub_factory(spec: ModelSpec, api_key: Optional[str], temperature: float, max_tokens: int) -> Any:
+    from src.stub_llm import StubChatModel
+
+    return StubChatModel()
+
+
+MODEL_REGISTRY: Dict[str, ModelSpec] = {}
+
+
+def register_model(spec: ModelSpec) -> None:
+    """Add (or replace) a model in the registry."""
+    MODEL_REGISTRY[spec.name] = spec
+
+
+def get_model_spec(name: str) -> Optional[ModelSpec]:
+    """Return the registered model called ``name``, or None."""
+    return MODEL_REGISTRY.get(name)
+
+
+def list_models(include_offline: bool = True) -> List[str]:
+    """Names of the registered models, in registration order."""
+    return [
+        name for name, spec in MODEL_REGISTRY.items()
+        if include_offline or spec.provider != "stub"
+    ]
+
+
+for _spec in (
+    ModelSpec("gpt-4o-mini", "openai", "gpt-4o-mini", 128_000, 16_384, 0.15, 0.60, _openai_factory),
+    ModelSpec("gpt-3.5-turbo", "openai", "gpt-3.5-turbo", 16_385, 4_096, 0.50, 1.50, _openai_factory),
+    ModelSpec("gemini-1.5-flash-latest", "google", "models/gemini-1.5-flash-latest", 1_048_576, 8_192, 0.075, 0.30, _google_factory),
+    ModelSpec("gemini-2.0-flash", "google", "models/gemini-2.0-flash", 1_048_576, 8_192, 0.10, 0.40, _google_factory),
+    ModelSpec("stub-offline", "stub", "stub-offline", 128_000, 4_096, 0.0, 0.0, _stub_factory, rate_limited=False, stateful=True),
+):
+    register_model(_spec)
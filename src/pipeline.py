@@ -0,0 +1,701 @@
+"""
+Generate -> analyze -> retry pipeline.
+
+The loop used to live inline in the Streamlit script. It is kept free of Streamlit
+so it can be driven from the web app, from worker threads and from scripts: progress
+is reported through ``log(message, level)`` and ``status(message)`` callbacks.
+
+Two modes are available:
+- Sequential: generate, analyze, build feedback, generate again (up to max_attempts).
+- Speculative: each round asks for K candidates concurrently at spread-out
+  temperatures, analyzes them in parallel and accepts the first candidate without
+  blocking issues. If none pass, the best-scoring candidate is fed back.
+
+A run is cancelled through ``config.cancel_token``: the LLM calls and analyzer
+processes in flight are interrupted and the run returns a cancelled result.
+
+LLM calls and analyses are admitted by the process-wide admission controller,
+which caps each stage and serves the sessions (``config.session_id``) fairly.
+Every stage is timed with src.instrumentation spans.
+"""
+
+import contextvars
+import functools
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from src.admission import (
+    DEFAULT_SESSION, STAGE_DYNAMIC, STAGE_LLM, STAGE_STATIC, AdmissionRejected, get_admission_controller
+)
+from src.cancellation import CancellationToken, OperationCancelled
+from src.instrumentation import (
+    STAGE_ANALYZER, STAGE_ATTEMPT, STAGE_EXTRACTION, STAGE_LLM_CALL, STAGE_PROMPT, STAGE_RUN, span
+)
+from src.llm_handler import SYSTEM_PROMPT_TEMPLATE, get_llm_response, stream_llm_response
+from src.code_artifact import CodeArtifact, as_code_artifact
+from src.code_parser import extract_code_artifact
+from src.analysis.static_analyzer.static_analyzer import run_pylint, run_bandit, run_mypy
+from src.analysis.dynamic_analyzer.dynamic_analyzer_main import DynamicAnalysisFramework, run_dynamic_analysis
+from src.utils import temporary_python_file
+from src.context_handler import initial_prompt_sections, feedback_prompt_sections, delta_feedback_prompt_sections
+from src.issue_aggregator import DEFAULT_ISSUE_TOKEN_BUDGET, compress_issues, is_blocking_issue
+from src.model_registry import get_model_spec
+from src.token_budget import (
+    PromptSection, count_tokens, fit_sections_to_budget, format_token_report,
+    prompt_token_budget, render_prompt_sections
+)
+
+MAX_ATTEMPTS = 5
+DEFAULT_TEMPERATURE = 0.2
+DEFAULT_MAX_OUTPUT_TOKENS = 2000
+
+# Speculative mode: number of concurrent candidates and their temperature range
+SPECULATIVE_CANDIDATES = 3
+SPECULATIVE_MIN_TEMPERATURE = 0.2
+SPECULATIVE_MAX_TEMPERATURE = 0.8
+
+NO_CODE_BLOCK_ISSUE = "LLM did not return a recognizable Python code block."
+# Prefix of the issue reported when an admission queue was full; never fed back to the LLM
+SERVER_OVERLOADED = "Error: Server overloaded"
+# Prefixes of the error strings returned by the LLM handler instead of a response
+LLM_ERROR_PREFIXES = ("Error:", "Error during LLM call")
+NO_CODE_BLOCK_FEEDBACK = (
+    "Your response did not contain a valid Python code block. "
+    "Please provide ONLY a Python code block enclosed in ```python ... ```."
+)
+
+
+def _noop_log(message: str, level: str = "info") -> None:
+    pass
+
+
+def _noop_status(message: str) -> None:
+    pass
+
+
+def _noop_progress(attempt: int, max_attempts: int) -> None:
+    pass
+
+
+@dataclass
+class PipelineConfig:
+    """Settings for one run of the generation pipeline."""
+    model_name: str
+    openai_api_key: Optional[str] = None
+    google_api_key: Optional[str] = None
+    max_attempts: int = MAX_ATTEMPTS
+    stream_responses: bool = True
+    # Close the stream at the first complete code block (code split across blocks is then cut)
+    stop_at_first_block: bool = False
+    bypass_cache: bool = False
+    speculative_candidates: int = 0  # 0 or 1 runs the sequential loop
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+    # Retries continue the first conversation turn and send only issues and a diff
+    conversational_retries: bool = False
+    cancel_token: Optional[CancellationToken] = None
+    # Requests of one session share its turn in the admission queues
+    session_id: str = DEFAULT_SESSION
+    # Also run the code profiled in the CodeAct sandbox and report slow functions
+    # and memory peaks (skipped when CodeAct is not installed)
+    profile_performance: bool = False
+
+
+@dataclass
+class PipelineResult:
+    """Outcome of a pipeline run, as displayed by the app."""
+    generated_code: str
+    analysis_issues: List[str]
+    attempt: int
+    max_attempts: int
+    success: bool
+    cancelled: bool = False
+    # An LLM call or the analysis was not admitted; the request can be retried later
+    overloaded: bool = False
+    # The run ended on a failed LLM call (network, quota, rate limit), not on the code
+    llm_error: bool = False
+
+
+@dataclass
+class Candidate:
+    """One generated candidate of a speculative round."""
+    temperature: float
+    response: str = ""
+    code: Optional[str] = None
+    artifact: Optional[CodeArtifact] = None
+    issues: List[str] = field(default_factory=list)
+    blocking_issues: int = 0
+    overloaded: bool = False
+
+    @property
+    def score(self) -> int:
+        """Lower is better: blocking issues weigh ten times more than the rest."""
+        return self.blocking_issues * 10 + (len(self.issues) - self.blocking_issues)
+
+
+def run_analyzers(
+    code: Union[str, CodeArtifact],
+    cancel_token: Optional[CancellationToken] = None,
+    session_id: str = DEFAULT_SESSION,
+    profile: bool = False
+) -> Dict[str, List[str]]:
+    """
+    Run every analyzer on the code.
+
+    The external tools share one temporary copy of the source and one slot of the
+    static analysis stage; the in-process analyses share the artifact's AST and
+    tokens. With ``profile``, the code is also executed under the profiler in the
+    CodeAct sandbox, when available, and its findings reported as "Performance".
+    Cancelling ``cancel_token`` kills the running tool and the remaining
+    ones report themselves as cancelled; the analyses not started are left out.
+
+    Returns:
+        Mapping from analyzer name to its list of issues, in reporting order
+
+    Raises:
+        AdmissionRejected: A stage queue was full, the code was not (fully) analyzed
+    """
+    artifact = as_code_artifact(code)
+    controller = get_admission_controller()
+    issues_by_tool: Dict[str, List[str]] = {}
+    try:
+        with controller.admit(STAGE_STATIC, session_id, cancel_token):
+            with temporary_python_file(artifact.source) as filepath:
+                with span(STAGE_ANALYZER, tool="pylint"):
+                    issues_by_tool["Pylint"] = run_pylint(artifact.source, filepath, cancel_token)
+                with span(STAGE_ANALYZER, tool="bandit"):
+                    issues_by_tool["Bandit"] = run_bandit(artifact.source, filepath, cancel_token)
+                with span(STAGE_ANALYZER, tool="mypy"):
+                    issues_by_tool["MyPy"] = run_mypy(artifact.source, filepath, cancel_token)
+        with controller.admit(STAGE_DYNAMIC, session_id, cancel_token):
+            with span(STAGE_ANALYZER, tool="dynamic"):
+                issues_by_tool["Dynamic Analysis"] = run_dynamic_analysis(
+                    artifact, "dynapyt", "comprehensive", cancel_token=cancel_token
+                )
+            if profile and "codeact" in DynamicAnalysisFramework().get_available_analyzers():
+                with span(STAGE_ANALYZER, tool="profiler"):
+                    issues_by_tool["Performance"] = run_dynamic_analysis(
+                        artifact, "codeact", "performance", profile=True, cancel_token=cancel_token
+                    )
+    except OperationCancelled:
+        # The caller checks the token and reports the cancellation
+        pass
+    return issues_by_tool
+
+
+def _log_analysis(issues_by_tool: Dict[str, List[str]], label: str, log: Callable[[str, str], None]) -> None:
+    for tool, issues in issues_by_tool.items():
+        empty = "No issues (placeholder)." if tool == "Dynamic Analysis" else "No issues found."
+        log(f"{tool} Issues ({label}): " + ('\n- '.join(issues) if issues else empty), "info")
+
+
+def _build_prompt(
+    sections: List[PromptSection],
+    config: PipelineConfig,
+    label: str,
+    log: Callable[[str, str], None],
+    reserved_tokens: int = 0
+) -> str:
+    """
+    Fit prompt sections to the model's token budget and log the per-section token counts.
+    ``reserved_tokens`` (e.g. earlier conversation turns) is taken off the budget.
+    """
+    with span(STAGE_PROMPT):
+        budget = prompt_token_budget(
+            config.model_name,
+            config.max_output_tokens,
+            reserved_tokens=count_tokens(SYSTEM_PROMPT_TEMPLATE, config.model_name) + reserved_tokens
+        )
+        sections = fit_sections_to_budget(sections, budget, config.model_name)
+        trimmed = any(section.trimmed_tokens for section in sections)
+        log(
+            f"Prompt tokens ({label}, budget {budget if budget is not None else 'unknown'}): "
+            f"{format_token_report(sections, config.model_name)}",
+            "warning" if trimmed else "info"
+        )
+        return render_prompt_sections(sections)
+
+
+def _history_tokens(history: Optional[List[Tuple[str, str]]], config: PipelineConfig) -> int:
+    """Tokens of the earlier conversation turns sent with a prompt."""
+    return sum(
+        count_tokens(human_turn, config.model_name) + count_tokens(ai_turn, config.model_name)
+        for human_turn, ai_turn in history or []
+    )
+
+
+def _log_delta_reduction(
+    delta_prompt: str,
+    history: List[Tuple[str, str]],
+    full_sections: List[PromptSection],
+    config: PipelineConfig,
+    label: str,
+    log: Callable[[str, str], None]
+) -> None:
+    """
+    Log the prompt tokens of a conversational retry against those of a full feedback
+    prompt. The full prompt shares no prefix with earlier calls, so all of it is uncached.
+    """
+    prefix_tokens = _history_tokens(history, config)
+    delta_tokens = count_tokens(delta_prompt, config.model_name)
+    budget = prompt_token_budget(
+        config.model_name,
+        config.max_output_tokens,
+        reserved_tokens=count_tokens(SYSTEM_PROMPT_TEMPLATE, config.model_name)
+    )
+    full = count_tokens(
+        render_prompt_sections(fit_sections_to_budget(full_sections, budget, config.model_name)),
+        config.model_name
+    )
+    reduction = (1 - delta_tokens / full) * 100 if full else 0.0
+    log(
+        f"Conversational retry ({label}): {delta_tokens} new prompt tokens after the unchanged "
+        f"{prefix_tokens}-token first turn (reusable by provider-side prompt caching), vs {full} "
+        f"tokens for a full feedback prompt ({reduction:.1f}% fewer uncached tokens).",
+        "info"
+    )
+
+
+def _log_token_usage(
+    prompt: str,
+    response: str,
+    config: PipelineConfig,
+    label: str,
+    log: Callable[[str, str], None],
+    history: Optional[List[Tuple[str, str]]] = None
+) -> None:
+    """Log the tokens and estimated cost of one LLM call."""
+    input_tokens = (
+        count_tokens(SYSTEM_PROMPT_TEMPLATE, config.model_name)
+        + _history_tokens(history, config)
+        + count_tokens(prompt, config.model_name)
+    )
+    output_tokens = count_tokens(response, config.model_name)
+    spec = get_model_spec(config.model_name)
+    cost = f", estimated cost ${spec.estimate_cost(input_tokens, output_tokens):.6f}" if spec else ""
+    log(f"Token usage ({label}): input={input_tokens}, output={output_tokens}{cost}", "info")
+
+
+def _feedback_issues(
+    issues: List[str],
+    config: PipelineConfig,
+    label: str,
+    log: Callable[[str, str], None]
+) -> List[str]:
+    """Aggregate the issues for the feedback prompt and log how much they were compressed."""
+    compressed = compress_issues(issues, DEFAULT_ISSUE_TOKEN_BUDGET, config.model_name)
+    tokens_before = count_tokens("\n".join(issues), config.model_name)
+    tokens_after = count_tokens("\n".join(compressed), config.model_name)
+    log(
+        f"Issues for feedback ({label}): {len(issues)} issues -> {len(compressed)} lines, "
+        f"{tokens_before} -> {tokens_after} tokens",
+        "info"
+    )
+    return compressed
+
+
+def _call_llm(
+    prompt: str,
+    config: PipelineConfig,
+    temperature: float,
+    history: Optional[List[Tuple[str, str]]] = None
+) -> str:
+    if config.stream_responses:
+        llm_call = functools.partial(stream_llm_response, stop_at_first_block=config.stop_at_first_block)
+    else:
+        llm_call = get_llm_response
+    try:
+        with get_admission_controller().admit(STAGE_LLM, config.session_id, config.cancel_token), \
+                span(STAGE_LLM_CALL, model=config.model_name):
+            return llm_call(
+                user_query=prompt,
+                model_name=config.model_name,
+                openai_api_key=config.openai_api_key,
+                google_api_key=config.google_api_key,
+                temperature=temperature,
+                max_tokens=config.max_output_tokens,
+                bypass_cache=config.bypass_cache,
+                history=history,
+                cancel_token=config.cancel_token
+            )
+    except OperationCancelled as e:
+        return f"Error: LLM call cancelled ({e})."
+    except AdmissionRejected as e:
+        return f"{SERVER_OVERLOADED}, LLM call not admitted ({e})."
+
+
+def _cancelled_result(
+    config: PipelineConfig,
+    result: PipelineResult,
+    attempt: int,
+    log: Callable[[str, str], None],
+    status: Callable[[str], None]
+) -> Optional[PipelineResult]:
+    """Return the result of a cancelled run, or None if the run was not cancelled."""
+    token = config.cancel_token
+    if token is None or not token.cancelled:
+        return None
+    interrupted = ", ".join(token.cancelled_operations) or "none in flight"
+    log(f"Generation cancelled ({token.reason}). Interrupted operations: {interrupted}", "warning")
+    status("Generation cancelled.")
+    return PipelineResult(
+        result.generated_code, [f"Generation cancelled: {token.reason}."],
+        attempt, result.max_attempts, False, cancelled=True
+    )
+
+
+def _overloaded_result(
+    code: str,
+    message: str,
+    attempt: int,
+    max_attempts: int,
+    log: Callable[[str, str], None],
+    status: Callable[[str], None]
+) -> PipelineResult:
+    """End a run that was not admitted; the overload is not code feedback, so no retry is spent on it."""
+    log(f"Generation stopped: {message}", "error")
+    status("The server is overloaded. Please try again in a moment.")
+    return PipelineResult(code, [message], attempt, max_attempts, False, overloaded=True)
+
+
+def run_generation_pipeline(
+    user_query: str,
+    file_context: str,
+    config: PipelineConfig,
+    log: Callable[[str, str], None] = _noop_log,
+    status: Callable[[str], None] = _noop_status,
+    progress: Callable[[int, int], None] = _noop_progress
+) -> PipelineResult:
+    """
+    Generate code for a request, analyze it and retry with feedback until it passes.
+
+    With ``config.conversational_retries``, retries continue the conversation of the
+    first attempt (request, context and first answer, kept as a stable prefix) and
+    only send the issues and a diff of the failed code against the first answer.
+
+    Args:
+        user_query: The user's code request
+        file_context: Context string built from the attached files
+        config: Model, credentials and mode settings
+        log: Callback receiving detailed log messages and their level
+        status: Callback receiving short user-facing progress messages
+        progress: Callback receiving (attempt, max_attempts) as each attempt starts
+
+    Returns:
+        PipelineResult with the last generated code and its issues
+    """
+    speculative = config.speculative_candidates > 1
+    with span(STAGE_RUN, mode="speculative" if speculative else "sequential"):
+        if speculative:
+            return run_speculative_pipeline(user_query, file_context, config, log, status, progress)
+        return _run_sequential_pipeline(user_query, file_context, config, log, status, progress)
+
+
+def _run_sequential_pipeline(
+    user_query: str,
+    file_context: str,
+    config: PipelineConfig,
+    log: Callable[[str, str], None],
+    status: Callable[[str], None],
+    progress: Callable[[int, int], None]
+) -> PipelineResult:
+    """The sequential generate -> analyze -> retry loop of run_generation_pipeline."""
+    max_attempts = config.max_attempts
+    prompt_sections = initial_prompt_sections(user_query, file_context)
+    delta_sections: List[PromptSection] = []
+    first_turn: Optional[Tuple[str, str]] = None
+    first_code: Optional[str] = None
+    result = PipelineResult("", [], 0, max_attempts, False)
+
+    for attempt in range(1, max_attempts + 1):
+        with span(STAGE_ATTEMPT, mode="sequential"):
+            log(f"\n--- Attempt {attempt} of {max_attempts} ---", "info")
+            status(f"Attempt {attempt} of {max_attempts}...")
+            progress(attempt, max_attempts)
+            cancelled = _cancelled_result(config, result, attempt, log, status)
+            if cancelled is not None:
+                return cancelled
+
+            label = f"Attempt {attempt}"
+            history = [first_turn] if first_turn is not None and delta_sections else None
+            if history:
+                current_llm_input = _build_prompt(delta_sections, config, label, log, _history_tokens(history, config))
+                _log_delta_reduction(current_llm_input, history, prompt_sections, config, label, log)
+            else:
+                current_llm_input = _build_prompt(prompt_sections, config, label, log)
+            log(f"Prompt to LLM (Attempt {attempt}):\n{current_llm_input}", "info")
+
+            llm_response_content = _call_llm(current_llm_input, config, DEFAULT_TEMPERATURE, history)
+            log(f"LLM Raw Response (Attempt {attempt}):\n{llm_response_content}", "info")
+            _log_token_usage(current_llm_input, llm_response_content, config, label, log, history)
+            cancelled = _cancelled_result(config, result, attempt, log, status)
+            if cancelled is not None:
+                return cancelled
+
+            if llm_response_content.startswith(SERVER_OVERLOADED):
+                return _overloaded_result("", llm_response_content, attempt, max_attempts, log, status)
+            if llm_response_content.startswith(LLM_ERROR_PREFIXES):
+                log(f"LLM call failed: {llm_response_content}", "error")
+                return PipelineResult("", [llm_response_content], attempt, max_attempts, False, llm_error=True)
+
+            with span(STAGE_EXTRACTION):
+                artifact = extract_code_artifact(llm_response_content)
+            extracted_code = artifact.source if artifact is not None else None
+            if config.conversational_retries and first_turn is None:
+                first_turn = (current_llm_input, llm_response_content)
+                first_code = extracted_code
+
+            if extracted_code:
+                log(f"Extracted Code (Attempt {attempt}):\n{extracted_code}", "info")
+            else:
+                log(f"No Python code block extracted from LLM response (Attempt {attempt}).", "warning")
+                result = PipelineResult("", [NO_CODE_BLOCK_ISSUE], attempt, max_attempts, False)
+                if attempt < max_attempts:
+                    # The standard feedback prompt works here, with an appropriate error message
+                    prompt_sections = feedback_prompt_sections(
+                        original_user_query=user_query,
+                        file_context=file_context,
+                        failed_code="N/A - No code was returned.",
+                        analysis_issues=[NO_CODE_BLOCK_FEEDBACK]
+                    )
+                    if first_turn is not None:
+                        delta_sections = delta_feedback_prompt_sections(first_code, None, [NO_CODE_BLOCK_FEEDBACK])
+                    log("No code block found. Preparing retry with feedback.", "warning")
+                    status("No code block found, retrying...")
+                    continue
+                log("Failed to get code block after multiple attempts.", "error")
+                status("Failed to get code block after multiple attempts.")
+                return result
+
+            # --- ANALYSIS ---
+            try:
+                issues_by_tool = run_analyzers(artifact, config.cancel_token, config.session_id, config.profile_performance)
+            except AdmissionRejected as e:
+                message = f"{SERVER_OVERLOADED}, analysis not run ({e})."
+                return _overloaded_result(extracted_code, message, attempt, max_attempts, log, status)
+            _log_analysis(issues_by_tool, f"Attempt {attempt}", log)
+
+            all_issues = [issue for issues in issues_by_tool.values() for issue in issues]
+            result = PipelineResult(extracted_code, all_issues, attempt, max_attempts, not all_issues)
+            cancelled = _cancelled_result(config, result, attempt, log, status)
+            if cancelled is not None:
+                return cancelled
+
+            if not all_issues:
+                log("Code generated successfully with no static analysis issues found!", "info")
+                status("Code generated successfully with no static analysis issues found!")
+                return result
+
+            log(f"Found {len(all_issues)} issues. Details logged.", "warning")
+            status(f"Found {len(all_issues)} issues. Details below.")
+            if attempt < max_attempts:
+                feedback_issues = _feedback_issues(all_issues, config, label, log)
+                prompt_sections = feedback_prompt_sections(
+                    original_user_query=user_query,
+                    file_context=file_context,
+                    failed_code=extracted_code,
+                    analysis_issues=feedback_issues
+                )
+                if first_turn is not None:
+                    delta_sections = delta_feedback_prompt_sections(first_code, extracted_code, feedback_issues)
+                log("Attempting to fix issues. New prompt prepared for LLM.", "info")
+                status("Attempting to fix issues...")
+            else:
+                log("Max retries reached. Displaying last attempt with issues.", "warning")
+                status("Max retries reached. Displaying last attempt with issues.")
+
+    return result
+
+
+def candidate_temperatures(count: int) -> List[float]:
+    """Spread ``count`` sampling temperatures evenly over the speculative range."""
+    if count <= 1:
+        return [SPECULATIVE_MIN_TEMPERATURE]
+    step = (SPECULATIVE_MAX_TEMPERATURE - SPECULATIVE_MIN_TEMPERATURE) / (count - 1)
+    return [round(SPECULATIVE_MIN_TEMPERATURE + i * step, 2) for i in range(count)]
+
+
+def _generate_candidate(prompt: str, config: PipelineConfig, temperature: float) -> Candidate:
+    """
+    Generate and analyze one candidate.
+
+    ``config.cancel_token`` is the candidate's own token: cancelling it abandons the
+    LLM call or kills the analyzers, whichever is running.
+    """
+    candidate = Candidate(temperature=temperature)
+    candidate.response = _call_llm(prompt, config, temperature)
+
+    if candidate.response.startswith(LLM_ERROR_PREFIXES):
+        candidate.issues = [candidate.response]
+        candidate.blocking_issues = 1
+        candidate.overloaded = candidate.response.startswith(SERVER_OVERLOADED)
+        return candidate
+
+    with span(STAGE_EXTRACTION):
+        candidate.artifact = extract_code_artifact(candidate.response)
+    candidate.code = candidate.artifact.source if candidate.artifact is not None else None
+    if not candidate.code:
+        candidate.issues = [NO_CODE_BLOCK_ISSUE]
+        candidate.blocking_issues = 1
+        return candidate
+
+    try:
+        issues_by_tool = run_analyzers(
+            candidate.artifact, config.cancel_token, config.session_id, config.profile_performance
+        )
+    except AdmissionRejected as e:
+        candidate.issues = [f"{SERVER_OVERLOADED}, analysis not run ({e})."]
+        candidate.blocking_issues = 1
+        candidate.overloaded = True
+        return candidate
+    if config.cancel_token.cancelled:
+        candidate.issues = [f"Analysis abandoned: {config.cancel_token.reason}."]
+        candidate.blocking_issues = 1
+        return candidate
+    candidate.issues = [issue for issues in issues_by_tool.values() for issue in issues]
+    candidate.blocking_issues = sum(1 for issue in candidate.issues if is_blocking_issue(issue))
+    return candidate
+
+
+def generate_candidates(
+    prompt: str,
+    config: PipelineConfig,
+    temperatures: List[float],
+    log: Callable[[str, str], None] = _noop_log
+) -> Tuple[Optional[Candidate], List[Candidate]]:
+    """
+    Generate and analyze candidates concurrently, one per temperature.
+
+    Each candidate runs under a child of ``config.cancel_token``. As soon as a
+    candidate has no blocking issues, the other candidates' tokens are cancelled,
+    so their LLM calls are abandoned and their analyzers killed.
+
+    Returns:
+        Tuple of (first passing candidate or None, all finished candidates)
+    """
+    parent_token = config.cancel_token or CancellationToken()
+    finished: List[Candidate] = []
+    accepted: Optional[Candidate] = None
+
+    executor = ThreadPoolExecutor(max_workers=len(temperatures), thread_name_prefix="speculative")
+    try:
+        pending = {}
+        for temperature in temperatures:
+            token = parent_token.child()
+            candidate_config = replace(config, cancel_token=token)
+            # Each candidate runs in a copy of the caller's context, so its spans join the request trace
+            future = executor.submit(
+                contextvars.copy_context().run, _generate_candidate, prompt, candidate_config, temperature
+            )
+            pending[future] = token
+        while pending and accepted is None:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                try:
+                    candidate = future.result()
+                except Exception as e:
+                    log(f"Candidate generation failed: {e}", "error")
+                    continue
+                finished.append(candidate)
+                log(
+                    f"Candidate at temperature {candidate.temperature}: "
+                    f"{candidate.blocking_issues} blocking / {len(candidate.issues)} total issues",
+                    "info"
+                )
+                if candidate.code and candidate.blocking_issues == 0 and accepted is None:
+                    accepted = candidate
+    finally:
+        for token in pending.values():
+            token.cancel("another candidate was accepted")
+        # Cancelled candidates return shortly; nothing left to wait for
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return accepted, finished
+
+
+def run_speculative_pipeline(
+    user_query: str,
+    file_context: str,
+    config: PipelineConfig,
+    log: Callable[[str, str], None] = _noop_log,
+    status: Callable[[str], None] = _noop_status,
+    progress: Callable[[int, int], None] = _noop_progress
+) -> PipelineResult:
+    """
+    Speculative variant of run_generation_pipeline.
+
+    Each round generates ``config.speculative_candidates`` candidates in parallel
+    and accepts the first one without blocking issues. Otherwise the best-scoring
+    candidate of the round is fed back for the next round.
+    """
+    max_attempts = config.max_attempts
+    temperatures = candidate_temperatures(config.speculative_candidates)
+    prompt_sections = initial_prompt_sections(user_query, file_context)
+    result = PipelineResult("", [], 0, max_attempts, False)
+
+    for attempt in range(1, max_attempts + 1):
+        with span(STAGE_ATTEMPT, mode="speculative"):
+            log(f"\n--- Speculative round {attempt} of {max_attempts} ({len(temperatures)} candidates) ---", "info")
+            status(f"Round {attempt} of {max_attempts}: generating {len(temperatures)} candidates...")
+            progress(attempt, max_attempts)
+            cancelled = _cancelled_result(config, result, attempt, log, status)
+            if cancelled is not None:
+                return cancelled
+            current_llm_input = _build_prompt(prompt_sections, config, f"Round {attempt}", log)
+            log(f"Prompt to LLM (Round {attempt}):\n{current_llm_input}", "info")
+
+            accepted, candidates = generate_candidates(current_llm_input, config, temperatures, log)
+            for candidate in candidates:
+                _log_token_usage(
+                    current_llm_input, candidate.response, config,
+                    f"Round {attempt}, temperature {candidate.temperature}", log
+                )
+            cancelled = _cancelled_result(config, result, attempt, log, status)
+            if cancelled is not None:
+                return cancelled
+
+            if accepted is not None:
+                log(f"Accepted candidate at temperature {accepted.temperature} (Round {attempt}):\n{accepted.code}", "info")
+                status(f"Accepted a candidate with no blocking issues ({len(accepted.issues)} non-blocking).")
+                return PipelineResult(accepted.code or "", accepted.issues, attempt, max_attempts, True)
+
+            # Candidates that were not analyzed say nothing about their code
+            with_code = [candidate for candidate in candidates if candidate.code and not candidate.overloaded]
+            overloaded = [candidate for candidate in candidates if candidate.overloaded]
+            if not with_code and overloaded:
+                return _overloaded_result(
+                    overloaded[0].code or "", overloaded[0].issues[0], attempt, max_attempts, log, status
+                )
+            if not with_code:
+                errors = [candidate.issues[0] for candidate in candidates if candidate.issues]
+                if errors and NO_CODE_BLOCK_ISSUE not in errors:
+                    # Every candidate failed at the LLM call itself, retrying will not help
+                    log(f"LLM call failed: {errors[0]}", "error")
+                    return PipelineResult("", [errors[0]], attempt, max_attempts, False, llm_error=True)
+                result = PipelineResult("", [NO_CODE_BLOCK_ISSUE], attempt, max_attempts, False)
+                failed_code, feedback_issues = "N/A - No code was returned.", [NO_CODE_BLOCK_FEEDBACK]
+            else:
+                best = min(with_code, key=lambda candidate: candidate.score)
+                log(
+                    f"No candidate passed. Best candidate (temperature {best.temperature}) has "
+                    f"{best.blocking_issues} blocking issue(s):\n" + '\n- '.join(best.issues),
+                    "warning"
+                )
+                result = PipelineResult(best.code or "", best.issues, attempt, max_attempts, False)
+                failed_code = best.code or ""
+                feedback_issues = _feedback_issues(best.issues, config, f"Round {attempt}", log)
+
+            if attempt < max_attempts:
+                prompt_sections = feedback_prompt_sections(
+                    original_user_query=user_query,
+                    file_context=file_context,
+                    failed_code=failed_code,
+                    analysis_issues=feedback_issues
+                )
+                status("No candidate passed, feeding back the best one...")
+            else:
+                log("Max rounds reached. Displaying best candidate with issues.", "warning")
+                status("Max rounds reached. Displaying best candidate with issues.")
+
+    return result
@@ -0,0 +1,213 @@
+"""
+Process-wide rate limiting for LLM providers.
+
+Every (provider, model) pair gets a limiter made of two token buckets: one for
+requests per minute and one for tokens per minute. Buckets hand out reservations
+in arrival order, so callers are served first come, first served across threads,
+sessions and event loops. Rate limit errors (HTTP 429) are retried with jittered
+exponential backoff, and a ``Retry-After`` hint pauses the shared limiter so every
+queued caller backs off, not just the one that was throttled.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+# Default limits per provider: (requests per minute, tokens per minute)
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "openai": (500, 200_000),
+    "google": (60, 1_000_000),
+}
+FALLBACK_RATE_LIMIT: Tuple[float, float] = (60, 100_000)
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Rate limit exception types of the provider SDKs (openai.RateLimitError,
+# google.api_core.exceptions.ResourceExhausted/TooManyRequests), matched by name
+# so the SDKs stay optional
+RATE_LIMIT_ERROR_TYPES = ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+HTTP_TOO_MANY_REQUESTS = 429
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that grants reservations in FIFO order.
+
+    reserve() takes the tokens immediately, letting the balance go negative, and
+    returns how long the caller must wait before using them. Later callers see the
+    debt of earlier ones and wait longer, which makes the queue fair.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Reserve ``amount`` tokens.
+
+        Returns:
+            Seconds to wait before the reservation may be used
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(delay, self._paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every reservation for at least ``seconds`` from now."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one provider/model."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.total_wait = 0.0
+        self.throttled = 0
+        self._stats_lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and ``tokens`` tokens; returns the wait in seconds."""
+        delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        with self._stats_lock:
+            self.total_wait += delay
+        return delay
+
+    def record_throttled(self) -> None:
+        """Count a rate limit error returned by the provider."""
+        with self._stats_lock:
+            self.throttled += 1
+
+    def acquire(self, tokens: int) -> None:
+        """Block the calling thread until the request may be sent."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: int) -> None:
+        """Wait, without blocking the event loop, until the request may be sent."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Pause both buckets, e.g. after the provider returned a Retry-After hint."""
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """
+    Return the process-wide limiter for a provider and model.
+
+    Limits default to DEFAULT_RATE_LIMITS and can be overridden with the
+    LLM_RATE_LIMIT_RPM and LLM_RATE_LIMIT_TPM environment variables.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get((provider, model))
+        if limiter is None:
+            rpm, tpm = DEFAULT_RATE_LIMITS.get(provider, FALLBACK_RATE_LIMIT)
+            rpm = float(os.getenv("LLM_RATE_LIMIT_RPM", rpm))
+            tpm = float(os.getenv("LLM_RATE_LIMIT_TPM", tpm))
+            limiter = RateLimiter(rpm, tpm)
+            _limiters[(provider, model)] = limiter
+        return limiter
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """The HTTP status carried by a provider exception, if any."""
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+        getattr(error, "code", None),
+    ):
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Tell whether an exception raised by a provider client is a rate limit (HTTP 429).
+
+    Only the HTTP status and the SDKs' rate limit exception types count, never the
+    message text; exceptions wrapping one (``raise ... from``) are followed.
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if _status_code(current) == HTTP_TOO_MANY_REQUESTS:
+            return True
+        if any(cls.__name__ in RATE_LIMIT_ERROR_TYPES for cls in type(current).__mro__):
+            return True
+        current = current.__cause__
+    return False
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Return the provider's Retry-After hint carried by an exception, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(retry: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry number."""
+    return random.uniform(0, min(cap, base * (2 ** retry)))
+
+
+def handle_rate_limit_error(error: Exception, limiter: RateLimiter, retry: int) -> float:
+    """
+    Record a rate limit error on the limiter and compute how long to back off.
+
+    A Retry-After hint pauses the shared limiter for everyone, and the jittered
+    backoff spreads the retries of concurrent callers.
+
+    Returns:
+        Seconds the throttled caller should sleep before retrying
+    """
+    limiter.record_throttled()
+    hint = retry_after_seconds(error)
+    if hint is not None:
+        limiter.pause(hint)
+        return random.uniform(0, BACKOFF_BASE_SECONDS)
+    return backoff_delay(retry)
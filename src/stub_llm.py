@@ -0,0 +1,136 @@
+"""
+Deterministic offline chat model.
+
+StubChatModel mimics the parts of the LangChain chat model interface used by
+llm_handler (invoke, ainvoke, stream, astream) without any network access, so
+benchmarks and load tests can drive the whole pipeline at full speed.
+
+By default it answers every prompt with a canned, lint-clean script. A script of
+responses can be supplied as a JSON file through the STUB_LLM_SCRIPT environment
+variable, either a list of response strings or an object:
+
+    {"responses": ["```python\\n...\\n```", "..."], "latency": 0.0}
+
+Responses are returned in order and the last one is repeated once the script is
+exhausted. The position in a script file is kept once per process, so every stub
+model built from it (one per call: stub models are neither pooled nor cached)
+takes the next response. STUB_LLM_LATENCY adds a fixed delay (in seconds) to
+every call.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+DEFAULT_STUB_RESPONSE = '''```python
+"""Script generated by the offline stub model."""
+
+
+def main() -> None:
+    """Print a greeting."""
+    print("Hello from the stub model")
+
+
+if __name__ == "__main__":
+    main()
+```'''
+
+
+def load_stub_script(path: Optional[str]) -> tuple[List[str], float]:
+    """
+    Load scripted responses and latency from a JSON file.
+
+    Returns:
+        Tuple of (responses, latency in seconds); no responses if path is empty
+    """
+    if not path:
+        return [], 0.0
+    with open(path, 'r', encoding='utf-8') as f:
+        script = json.load(f)
+    if isinstance(script, list):
+        return [str(response) for response in script], 0.0
+    return [str(response) for response in script.get("responses", [])], float(script.get("latency", 0.0))
+
+
+class StubScript:
+    """Scripted responses handed out in order, the last one repeated."""
+
+    def __init__(self, responses: List[str], latency: float = 0.0):
+        self.responses = responses or [DEFAULT_STUB_RESPONSE]
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def next_response(self) -> str:
+        with self._lock:
+            response = self.responses[min(self.calls, len(self.responses) - 1)]
+            self.calls += 1
+            return response
+
+
+_scripts: Dict[str, StubScript] = {}
+_scripts_lock = threading.Lock()
+
+
+def get_stub_script(path: Optional[str]) -> StubScript:
+    """Return the process-wide script of a file (the canned response if no path is given)."""
+    key = path or ""
+    with _scripts_lock:
+        script = _scripts.get(key)
+        if script is None:
+            script = StubScript(*load_stub_script(path))
+            _scripts[key] = script
+        return script
+
+
+class StubChatModel:
+    """Offline chat model returning canned or scripted responses."""
+
+    def __init__(
+        self,
+        responses: Optional[List[str]] = None,
+        latency: Optional[float] = None,
+        chunk_size: int = 16
+    ):
+        if responses is None:
+            self.script = get_stub_script(os.getenv("STUB_LLM_SCRIPT"))
+        else:
+            self.script = StubScript(responses)
+        if latency is None:
+            latency = self.script.latency or float(os.getenv("STUB_LLM_LATENCY", 0.0))
+        self.latency = latency
+        self.chunk_size = max(1, chunk_size)
+
+    def _next_response(self) -> str:
+        return self.script.next_response()
+
+    def _chunks(self, text: str) -> Iterator[str]:
+        for start in range(0, len(text), self.chunk_size):
+            yield text[start:start + self.chunk_size]
+
+    def invoke(self, messages: Any, **kwargs: Any) -> AIMessage:
+        if self.latency:
+            time.sleep(self.latency)
+        return AIMessage(content=self._next_response())
+
+    async def ainvoke(self, messages: Any, **kwargs: Any) -> AIMessage:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return AIMessage(content=self._next_response())
+
+    def stream(self, messages: Any, **kwargs: Any) -> Iterator[AIMessageChunk]:
+        if self.latency:
+            time.sleep(self.latency)
+        for chunk in self._chunks(self._next_response()):
+            yield AIMessageChunk(content=chunk)
+
+    async def astream(self, messages: Any, **kwargs: Any) -> AsyncIterator[AIMessageChunk]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for chunk in self._chunks(self._next_response()):
+            yield AIMessageChunk(content=chunk)
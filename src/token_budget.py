@@ -0,0 +1,190 @@
+"""
+Token accounting and prompt budgeting.
+
+Prompts are built from named sections (the request, the file context, the failed
+code, the analysis issues, plus fixed template text). Before every LLM call the
+sections are counted and, if they exceed the model's budget, the lowest-value
+sections are trimmed first so the call never overflows the context window.
+
+Counting uses tiktoken when it is installed and its encoding can be loaded, and
+falls back to a fast character-based approximation otherwise (and for very large
+texts, where exact counting would cost more than it is worth).
+"""
+
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+from src.model_registry import get_model_spec
+
+APPROX_CHARS_PER_TOKEN = 4
+EXACT_COUNT_MAX_CHARS = 200_000
+BUDGET_SAFETY_MARGIN = 0.05
+TRIM_MARKER = "\n[... {tokens} tokens trimmed to fit the model's context window ...]\n"
+
+# Section priorities: higher values are more useful to the LLM and trimmed last
+PRIORITY_TEMPLATE = 100
+PRIORITY_REQUEST = 100
+PRIORITY_FAILED_CODE = 80
+PRIORITY_ISSUES = 60
+PRIORITY_FILE_CONTEXT = 20
+
+
+@dataclass
+class PromptSection:
+    """A named part of a prompt."""
+    name: str
+    text: str
+    priority: int
+    trimmable: bool = True
+    trimmed_tokens: int = 0
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model_name: Optional[str]) -> Optional[Any]:
+    """Return the tiktoken encoding for a model, or None if unavailable."""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    spec = get_model_spec(model_name) if model_name else None
+    try:
+        if spec is not None and spec.provider == "openai":
+            return tiktoken.encoding_for_model(spec.model_id)
+        # Other providers use their own tokenizers; cl100k is a close estimate
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Unknown model or the encoding file could not be fetched (e.g. offline)
+        return None
+
+
+def approximate_tokens(text: str) -> int:
+    """Fast token estimate based on the average characters per token."""
+    return (len(text) + APPROX_CHARS_PER_TOKEN - 1) // APPROX_CHARS_PER_TOKEN
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text for a model.
+
+    Args:
+        text: Text to count
+        model_name: Name of a registered model, used to pick the tokenizer
+
+    Returns:
+        Exact token count if tiktoken is usable, otherwise an approximation
+    """
+    if not text:
+        return 0
+    if len(text) > EXACT_COUNT_MAX_CHARS:
+        return approximate_tokens(text)
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return approximate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def prompt_token_budget(model_name: str, max_output_tokens: int, reserved_tokens: int = 0) -> Optional[int]:
+    """
+    Return how many prompt tokens a call to the model may use.
+
+    The context window is shared with the response, and ``reserved_tokens`` (e.g.
+    the system prompt) is subtracted as well, minus a safety margin for counting
+    differences between tokenizers.
+
+    Returns:
+        The budget in tokens, or None for unregistered models
+    """
+    spec = get_model_spec(model_name)
+    if spec is None:
+        return None
+    available = spec.context_window - min(max_output_tokens, spec.max_output_tokens) - reserved_tokens
+    return max(0, int(available * (1 - BUDGET_SAFETY_MARGIN)))
+
+
+def _trim_text(text: str, keep_tokens: int, total_tokens: int) -> str:
+    """Keep roughly the first ``keep_tokens`` tokens of a text and mark the cut."""
+    removed = total_tokens - keep_tokens
+    if keep_tokens <= 0:
+        return TRIM_MARKER.format(tokens=total_tokens)
+    keep_chars = int(len(text) * keep_tokens / total_tokens)
+    return text[:keep_chars] + TRIM_MARKER.format(tokens=removed)
+
+
+def fit_sections_to_budget(
+    sections: List[PromptSection],
+    budget_tokens: Optional[int],
+    model_name: Optional[str] = None
+) -> List[PromptSection]:
+    """
+    Trim prompt sections until their total fits within the budget.
+
+    Trimmable sections are cut from the lowest priority up; within a section the
+    beginning is kept. Non-trimmable sections are never touched, so the result may
+    still exceed the budget if they alone do.
+
+    Args:
+        sections: Sections of the prompt, in order
+        budget_tokens: Maximum prompt tokens, or None for no limit
+        model_name: Name of the model, used to count tokens
+
+    Returns:
+        New list of sections (the input is not modified)
+    """
+    sections = [replace(section) for section in sections]
+    if budget_tokens is None:
+        return sections
+
+    counts = [count_tokens(section.text, model_name) for section in sections]
+    excess = sum(counts) - budget_tokens
+    if excess <= 0:
+        return sections
+
+    order = sorted(
+        (i for i, section in enumerate(sections) if section.trimmable and counts[i] > 0),
+        key=lambda i: sections[i].priority
+    )
+    for i in order:
+        if excess <= 0:
+            break
+        section = sections[i]
+        marker_tokens = count_tokens(TRIM_MARKER.format(tokens=counts[i]), model_name)
+        keep = max(0, counts[i] - excess - marker_tokens)
+        section.text = _trim_text(section.text, keep, counts[i])
+        section.trimmed_tokens = counts[i] - keep
+        new_count = count_tokens(section.text, model_name)
+        excess -= counts[i] - new_count
+        counts[i] = new_count
+
+    return sections
+
+
+def render_prompt_sections(sections: List[PromptSection]) -> str:
+    """Join prompt sections into the final prompt text."""
+    return "".join(section.text for section in sections)
+
+
+def token_breakdown(sections: List[PromptSection], model_name: Optional[str] = None) -> Dict[str, int]:
+    """Token count per section name (sections sharing a name are summed), plus the total."""
+    breakdown: Dict[str, int] = {}
+    for section in sections:
+        breakdown[section.name] = breakdown.get(section.name, 0) + count_tokens(section.text, model_name)
+    breakdown["total"] = sum(breakdown.values())
+    return breakdown
+
+
+def format_token_report(sections: List[PromptSection], model_name: Optional[str] = None) -> str:
+    """One-line summary of prompt tokens per section and of any trimming."""
+    breakdown = token_breakdown(sections, model_name)
+    parts = [f"total={breakdown.pop('total')}"]
+    parts.extend(f"{name}={tokens}" for name, tokens in breakdown.items())
+    trimmed = [f"{section.name} -{section.trimmed_tokens}" for section in sections if section.trimmed_tokens]
+    report = ", ".join(parts)
+    if trimmed:
+        report += f" (trimmed: {', '.join(trimmed)})"
+    return report
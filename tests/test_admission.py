@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from src.admission import AdmissionController, AdmissionRejected, FairQueue, StageGate
+from src.cancellation import CancellationToken, OperationCancelled
+
+
+def test_sessions_are_served_round_robin_and_fifo_within_a_session():
+    queue = FairQueue()
+    for item in ["a1", "a2", "a3"]:
+        queue.push("a", item)
+    queue.push("b", "b1")
+    queue.push("c", "c1")
+    queue.push("b", "b2")
+
+    assert queue.depth_by_session() == {"a": 3, "b": 2, "c": 1}
+    assert [queue.pop() for _ in range(len(queue))] == ["a1", "b1", "c1", "a2", "b2", "a3"]
+    with pytest.raises(IndexError):
+        queue.pop()
+
+
+def test_full_queue_rejects_and_removed_items_free_their_place():
+    queue = FairQueue(max_size=2)
+    queue.push("a", "a1")
+    queue.push("b", "b1")
+
+    assert queue.full
+    with pytest.raises(AdmissionRejected):
+        queue.push("c", "c1")
+
+    assert queue.remove("a", "a1") and not queue.remove("a", "a1")
+    assert queue.depth_by_session() == {"b": 1}
+    queue.push("c", "c1")
+    assert [queue.pop(), queue.pop()] == ["b1", "c1"]
+
+
+def _hold_slot(gate: StageGate, session_id: str, order: list, release: threading.Event) -> threading.Thread:
+    def run() -> None:
+        with gate.admit(session_id):
+            order.append(session_id)
+            release.wait(10)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_for_queue(gate: StageGate, depth: int) -> None:
+    deadline = time.monotonic() + 10
+    while gate.stats().queued < depth and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert gate.stats().queued == depth
+
+
+def test_released_slots_are_handed_to_waiters_fairly():
+    gate = StageGate("llm", limit=1)
+    order = []
+    release = threading.Event()
+
+    with gate.admit("busy") as wait:
+        assert wait == 0.0
+        threads = []
+        # Session "a" queues twice before "b" arrives; "b" still gets the second slot
+        for session_id in ["a", "a", "b"]:
+            threads.append(_hold_slot(gate, session_id, order, release))
+            _wait_for_queue(gate, len(threads))
+        assert gate.stats().queued_by_session == {"a": 2, "b": 1}
+        release.set()
+
+    for thread in threads:
+        thread.join(10)
+
+    assert order == ["a", "b", "a"]
+    stats = gate.stats()
+    assert (stats.active, stats.queued, stats.admitted, stats.rejected) == (0, 0, 4, 0)
+    assert stats.max_wait > 0
+
+
+def test_gate_rejects_when_its_queue_is_full():
+    gate = StageGate("static", limit=1, max_queue=1)
+    release = threading.Event()
+
+    with gate.admit():
+        thread = _hold_slot(gate, "a", [], release)
+        _wait_for_queue(gate, 1)
+        with pytest.raises(AdmissionRejected, match="Static analysis queue full"):
+            with gate.admit("b"):
+                pass
+        release.set()
+    thread.join(10)
+
+    assert gate.stats().rejected == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    gate = StageGate("dynamic", limit=1)
+    token = CancellationToken()
+
+    with gate.admit():
+        threading.Timer(0.1, token.cancel, args=("user pressed stop",)).start()
+        with pytest.raises(OperationCancelled, match="user pressed stop"):
+            with gate.admit("a", token):
+                pass
+        assert gate.stats().queued == 0
+
+    assert token.cancelled_operations == ["Waiting for a Dynamic analysis slot"]
+    assert gate.stats().active == 0
+
+
+def test_controller_snapshot_covers_every_stage():
+    controller = AdmissionController({"llm": 2})
+
+    with controller.admit("llm", session_id=""):
+        snapshot = {stats.stage: stats for stats in controller.snapshot()}
+
+    assert snapshot["llm"].limit == 2 and snapshot["llm"].active == 1
+    assert {"llm", "static", "dynamic"} <= set(snapshot)
+    assert snapshot["llm"].describe().startswith("LLM: 1/2 running, 0 queued")
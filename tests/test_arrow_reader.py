@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pa_feather = pytest.importorskip("pyarrow.feather")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from src.arrow_reader import summarize_arrow_file, summarize_parquet  # noqa: E402
+from src.context_handler import parse_file  # noqa: E402
+
+
+def _table(rows: int) -> "pa.Table":
+    return pa.table({
+        "id": list(range(rows)),
+        "price": [i * 0.5 for i in range(rows)],
+        "city": [None if i % 10 == 0 else f"city_{i % 3}" for i in range(rows)],
+    })
+
+
+def _parquet_bytes(rows: int = 1_000, row_group_size: int = 250) -> bytes:
+    buffer = io.BytesIO()
+    pq.write_table(_table(rows), buffer, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+def test_parquet_summary_from_footer_and_sampled_row_groups():
+    text, metadata = summarize_parquet(_parquet_bytes(), char_budget=100_000, sample_rows=2)
+
+    assert text.startswith("Summary: 1000 rows x 3 columns (Parquet, 4 row groups")
+    assert "- city: string, nulls=100" in text
+    assert "- id: min=0, max=999" in text
+    assert "First 2 rows of row group 0:" in text
+    assert "First 2 rows of row group 3:" in text
+    assert "row group 1:" not in text
+    assert metadata == {
+        "rows": 1000, "columns": ["id", "price", "city"],
+        "dtypes": {"id": "int64", "price": "double", "city": "string"}, "row_groups": 4,
+    }
+
+
+def test_parquet_path_is_memory_mapped_with_the_same_summary(tmp_path):
+    data = _parquet_bytes()
+    path = tmp_path / "table.pq"
+    path.write_bytes(data)
+
+    assert summarize_arrow_file("table.pq", str(path)) == summarize_arrow_file("table.pq", data)
+
+
+def test_uploaded_files_are_summarized_by_extension():
+    buffer = io.BytesIO()
+    pa_feather.write_feather(_table(100), buffer)
+
+    parquet = parse_file("sales.pq", _parquet_bytes())
+    arrow = parse_file("sales.ipc", buffer.getvalue())
+
+    assert "(Parquet, 4 row groups" in parquet.context
+    assert "Summary: 100 rows x 3 columns (Arrow IPC" in arrow.context
+    assert arrow.metadata["rows"] == 100
@@ -0,0 +1,68 @@
+import json
+from typing import List
+
+import pytest
+
+import src.batch as batch
+from src.batch import load_checkpoint, run_batch
+from src.pipeline import PipelineConfig, PipelineResult
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """Pipeline that succeeds, except for prompts asking for a failed LLM call the first time."""
+    prompts: List[str] = []
+
+    def run(prompt, file_context, config, log=None):
+        prompts.append(prompt)
+        if prompt.startswith("flaky") and prompts.count(prompt) == 1:
+            return PipelineResult("", ["Error during LLM call: timeout"], 1, 3, False, llm_error=True)
+        return PipelineResult("print(1)", [], 1, 3, True)
+
+    monkeypatch.setattr(batch, "run_generation_pipeline", run)
+    return prompts
+
+
+def _write_lines(path, lines) -> None:
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def _records(path) -> List[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_checkpoint_skips_retryable_results_and_drops_a_cut_last_line(tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_bytes(
+        b'{"id": "a", "success": true}\n'
+        b'{"id": "b", "retryable": true}\n'
+        b'{"id": "c", "retryable": true}\n'
+        b'{"id": "c", "success": false}\n'
+        b'{"id": "d", "succ'
+    )
+
+    assert load_checkpoint(str(output)) == {"a", "c"}
+    assert output.read_bytes().endswith(b'{"id": "c", "success": false}\n')
+    assert load_checkpoint(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_resume_reruns_only_unfinished_requests(tmp_path, fake_pipeline):
+    requests = tmp_path / "requests.jsonl"
+    output = tmp_path / "results.jsonl"
+    _write_lines(requests, [
+        json.dumps({"id": "one", "prompt": "first"}),
+        "not json",
+        json.dumps({"id": "two", "prompt": "flaky second"}),
+        json.dumps({"id": "one", "prompt": "duplicate"}),
+    ])
+    config = PipelineConfig(model_name="stub-offline")
+
+    first = run_batch(str(requests), str(output), config, concurrency=2)
+    second = run_batch(str(requests), str(output), config, concurrency=2, resume=True)
+
+    assert first == {"written": 2, "succeeded": 1, "failed": 0, "retryable": 1, "skipped": 1, "invalid": 1}
+    assert second == {"written": 1, "succeeded": 1, "failed": 0, "retryable": 0, "skipped": 2, "invalid": 1}
+    assert sorted(fake_pipeline) == ["first", "flaky second", "flaky second"]
+    records = _records(output)
+    assert [(r["id"], r["retryable"]) for r in records[-1:]] == [("two", False)]
+    assert sorted((r["id"], r["retryable"]) for r in records) == [("one", False), ("two", False), ("two", True)]
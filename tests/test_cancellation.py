@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from src.cancellation import CancellationToken, OperationCancelled, run_in_thread, run_process
+
+
+def _cancel_after(token: CancellationToken, delay: float, reason: str = "stop") -> threading.Timer:
+    timer = threading.Timer(delay, token.cancel, args=(reason,))
+    timer.start()
+    return timer
+
+
+def test_cancel_runs_callbacks_once_and_records_them():
+    token = CancellationToken()
+    calls = []
+
+    with token.on_cancel("request", lambda: calls.append("request")):
+        with token.on_cancel("done", lambda: calls.append("done")):
+            pass
+        assert token.cancel("user pressed stop") == ["request"]
+        assert token.cancel("again") == ["request"]
+
+    assert calls == ["request"]
+    assert token.cancelled and token.reason == "user pressed stop"
+    with pytest.raises(OperationCancelled, match="user pressed stop"):
+        token.raise_if_cancelled()
+
+
+def test_callback_registered_after_cancel_runs_at_once():
+    token = CancellationToken()
+    token.cancel()
+    calls = []
+
+    with token.on_cancel("late", lambda: calls.append("late")):
+        assert calls == ["late"]
+
+    assert token.cancelled_operations == ["late"]
+
+
+def test_child_tokens_follow_their_parent_but_not_the_reverse():
+    parent = CancellationToken()
+    first, second = parent.child(), parent.child()
+
+    first.cancel("lost the race")
+    assert first.cancelled and not parent.cancelled and not second.cancelled
+
+    with second.on_cancel("analysis", lambda: None):
+        parent.cancel("run stopped")
+    assert second.cancelled and second.reason == "run stopped"
+    assert parent.cancelled_operations == ["analysis"]
+    assert parent.child().cancelled
+
+
+def test_run_in_thread_returns_at_once_when_cancelled():
+    token = CancellationToken()
+    release = threading.Event()
+    _cancel_after(token, 0.1)
+
+    start = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        run_in_thread(lambda: release.wait(30) and "late", token, "slow call")
+
+    assert time.monotonic() - start < 5
+    assert token.cancelled_operations == ["slow call"]
+    release.set()
+
+
+def test_run_in_thread_passes_results_and_errors_through():
+    token = CancellationToken()
+
+    assert run_in_thread(lambda: "value", token, "call") == "value"
+    with pytest.raises(ZeroDivisionError):
+        run_in_thread(lambda: 1 / 0, token, "call")
+    assert run_in_thread(lambda: "direct", None, "call") == "direct"
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg"), reason="process groups need POSIX")
+def test_run_process_kills_the_whole_process_group(tmp_path):
+    pid_file = tmp_path / "grandchild.pid"
+    # The child starts a grandchild that would outlive a plain kill of the child
+    script = (
+        "import subprocess, sys, time\n"
+        "grandchild = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+        f"open({str(pid_file)!r}, 'w').write(str(grandchild.pid))\n"
+        "time.sleep(60)\n"
+    )
+    token = CancellationToken()
+
+    def cancel_once_started() -> None:
+        deadline = time.monotonic() + 10
+        while not (pid_file.exists() and pid_file.read_text()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        token.cancel("timeout")
+
+    threading.Thread(target=cancel_once_started).start()
+    start = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        run_process([sys.executable, "-c", script], token, label="sleeper")
+
+    assert time.monotonic() - start < 10
+    assert token.cancelled_operations == ["sleeper"]
+    grandchild = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while _alive(grandchild) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not _alive(grandchild)
+
+
+def test_run_process_without_cancellation_completes():
+    completed = run_process([sys.executable, "-c", "print('ok')"], CancellationToken())
+
+    assert completed.returncode == 0 and completed.stdout == "ok\n"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child of an exited parent may linger as a zombie until reparented and reaped
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            return f.read().split(") ")[-1][0] != "Z"
+    except OSError:
+        return True
@@ -0,0 +1,51 @@
+import ast
+
+from src.analysis.dynamic_analyzer.dynamic_analyzer_main import run_dynamic_analysis
+from src.code_artifact import CodeArtifact, as_code_artifact
+from src.code_parser import extract_code_artifact
+
+RESPONSE = (
+    "Here:\n```python\n"
+    "import os\n"
+    "for i in range(3):\n"
+    "    print(i)\n"
+    "os.system('ls')\n"
+    "```\n"
+)
+
+
+def test_views_are_computed_once_and_cached():
+    artifact = CodeArtifact("import os.path\nif os.path.exists('x'):\n    print(1)\n")
+
+    assert artifact.tree is artifact.tree
+    assert artifact.tokens is artifact.tokens
+    assert artifact.node_counts["If"] == 1
+    assert artifact.lines == ["import os.path", "if os.path.exists('x'):", "    print(1)", ""]
+    assert {"os.path", "os.path.exists", "print"} <= artifact.names
+    assert artifact.content_hash == CodeArtifact(artifact.source).content_hash
+    assert as_code_artifact(artifact) is artifact
+    assert as_code_artifact("x = 1").source == "x = 1"
+
+
+def test_broken_code_keeps_the_tokens_it_can_read():
+    artifact = CodeArtifact("import os\nos.system('ls'\n")
+
+    assert artifact.tree is None and artifact.nodes == []
+    assert "os.system" in artifact.names
+
+
+def test_extraction_and_dynamic_analysis_parse_the_code_once(monkeypatch):
+    parses = []
+    parse = ast.parse
+
+    def counting_parse(*args, **kwargs):
+        parses.append(args[0])
+        return parse(*args, **kwargs)
+
+    monkeypatch.setattr(ast, "parse", counting_parse)
+
+    artifact = extract_code_artifact(RESPONSE)
+    issues = run_dynamic_analysis(artifact, "dynapyt", "comprehensive")
+
+    assert len(parses) == 1
+    assert any("os.system()" in issue for issue in issues)
@@ -0,0 +1,42 @@
+from src.analysis.dynamic_analyzer.codeact_wrapper import (
+    code_facts, detect_security_issues, extract_imports_and_functions
+)
+from src.code_artifact import CodeArtifact
+
+CODE = (
+    "import os.path\n"
+    "from subprocess import (\n"
+    "    run as sh,\n"
+    ")\n"
+    "\n"
+    "class Runner:\n"
+    "    def start(self):\n"
+    "        sh(['ls'])\n"
+    "\n"
+    "async def main():\n"
+    "    return input()\n"
+)
+
+
+def test_facts_come_from_one_pass_over_the_artifact_tree():
+    artifact = CodeArtifact(CODE)
+
+    facts = code_facts(artifact)
+
+    assert [info.qualified_name for info in facts.imports] == ["os.path", "subprocess.run"]
+    assert [(d.name, d.kind) for d in facts.definitions] == [
+        ("Runner", "class"), ("Runner.start", "method"), ("main", "async function")
+    ]
+    assert [(call.name, call.line) for call in facts.dangerous_calls] == [("subprocess.run", 8)]
+    assert [call.line for call in facts.input_calls] == [11]
+    # Same content, same facts: a new artifact of unchanged code is not visited again
+    assert code_facts(CodeArtifact(CODE)) is facts
+    assert extract_imports_and_functions(artifact) == (["os.path", "subprocess.run"], ["Runner.start", "main"])
+
+
+def test_unparsable_code_falls_back_to_names():
+    artifact = CodeArtifact("import os\nos.system('ls'\n")
+
+    assert artifact.tree is None
+    assert not code_facts(artifact).parsed
+    assert detect_security_issues(artifact) == ["Potentially dangerous module usage 'os.system' detected"]
@@ -0,0 +1,85 @@
+import re
+from typing import Optional
+
+import pytest
+
+from src.code_parser import FenceScanner, IncrementalCodeBlockParser, extract_python_code, scan_code_blocks
+
+
+def _extract_python_code_regex(llm_response: str) -> Optional[str]:
+    """The extractor the fence scanner replaced: the first block matched by non-greedy regexes."""
+    python_block_pattern = re.compile(r"```python\s*(.*?)\s*```", re.DOTALL)
+    generic_block_pattern = re.compile(r"```\s*(.*?)\s*```", re.DOTALL)
+    match = python_block_pattern.search(llm_response) or generic_block_pattern.search(llm_response)
+    return match.group(1).strip() if match else None
+
+
+def _blocks(response: str):
+    return [(block.language, block.code, block.closed) for block in scan_code_blocks(response)]
+
+
+def test_blocks_are_collected_with_their_language():
+    response = "Intro\n```bash\npip install x\n```\nThen:\n```Python\nimport x\n```\n~~~\nbare\n~~~\n"
+
+    assert _blocks(response) == [("bash", "pip install x", True), ("python", "import x", True), ("", "bare", True)]
+
+
+def test_shorter_nested_fence_does_not_close_the_block():
+    response = "````python\ndoc = '''\n```\nexample\n```\n'''\n````\n"
+
+    assert _blocks(response) == [("python", "doc = '''\n```\nexample\n```\n'''", True)]
+    # The regex extractor stopped at the first nested fence
+    assert _extract_python_code_regex(response) == "doc = '''"
+
+
+def test_tilde_fence_is_only_closed_by_tildes():
+    assert _blocks("~~~python\nx = '```'\n```\n~~~\n") == [("python", "x = '```'\n```", True)]
+
+
+def test_inline_code_does_not_open_a_block():
+    assert _blocks("```python `x` is inline code\nprint(1)\n") == []
+    assert _blocks("Use ```pip install x``` first\n") == []
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("```python print('hi')```", ("python", "print('hi')")),
+    ("```print('hi')```", ("", "print('hi')")),
+    ("```python name = f'`{x}`'```", ("python", "name = f'`{x}`'")),
+    ("~~~py x = 1~~~", ("py", "x = 1")),
+    ("```python```", ("python", "")),
+])
+def test_single_line_blocks(line, expected):
+    assert _blocks(f"Here:\n{line}\nDone.\n") == [expected + (True,)]
+
+
+def test_unclosed_block_is_kept_when_the_response_is_cut():
+    assert _blocks("```python\ndef f():\n    return 1\n") == [("python", "def f():\n    return 1", False)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_any_chunking_gives_the_same_blocks(size):
+    response = "A\n```python\nimport os\n```\nB\n````py\nx = '```'\n````\nC:\n```python print(1)```\n"
+    chunks = [response[i:i + size] for i in range(0, len(response), size)]
+
+    scanner = FenceScanner()
+    for chunk in chunks:
+        scanner.feed(chunk)
+
+    assert scanner.close() == scan_code_blocks(response)
+    assert [block.code for block in scanner.blocks] == ["import os", "x = '```'", "print(1)"]
+
+
+def test_incremental_parser_returns_the_first_block_as_soon_as_it_closes():
+    parser = IncrementalCodeBlockParser()
+
+    assert parser.feed("Sure:\n```python\nprint(") is None
+    assert parser.feed("1)\n``") is None
+    assert parser.feed("`") == "print(1)"
+    assert parser.feed("\nmore text") == "print(1)"
+    assert parser.text == "Sure:\n```python\nprint(1)\n```"
+
+
+def test_extraction_agrees_with_the_regex_on_simple_responses():
+    response = "Explanation\n```python\nimport math\nprint(math.pi)\n```\nThanks"
+
+    assert extract_python_code(response) == _extract_python_code_regex(response) == "import math\nprint(math.pi)"
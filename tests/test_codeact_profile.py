@@ -0,0 +1,93 @@
+import json
+import subprocess
+import sys
+
+import src.analysis.dynamic_analyzer.codeact_wrapper as codeact_wrapper
+from src.analysis.dynamic_analyzer.codeact_wrapper import (
+    PROFILE_MARKER, AnalysisResult, ExecutionResult, build_profiling_harness, generate_performance_feedback,
+    parse_profile_output
+)
+from src.analysis.dynamic_analyzer.dynamic_analyzer_main import run_dynamic_analysis
+
+SLOW_CODE = (
+    "def busy():\n"
+    "    total = 0\n"
+    "    for i in range(300000):\n"
+    "        total += i * i\n"
+    "    return total\n"
+    "\n"
+    "print(busy())\n"
+)
+
+
+def _result(profile, segment: str = "main") -> ExecutionResult:
+    return ExecutionResult(
+        success=True, output="", error="", execution_time=0.0, variables={}, imports_used=[],
+        functions_defined=[], security_issues=[], segment=segment, profile=profile
+    )
+
+
+def test_profile_line_is_split_from_program_output():
+    profile = {"cpu_time": 0.5, "hot_functions": []}
+    output = f"first\n{PROFILE_MARKER}{json.dumps(profile)}\nlast"
+
+    assert parse_profile_output(output) == ("first\nlast", profile)
+    assert parse_profile_output("no profile here") == ("no profile here", None)
+    assert parse_profile_output(f"{PROFILE_MARKER}{{not json")[1] == {
+        "errors": ["Profile output could not be parsed"]
+    }
+
+
+def test_harness_reports_the_hot_function():
+    harness = build_profiling_harness(SLOW_CODE, top_n=5)
+    completed = subprocess.run([sys.executable, "-c", harness], capture_output=True, text=True, timeout=60)
+
+    output, profile = parse_profile_output(completed.stdout)
+
+    assert output.strip() == str(sum(i * i for i in range(300000)))
+    assert profile is not None and profile["cpu_time"] > 0
+    hot = [entry for entry in profile["hot_functions"] if entry["function"] == "busy"]
+    assert hot and hot[0]["file"] == "<generated>" and hot[0]["line"] == 1
+    feedback = generate_performance_feedback([_result(profile, "busy")], slow_function_seconds=0.0)
+    assert any(line.startswith("Dynamic Analysis [PERFORMANCE]: 'busy' (line 1) spent") for line in feedback)
+
+
+def test_feedback_text():
+    profile = {
+        "hot_functions": [
+            {"function": "load", "file": "<generated>", "line": 3, "calls": 2, "self_time": 1.25},
+            {"function": "<module>", "file": "<generated>", "line": 1, "calls": 1, "self_time": 2.0},
+            {"function": "sleep", "file": "~", "line": 0, "calls": 1, "self_time": 5.0},
+            {"function": "fast", "file": "<generated>", "line": 9, "calls": 100, "self_time": 0.01},
+        ],
+        "peak_memory_bytes": 200 * 1024 * 1024,
+        "allocation_sites": [{"line": 4, "size_bytes": 150 * 1024 * 1024, "count": 12}],
+    }
+
+    feedback = generate_performance_feedback([_result(profile, "load"), _result(None, "other")])
+
+    assert feedback == [
+        "Dynamic Analysis [PERFORMANCE]: 'load' (line 3) spent 1.25s over 2 call(s) in segment 'load'",
+        "Dynamic Analysis [MEMORY]: peak memory 200.0 MB in segment 'load'; "
+        "largest allocation site is line 4 (150.0 MB in 12 blocks)",
+    ]
+
+
+def test_profiling_feedback_reaches_the_issue_list(monkeypatch):
+    hot_profile = {"hot_functions": [{"function": "load", "file": "<generated>", "line": 3, "calls": 1, "self_time": 0.9}]}
+    calls = []
+
+    def fake_analysis(code, profile=False, cancel_token=None):
+        calls.append(profile)
+        return AnalysisResult(
+            analysis_summary="Executed 1 code segment(s)", recommendations=["Fix 1 failed execution(s)"],
+            security_assessment="", performance_metrics={}, execution_results=[_result(hot_profile)]
+        )
+
+    monkeypatch.setattr(codeact_wrapper, "CODEACT_AVAILABLE", True)
+    monkeypatch.setattr(codeact_wrapper, "run_codeact_analysis", fake_analysis)
+
+    issues = run_dynamic_analysis("def load(): pass", "codeact", "performance", profile=True)
+
+    assert calls == [True]
+    assert issues == ["Dynamic Analysis [PERFORMANCE]: 'load' (line 3) spent 0.90s over 1 call(s) in segment 'main'"]
@@ -0,0 +1,72 @@
+from typing import List
+
+from src.analysis.dynamic_analyzer.codeact_wrapper import split_code_into_segments
+
+
+def _segment_codes(code: str) -> List[str]:
+    return [segment.code for segment in split_code_into_segments(code)]
+
+
+def test_prints_stay_in_one_segment_in_order():
+    code = "print('first')\nprint('second')\n"
+
+    assert _segment_codes(code) == [code]
+
+
+def test_seed_runs_before_the_draw():
+    code = "import random\nrandom.seed(42)\nvalue = random.random()\nprint(value)\n"
+
+    assert _segment_codes(code) == [code]
+
+
+def test_chdir_runs_before_open():
+    code = (
+        "import os\n"
+        "os.chdir('/tmp')\n"
+        "with open('out.txt', 'w') as handle:\n"
+        "    handle.write('x')\n"
+    )
+
+    assert _segment_codes(code) == [code]
+
+
+def test_independent_definitions_are_still_split():
+    code = (
+        "def square(x):\n"
+        "    return x * x\n"
+        "\n"
+        "def cube(x):\n"
+        "    return x ** 3\n"
+        "\n"
+        "LIMIT = 10\n"
+    )
+
+    segments = split_code_into_segments(code)
+
+    assert [segment.name for segment in segments] == ["square", "cube", "line 7"]
+
+
+def test_effects_join_the_definitions_they_use():
+    code = (
+        "import math\n"
+        "\n"
+        "def area(r):\n"
+        "    return math.pi * r * r\n"
+        "\n"
+        "def unused():\n"
+        "    return 0\n"
+        "\n"
+        "print(area(2))\n"
+        "print('done')\n"
+    )
+
+    segments = split_code_into_segments(code)
+
+    assert [segment.name for segment in segments] == ["area", "unused"]
+    assert segments[0].code == (
+        "import math\n"
+        "def area(r):\n"
+        "    return math.pi * r * r\n"
+        "print(area(2))\n"
+        "print('done')"
+    )
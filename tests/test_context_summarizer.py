@@ -0,0 +1,82 @@
+import io
+
+import pandas as pd
+import pytest
+
+import src.context_summarizer as context_summarizer
+from src.context_summarizer import (
+    TableSummaryAccumulator, cap_text, summarize_csv_with_metadata, summarize_dataframe
+)
+
+
+def _csv(rows: int) -> bytes:
+    df = pd.DataFrame({
+        "id": range(rows),
+        "price": [round(i * 1.5 + 0.25, 2) for i in range(rows)],
+        "city": [["Rome", "Milan", "Turin"][i % 3] for i in range(rows)],
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+@pytest.mark.parametrize("chunksize", [1, 7, 100, 10_000])
+def test_chunked_summary_matches_the_whole_table(chunksize):
+    data = _csv(100)
+    df = pd.read_csv(io.BytesIO(data))
+
+    summary, metadata = summarize_csv_with_metadata(io.BytesIO(data), char_budget=100_000, chunksize=chunksize)
+
+    assert summary == summarize_dataframe(df, char_budget=100_000)
+    assert metadata == {"rows": 100, "columns": ["id", "price", "city"],
+                        "dtypes": {column: str(dtype) for column, dtype in df.dtypes.items()}}
+
+
+def test_statistics_agree_with_pandas():
+    df = pd.read_csv(io.BytesIO(_csv(100)))
+    accumulator = TableSummaryAccumulator()
+    for start in range(0, 100, 30):
+        accumulator.update(df.iloc[start:start + 30])
+
+    summary = accumulator.render(100_000)
+
+    price = df["price"]
+    assert (
+        f"- price: count=100, mean={price.mean():.6g}, std={price.std():.6g}, "
+        f"min={price.min():.6g}, max={price.max():.6g}"
+    ) in summary
+    assert "- city: unique=3; 'Rome': 34, 'Milan': 33, 'Turin': 33" in summary
+    assert "First 5 rows:" in summary and "Last 5 rows:" in summary
+    assert accumulator.tail.index.tolist() == [95, 96, 97, 98, 99]
+
+
+def test_small_tables_show_every_row_once():
+    summary = summarize_dataframe(pd.read_csv(io.BytesIO(_csv(7))), char_budget=100_000)
+
+    assert "All rows:" in summary and "First" not in summary
+    assert summary.count("Milan") == 3
+
+
+def test_dtypes_and_nulls_seen_across_chunks_are_all_reported():
+    accumulator = TableSummaryAccumulator()
+    accumulator.update(pd.DataFrame({"value": [1, 2]}))
+    accumulator.update(pd.DataFrame({"value": [3.5, None]}))
+
+    assert accumulator.metadata()["dtypes"] == {"value": "int64 | float64"}
+    assert "- value: int64 | float64, nulls=1" in accumulator.render()
+
+
+def test_high_cardinality_counts_stay_bounded(monkeypatch):
+    monkeypatch.setattr(context_summarizer, "MAX_TRACKED_CATEGORIES", 10)
+    accumulator = TableSummaryAccumulator()
+    for start in range(0, 100, 20):
+        accumulator.update(pd.DataFrame({"key": [f"k{i}" for i in range(start, start + 20)]}))
+
+    assert len(accumulator.value_counts["key"]) <= 10
+    assert "- key: unique=>" in accumulator.render()
+
+
+def test_summary_respects_the_character_budget():
+    summary = summarize_dataframe(pd.read_csv(io.BytesIO(_csv(1_000))), char_budget=300)
+
+    assert len(summary) == 300
+    assert summary.endswith("[... summary truncated at 300 characters ...]\n")
+    assert cap_text("short", 300) == "short"
@@ -0,0 +1,65 @@
+from typing import List, Optional, Tuple
+
+import pytest
+
+import src.pipeline as pipeline
+import src.token_budget as token_budget
+from src.context_handler import create_delta_feedback_prompt, delta_feedback_prompt_sections
+from src.pipeline import PipelineConfig, run_generation_pipeline
+
+FIRST_CODE = "import math\n\n\ndef area(r):\n    return math.pi * r ** 2\n\n\nprint(area(2))\n"
+FIXED_CODE = FIRST_CODE.replace("r ** 2", "r * r")
+
+
+@pytest.fixture(autouse=True)
+def approximate_counts(monkeypatch):
+    monkeypatch.setattr(token_budget, "_get_encoding", lambda model_name: None)
+
+
+def _names(previous_code: Optional[str], failed_code: Optional[str]) -> List[str]:
+    return [section.name for section in delta_feedback_prompt_sections(previous_code, failed_code, ["E1"])]
+
+
+def test_changed_code_is_sent_as_a_diff_against_the_previous_answer():
+    prompt = create_delta_feedback_prompt(FIRST_CODE, FIXED_CODE, ["E1: bad", "E2: worse"])
+
+    assert "```diff\n--- previous_answer.py\n+++ latest_attempt.py\n" in prompt
+    assert "-    return math.pi * r ** 2\n+    return math.pi * r * r\n" in prompt
+    assert "import math" not in prompt  # outside the diff context
+    assert "**ANALYSIS FOUND THESE ISSUES:**\n- E1: bad\n- E2: worse" in prompt
+
+
+def test_other_cases_send_no_diff():
+    assert _names(FIRST_CODE, FIRST_CODE) == ["template", "template", "issues", "template"]
+    assert _names(FIRST_CODE, None) == ["template", "template", "issues", "template"]
+    assert _names(None, FIXED_CODE) == ["template", "failed_code", "template", "template", "issues", "template"]
+    assert "previous answer had issues" in create_delta_feedback_prompt(FIRST_CODE, FIRST_CODE, ["E1"])
+    assert f"```python\n{FIXED_CODE}\n```" in create_delta_feedback_prompt(None, FIXED_CODE, ["E1"])
+
+
+def test_conversational_retry_continues_the_first_turn(monkeypatch):
+    calls: List[Tuple[str, Optional[List[Tuple[str, str]]]]] = []
+    answers = [f"```python\n{FIRST_CODE}```", f"```python\n{FIXED_CODE}```"]
+
+    def fake_call_llm(prompt, config, temperature, history=None):
+        calls.append((prompt, history))
+        return answers[len(calls) - 1]
+
+    def fake_analyzers(artifact, cancel_token=None, session_id=None, profile=False):
+        return {"Pylint": ["E1: ** is slow"]} if "r ** 2" in artifact.source else {}
+
+    monkeypatch.setattr(pipeline, "_call_llm", fake_call_llm)
+    monkeypatch.setattr(pipeline, "run_analyzers", fake_analyzers)
+    messages: List[str] = []
+    config = PipelineConfig(model_name="gpt-4o", max_attempts=2, conversational_retries=True)
+
+    result = run_generation_pipeline(
+        "Area of a circle", "x" * 4_000, config, lambda message, level: messages.append(message)
+    )
+
+    assert result.success and result.generated_code == FIXED_CODE.strip()
+    (first_prompt, first_history), (retry_prompt, retry_history) = calls
+    assert first_history is None and "x" * 4_000 in first_prompt
+    assert retry_history == [(first_prompt, answers[0])]
+    assert "x" * 100 not in retry_prompt and "E1: ** is slow" in retry_prompt
+    assert any("fewer uncached tokens" in message for message in messages)
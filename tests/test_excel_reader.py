@@ -0,0 +1,71 @@
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from src.excel_reader import (
+    MIN_SHEET_CHAR_BUDGET, OMITTED_NOTE_CHARS, read_excel_context, read_excel_sheets
+)
+
+
+def _workbook(sheets: int, rows: int, columns: int = 5) -> bytes:
+    workbook = Workbook(write_only=True)
+    for s in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{s + 1}")
+        sheet.append([f"col_{c}" for c in range(columns)])
+        for r in range(rows):
+            sheet.append([r if c == 0 else (f"cat_{r % 7}" if c % 3 == 0 else r * 0.5 + c) for c in range(columns)])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_small_workbook_matches_pandas():
+    data = _workbook(sheets=3, rows=20)
+    xls = pd.ExcelFile(io.BytesIO(data))
+    expected = "".join(
+        (f"\n--- Content of sheet: {name} ---\n" if i else "") + pd.read_excel(xls, sheet_name=name).to_string() + "\n"
+        for i, name in enumerate(xls.sheet_names)
+    )
+
+    assert read_excel_context(data, char_budget=200_000) == expected
+
+
+@pytest.mark.parametrize("summarize", [False, True])
+def test_many_sheets_share_the_budget_strictly(summarize):
+    data = _workbook(sheets=50, rows=100)
+    char_budget = 8_000
+
+    sheets = read_excel_sheets(data, summarize=summarize, char_budget=char_budget)
+    text = read_excel_context(data, summarize=summarize, char_budget=char_budget)
+
+    shown = char_budget // MIN_SHEET_CHAR_BUDGET
+    assert [name for name, _, _ in sheets] == [f"Sheet{s + 1}" for s in range(50)]
+    assert all(not metadata.get("omitted") for _, _, metadata in sheets[:shown])
+    assert all(metadata == {"omitted": True} for _, _, metadata in sheets[shown:])
+    assert sum(len(text) for _, text, _ in sheets) <= char_budget - OMITTED_NOTE_CHARS
+    assert len(text) <= char_budget
+    assert f"--- Content of sheet: Sheet{shown} ---" in text
+    assert f"--- Content of sheet: Sheet{shown + 1} ---" not in text
+    assert f"{50 - shown} more sheet(s) omitted to fit the context budget: Sheet{shown + 1}, " in text
+
+
+def test_short_sheets_leave_their_share_to_the_next():
+    workbook = Workbook(write_only=True)
+    tiny = workbook.create_sheet("Tiny")
+    tiny.append(["a"])
+    tiny.append([1])
+    big = workbook.create_sheet("Big")
+    big.append(["value"])
+    for r in range(2_000):
+        big.append([r])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    (_, tiny_text, _), (_, big_text, big_metadata) = read_excel_sheets(buffer.getvalue(), char_budget=4_000)
+
+    assert big_metadata["truncated"]
+    # The big sheet gets everything the tiny one and the separator did not use
+    assert len(big_text) > 4_000 // 2
+    assert len(tiny_text) + len(big_text) <= 4_000
@@ -0,0 +1,81 @@
+import io
+
+import pytest
+
+import src.context_handler as context_handler
+from src.context_handler import get_parsed_file
+from src.file_context_cache import FileContextCache, FileContextKey, ParsedFile, hash_file_content
+
+
+def _key(name: str, data: bytes = b"", summarize: bool = False) -> FileContextKey:
+    return FileContextKey(hash_file_content(data or name.encode()), name, summarize, 1000)
+
+
+def _parsed(name: str, size: int) -> ParsedFile:
+    # An empty metadata dict adds len("{}") == 2 bytes
+    return ParsedFile(name, "x" * (size - 2))
+
+
+def test_least_recently_used_entries_are_evicted_to_stay_within_the_size():
+    cache = FileContextCache(max_bytes=250)
+    cache.put(_key("a"), _parsed("a", 100))
+    cache.put(_key("b"), _parsed("b", 100))
+    assert cache.get(_key("a")).filename == "a"
+
+    cache.put(_key("c"), _parsed("c", 100))  # evicts "b", the least recently used
+
+    assert cache.get(_key("b")) is None
+    assert [cache.get(_key(name)).filename for name in "ac"] == ["a", "c"]
+    assert cache.stats() == {
+        "entries": 2, "bytes": 200, "max_bytes": 250, "hits": 3, "misses": 1, "evictions": 1,
+        "hit_rate": pytest.approx(0.75)
+    }
+
+
+def test_oversized_entries_are_not_stored_and_replacements_are_not_counted_twice():
+    cache = FileContextCache(max_bytes=100)
+    cache.put(_key("big"), _parsed("big", 101))
+    cache.put(_key("a"), _parsed("a", 50))
+    cache.put(_key("a"), _parsed("a", 60))
+
+    assert len(cache) == 1
+    assert cache.stats()["bytes"] == 60
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+
+
+def test_settings_are_part_of_the_key():
+    assert _key("data.csv", b"1,2") != _key("data.csv", b"1,2", summarize=True)
+    assert _key("data.csv", b"1,2") != _key("data.csv", b"1,3")
+    assert _key("data.csv", b"1,2") == _key("data.csv", b"1,2")
+
+
+class _Upload(io.BytesIO):
+    """Minimal stand-in for a Streamlit UploadedFile."""
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+def test_unchanged_uploads_are_parsed_once(monkeypatch):
+    cache = FileContextCache()
+    monkeypatch.setattr(context_handler, "get_file_context_cache", lambda: cache)
+    parses = []
+    parse_file = context_handler.parse_file
+
+    def counting_parse(filename, data, summarize, char_budget):
+        parses.append(filename)
+        return parse_file(filename, data, summarize, char_budget)
+
+    monkeypatch.setattr(context_handler, "parse_file", counting_parse)
+
+    first = get_parsed_file(_Upload("notes.txt", b"hello\nworld"))
+    again = get_parsed_file(_Upload("notes.txt", b"hello\nworld"))
+    get_parsed_file(_Upload("notes.txt", b"changed"))
+    get_parsed_file(_Upload("notes.txt", b"hello\nworld"), use_cache=False)
+
+    assert again is first
+    assert first.metadata == {"lines": 2, "chars": 11}
+    assert parses == ["notes.txt", "notes.txt", "notes.txt"]
+    assert cache.stats()["hits"] == 1
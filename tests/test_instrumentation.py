@@ -0,0 +1,109 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+import src.instrumentation as instrumentation
+from src.instrumentation import (
+    METRIC_NAME, MetricsRegistry, enable_metrics, get_metrics_registry, observe, render_prometheus, span,
+    start_metrics_server, trace_request, write_prometheus_file
+)
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """Enabled metrics in an empty registry, disabled again afterwards."""
+    monkeypatch.setattr(instrumentation, "_metrics_enabled", False)
+    get_metrics_registry().reset()
+    enable_metrics()
+    yield get_metrics_registry()
+    get_metrics_registry().reset()
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    for seconds in [0.05, 0.1, 0.5, 3.0]:
+        registry.observe("llm_call", seconds, {"model": "gpt-4o"})
+
+    labels = 'stage="llm_call",model="gpt-4o"'
+    assert registry.render().splitlines() == [
+        f"# HELP {METRIC_NAME} Duration of generation pipeline stages in seconds.",
+        f"# TYPE {METRIC_NAME} histogram",
+        f'{METRIC_NAME}_bucket{{{labels},le="0.1"}} 2',
+        f'{METRIC_NAME}_bucket{{{labels},le="1.0"}} 3',
+        f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} 4',
+        f"{METRIC_NAME}_sum{{{labels}}} 3.65",
+        f"{METRIC_NAME}_count{{{labels}}} 4",
+    ]
+
+
+def test_label_sets_get_their_own_series_with_escaped_values():
+    registry = MetricsRegistry(buckets=(1.0,))
+    registry.observe("analyzer", 0.5, {"name": 'say "hi"\\\n'})
+    registry.observe("analyzer", 0.5, {"name": "pylint"})
+
+    text = registry.render()
+
+    assert f'{METRIC_NAME}_count{{stage="analyzer",name="say \\"hi\\"\\\\\\n"}} 1' in text
+    assert f'{METRIC_NAME}_count{{stage="analyzer",name="pylint"}} 1' in text
+    assert text.endswith("\n")
+
+
+def test_spans_are_no_ops_while_metrics_are_disabled(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_metrics_enabled", False)
+    registry = get_metrics_registry()
+    registry.reset()
+
+    with span("llm_call", model="gpt-4o"):
+        pass
+    observe("admission_wait", 1.0, gate="llm")
+
+    assert span("llm_call") is span("analyzer")
+    assert METRIC_NAME + "_count" not in registry.render()
+
+
+def test_spans_and_observations_feed_the_registry(metrics):
+    with span("code_extraction"):
+        pass
+    observe("admission_wait", 0.3, gate="llm")
+
+    text = render_prometheus()
+    assert f'{METRIC_NAME}_count{{stage="code_extraction"}} 1' in text
+    assert f'{METRIC_NAME}_bucket{{stage="admission_wait",gate="llm",le="0.25"}} 0' in text
+    assert f'{METRIC_NAME}_bucket{{stage="admission_wait",gate="llm",le="0.5"}} 1' in text
+
+
+def test_trace_records_spans_without_metrics(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_metrics_enabled", False)
+
+    with trace_request("req-1") as trace:
+        with span("llm_call", model="gpt-4o"):
+            pass
+    with span("llm_call"):
+        pass
+
+    events = trace.to_chrome_trace()["traceEvents"]
+    assert [event["name"] for event in events if event["ph"] == "X"] == ["llm_call (gpt-4o)"]
+    assert trace.to_chrome_trace()["otherData"] == {"request": "req-1"}
+
+
+def test_metrics_are_written_to_a_file_and_served(metrics, tmp_path):
+    observe("pipeline_run", 2.0)
+    path = tmp_path / "codegen.prom"
+
+    write_prometheus_file(str(path))
+
+    assert path.read_text(encoding="utf-8") == render_prometheus()
+    assert not (tmp_path / "codegen.prom.tmp").exists()
+
+    server = start_metrics_server(0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{base}/metrics", timeout=10) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert response.read().decode("utf-8") == render_prometheus()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other", timeout=10)
+    finally:
+        server.shutdown()
+        instrumentation._servers.pop(("127.0.0.1", 0), None)
@@ -0,0 +1,30 @@
+import shutil
+
+import pytest
+
+from src.analysis.static_analyzer.static_analyzer import run_mypy
+from src.issue_aggregator import compress_issues
+
+
+@pytest.mark.skipif(shutil.which("mypy") is None, reason="mypy is not installed")
+def test_repeated_mypy_errors_are_collapsed():
+    issues = run_mypy("x: int = 'a'\ny: int = 'b'\nz: int = 'c'\n")
+    assert len(issues) == 3
+    assert all(issue.startswith("line ") and "[assignment]" in issue for issue in issues)
+
+    compressed = compress_issues(issues)
+
+    assert len(compressed) == 1
+    assert compressed[0].startswith("MyPy [assignment]: Incompatible types in assignment")
+    assert "3 occurrences at lines 1, 2, 3" in compressed[0]
+
+
+def test_mypy_issue_with_column_number_is_parsed():
+    issues = [
+        'line 4:5: error: Name "foo" is not defined  [name-defined]',
+        'line 9:12: error: Name "foo" is not defined  [name-defined]',
+    ]
+
+    assert compress_issues(issues) == [
+        'MyPy [name-defined]: Name "foo" is not defined (2 occurrences at lines 4, 9)'
+    ]
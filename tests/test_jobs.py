@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import List
+
+import pytest
+
+import src.jobs as jobs
+from src.admission import AdmissionRejected
+from src.jobs import (
+    JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, Job, JobRunner, JobStore
+)
+from src.pipeline import PipelineConfig, PipelineResult
+
+CONFIG = PipelineConfig(model_name="stub-offline", max_attempts=2)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """
+    Fake pipeline: "block" waits for ``release`` or cancellation, "fail" raises,
+    anything else succeeds at once. Records the queries in the order they ran.
+    """
+    release = threading.Event()
+    started: List[str] = []
+
+    def run(user_query, file_context, config, log, status, progress):
+        started.append(user_query)
+        progress(1, config.max_attempts)
+        log("generating", "info")
+        status("Attempt 1 of 2...")
+        if user_query == "fail":
+            raise RuntimeError("boom")
+        if user_query.startswith("block"):
+            with config.cancel_token.on_cancel("LLM call", release.set):
+                release.wait(10)
+            if config.cancel_token.cancelled:
+                return PipelineResult("", [], 1, config.max_attempts, False, cancelled=True)
+        return PipelineResult(f"print({user_query!r})", [], 1, config.max_attempts, True)
+
+    monkeypatch.setattr(jobs, "run_generation_pipeline", run)
+    return release, started
+
+
+@pytest.fixture
+def runner():
+    runner = JobRunner(max_workers=1, max_queued=3)
+    yield runner
+    runner.shutdown()
+
+
+def _wait_for(runner: JobRunner, job_id: str, *states: str) -> Job:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = runner.store.get(job_id)
+        if job.status in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} stayed {runner.store.get(job_id).status}")
+
+
+def test_completed_job_keeps_its_progress_log_and_result(runner, pipeline):
+    job_id = runner.submit("s1", "hello", "", CONFIG)
+
+    job = _wait_for(runner, job_id, JOB_COMPLETED)
+
+    assert job.result.generated_code == "print('hello')"
+    assert (job.attempt, job.max_attempts, job.status_message) == (1, 2, "Attempt 1 of 2...")
+    assert job.log_messages == ["generating"]
+    assert job.finished and job.started_at is not None
+
+
+def test_failed_pipeline_marks_the_job_failed(runner, pipeline):
+    job = _wait_for(runner, runner.submit("s1", "fail", "", CONFIG), JOB_FAILED)
+
+    assert job.error == "boom"
+    assert job.log_messages[-1] == "[ERROR] Generation job failed: RuntimeError: boom"
+
+
+def test_workers_serve_sessions_round_robin_and_reject_a_full_queue(runner, pipeline):
+    release, started = pipeline
+    blocker = runner.submit("s1", "block", "", CONFIG)
+    _wait_for(runner, blocker, JOB_RUNNING)
+    queued = [runner.submit("s1", "a1", "", CONFIG), runner.submit("s1", "a2", "", CONFIG),
+              runner.submit("s2", "b1", "", CONFIG)]
+
+    with pytest.raises(AdmissionRejected):
+        runner.submit("s3", "c1", "", CONFIG)
+    stats = runner.queue_stats()
+    assert (stats.active, stats.queued, stats.queued_by_session, stats.rejected) == (1, 3, {"s1": 2, "s2": 1}, 1)
+
+    release.set()
+    for job_id in queued:
+        _wait_for(runner, job_id, JOB_COMPLETED)
+    assert started == ["block", "a1", "b1", "a2"]
+
+
+def test_cancelling_queued_and_running_jobs(runner, pipeline):
+    running = runner.submit("s1", "block", "", CONFIG)
+    _wait_for(runner, running, JOB_RUNNING)
+    queued = runner.submit("s1", "later", "", CONFIG)
+
+    assert runner.cancel(queued) == []
+    assert runner.cancel(running, "user pressed stop") == ["LLM call"]
+
+    queued_job = _wait_for(runner, queued, JOB_CANCELLED)
+    running_job = _wait_for(runner, running, JOB_CANCELLED)
+    assert queued_job.started_at is None
+    assert running_job.status_message == "Cancelled: user pressed stop."
+    assert running_job.log_messages[-1].endswith("Interrupted operations: LLM call")
+    assert runner.queue_stats().queued == 0
+
+
+def test_abandoned_sessions_are_cancelled(runner, pipeline, monkeypatch):
+    monkeypatch.setattr(runner, "_start_watchdog", lambda: None)
+    job_id = runner.submit("gone", "block", "", CONFIG)
+    _wait_for(runner, job_id, JOB_RUNNING)
+    runner.touch_session("gone")
+    runner.touch_session("here")
+    runner._last_seen["gone"] -= 60
+
+    assert runner.cancel_abandoned_sessions(timeout=30) == ["gone"]
+    assert _wait_for(runner, job_id, JOB_CANCELLED).status_message == "Cancelled: session inactive for more than 30s."
+
+
+def test_store_hands_out_copies_and_prunes_old_finished_jobs():
+    store = JobStore(max_finished=2)
+    for i in range(4):
+        store.add(Job(f"job-{i}", "s1", "q", "m"))
+    store.get("job-0").log_messages.append("changed outside the store")
+    assert store.get("job-0").log_messages == []
+
+    for i in range(3):
+        store.update(f"job-{i}", status=JOB_COMPLETED, finished_at=float(i))
+
+    assert store.get("job-0") is None
+    assert [job.job_id for job in store.session_jobs("s1")] == ["job-1", "job-2", "job-3"]
+    assert store.counts()[JOB_COMPLETED] == 2 and store.counts()[JOB_QUEUED] == 1
@@ -0,0 +1,76 @@
+import asyncio
+from typing import List
+
+import pytest
+
+import src.llm_client_pool as llm_client_pool
+from src.llm_client_pool import (
+    ClientKey, LLMClientPool, _start_stub_server, aclose_loop_http_client, get_shared_http_client
+)
+
+
+def _key(model: str) -> ClientKey:
+    return ClientKey("openai", model, "", 0.2, 100)
+
+
+def test_least_recently_used_client_is_evicted():
+    pool = LLMClientPool(max_size=2, idle_timeout=0)
+    built: List[str] = []
+
+    def get(model: str) -> str:
+        return pool.get(_key(model), lambda: built.append(model) or f"client-{model}")
+
+    assert [get("a"), get("b"), get("a")] == ["client-a", "client-b", "client-a"]
+    get("c")  # evicts "b", the least recently used
+    get("a")
+    get("b")
+
+    assert built == ["a", "b", "c", "b"]
+    assert pool.stats() == {
+        "size": 2, "max_size": 2, "hits": 2, "misses": 4, "evictions": 2, "hit_rate": pytest.approx(1 / 3)
+    }
+
+
+def test_idle_clients_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_client_pool.time, "monotonic", lambda: now[0])
+    pool = LLMClientPool(max_size=4, idle_timeout=60)
+
+    first = pool.get(_key("a"), object)
+    now[0] += 59
+    assert pool.get(_key("a"), object) is first
+    now[0] += 61
+
+    assert pool.get(_key("a"), object) is not first
+    assert pool.stats()["evictions"] == 1
+
+
+@pytest.fixture
+def stub_server():
+    server = _start_stub_server()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions", server
+    server.shutdown()
+
+
+def test_async_connections_are_kept_per_event_loop(stub_server):
+    url, server = stub_server
+    client = get_shared_http_client(asynchronous=True)
+    transport = llm_client_pool._http_clients["async transport"]
+    loop_clients = []
+
+    async def three_requests() -> None:
+        for _ in range(3):
+            response = await client.post(url, json={})
+            assert response.status_code == 200 and response.json()["id"] == "chatcmpl-stub"
+        loop_clients.append(transport.for_running_loop(create=False))
+        await aclose_loop_http_client()
+        assert transport.for_running_loop(create=False) is None
+
+    asyncio.run(three_requests())
+    asyncio.run(three_requests())
+
+    # Keep-alive within a loop, a fresh connection for the next loop
+    assert server.connections == 2
+    assert loop_clients[0] is not loop_clients[1]
+    assert all(loop_client.is_closed for loop_client in loop_clients)
+    assert not client.is_closed
@@ -0,0 +1,147 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pytest
+
+import src.rate_limiter as rate_limiter
+from src.llm_handler import _call_with_rate_limit
+from src.rate_limiter import (
+    BACKOFF_MAX_SECONDS, MAX_RATE_LIMIT_RETRIES, TokenBucket, backoff_delay, get_rate_limiter,
+    is_rate_limit_error
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeRateLimitError(Exception):
+    """What an SDK raises on HTTP 429: the response carries the status and Retry-After."""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("Error code: 429 - Too Many Requests")
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = FakeResponse(429, headers)
+
+
+class FakeThrottlingProvider:
+    """
+    Local provider that accepts ``limit`` calls per ``window`` seconds and answers
+    the others with a 429 telling how long to wait (or no hint at all).
+    """
+
+    def __init__(self, limit: int, window: float, send_retry_after: bool = True):
+        self.limit = limit
+        self.window = window
+        self.send_retry_after = send_retry_after
+        self.calls: List[float] = []
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def complete(self) -> str:
+        with self._lock:
+            now = time.monotonic()
+            recent = [at for at in self.calls if now - at < self.window]
+            if len(recent) >= self.limit:
+                self.throttled += 1
+                retry_after = self.window - (now - recent[0]) if self.send_retry_after else None
+                raise FakeRateLimitError(retry_after)
+            self.calls.append(now)
+            return "ok"
+
+
+def test_retry_after_pauses_the_shared_limiter():
+    provider = FakeThrottlingProvider(limit=1, window=0.3)
+    model = "fake-retry-after"
+
+    start = time.monotonic()
+    results = [_call_with_rate_limit(model, "prompt", 10, provider.complete) for _ in range(3)]
+
+    assert results == ["ok", "ok", "ok"]
+    assert provider.throttled >= 1
+    assert get_rate_limiter("unknown", model).throttled == provider.throttled
+    # Each accepted call after the first waited out the provider's window
+    assert time.monotonic() - start >= 0.6
+    # The hint paused the limiter itself, so other callers wait too
+    get_rate_limiter("unknown", model).pause(0.5)
+    assert get_rate_limiter("unknown", model).reserve(1) > 0.4
+
+
+def test_throttling_without_hint_backs_off_exponentially(monkeypatch):
+    provider = FakeThrottlingProvider(limit=0, window=60, send_retry_after=False)
+    sleeps: List[float] = []
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    with pytest.raises(FakeRateLimitError):
+        _call_with_rate_limit("fake-backoff", "prompt", 10, provider.complete)
+
+    assert provider.throttled == MAX_RATE_LIMIT_RETRIES + 1
+    assert sleeps == [1.0, 2.0, 4.0, 8.0, 16.0]
+    assert backoff_delay(20) == BACKOFF_MAX_SECONDS
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def fail() -> str:
+        calls.append(1)
+        raise ValueError("expected 429 rows, got 430")
+
+    with pytest.raises(ValueError):
+        _call_with_rate_limit("fake-other-error", "prompt", 10, fail)
+
+    assert len(calls) == 1
+
+
+def test_rate_limit_error_detection():
+    class RateLimitError(Exception):
+        pass
+
+    class WrapperError(Exception):
+        pass
+
+    try:
+        try:
+            raise FakeRateLimitError()
+        except FakeRateLimitError as e:
+            raise WrapperError("generation failed") from e
+    except WrapperError as e:
+        wrapped = e
+
+    assert is_rate_limit_error(FakeRateLimitError())
+    assert is_rate_limit_error(RateLimitError("quota"))
+    assert is_rate_limit_error(wrapped)
+    assert not is_rate_limit_error(ValueError("429"))
+    assert not is_rate_limit_error(RuntimeError("rate limit of the sandbox reached"))
+
+
+def test_reservations_are_served_in_arrival_order():
+    bucket = TokenBucket(rate_per_minute=60, capacity=1)  # one token per second
+
+    delays = [bucket.reserve() for _ in range(5)]
+
+    assert delays == pytest.approx([0, 1, 2, 3, 4], abs=0.05)
+
+
+def test_concurrent_callers_get_distinct_slots():
+    bucket = TokenBucket(rate_per_minute=60, capacity=1)
+    delays: List[float] = []
+    lock = threading.Lock()
+
+    def reserve() -> None:
+        delay = bucket.reserve()
+        with lock:
+            delays.append(delay)
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # No caller jumps the queue or shares another's slot
+    assert sorted(round(delay) for delay in delays) == list(range(8))
@@ -0,0 +1,25 @@
+from src.context_handler import ContextChunk, select_relevant_chunks
+
+
+def _chunk(index: int, text: str) -> ContextChunk:
+    return ContextChunk("notes.txt", index * 10 + 1, index * 10 + 10, text)
+
+
+CHUNKS = [
+    _chunk(0, "The weather was sunny all week."),
+    _chunk(1, "Invoices are exported to CSV every night."),
+    _chunk(2, "Lunch is served at noon in the cafeteria."),
+    _chunk(3, "The CSV export job retries failed invoices."),
+]
+
+
+def test_unrelated_chunks_do_not_fill_the_budget():
+    selected = select_relevant_chunks(CHUNKS, "fix csv invoices export", token_budget=10_000)
+
+    assert selected == [CHUNKS[1], CHUNKS[3]]
+
+
+def test_without_any_match_chunks_are_taken_in_file_order():
+    selected = select_relevant_chunks(CHUNKS, "quantum chromodynamics", token_budget=10_000)
+
+    assert selected == CHUNKS
@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Dict, List
+
+import src.pipeline as pipeline
+from src.cancellation import CancellationToken, OperationCancelled
+from src.pipeline import PipelineConfig, generate_candidates
+
+FAST_TEMPERATURE = 0.2
+SLOW_TEMPERATURE = 0.8
+
+
+class FakeLLM:
+    """Answers at FAST_TEMPERATURE at once; at other temperatures, blocks until cancelled."""
+
+    def __init__(self):
+        self.abandoned: List[float] = []
+        self.in_flight: List[float] = []
+        self.started = threading.Event()
+
+    def __call__(self, temperature: float, cancel_token: CancellationToken, **kwargs) -> str:
+        if temperature == FAST_TEMPERATURE:
+            # Let the slow candidate get going first, so it is in flight when cancelled
+            self.started.wait(5)
+            return "```python\nprint('fast')\n```"
+        self.in_flight.append(temperature)
+        self.started.set()
+        if cancel_token.wait(30):
+            self.abandoned.append(temperature)
+            raise OperationCancelled(cancel_token.reason)
+        return "```python\nprint('slow')\n```"
+
+
+def _install(monkeypatch) -> FakeLLM:
+    llm = FakeLLM()
+    monkeypatch.setattr(pipeline, "stream_llm_response", lambda stop_at_first_block=False, **kwargs: llm(**kwargs))
+    monkeypatch.setattr(pipeline, "run_analyzers", lambda code, *args: {"Pylint": []})
+    return llm
+
+
+def test_slow_losing_candidate_is_abandoned(monkeypatch):
+    llm = _install(monkeypatch)
+    run_token = CancellationToken()
+    config = PipelineConfig(model_name="stub-offline", cancel_token=run_token)
+
+    start = time.monotonic()
+    accepted, finished = generate_candidates("Print something", config, [FAST_TEMPERATURE, SLOW_TEMPERATURE])
+
+    assert time.monotonic() - start < 5
+    assert accepted is not None and accepted.temperature == FAST_TEMPERATURE
+    assert [candidate.temperature for candidate in finished] == [FAST_TEMPERATURE]
+    deadline = time.monotonic() + 5
+    while not llm.abandoned and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert llm.abandoned == [SLOW_TEMPERATURE]
+    # Abandoning a candidate does not cancel the run
+    assert not run_token.cancelled
+
+
+def test_cancelling_the_run_cancels_every_candidate(monkeypatch):
+    llm = _install(monkeypatch)
+    run_token = CancellationToken()
+    config = PipelineConfig(model_name="stub-offline", cancel_token=run_token)
+    results: Dict[str, object] = {}
+
+    def generate() -> None:
+        results["candidates"] = generate_candidates("Print something", config, [SLOW_TEMPERATURE, 0.9])
+
+    thread = threading.Thread(target=generate)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while len(llm.in_flight) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    run_token.cancel("user pressed stop")
+    thread.join(5)
+
+    assert not thread.is_alive()
+    accepted, finished = results["candidates"]
+    assert accepted is None
+    assert sorted(llm.abandoned) == [SLOW_TEMPERATURE, 0.9]
+    assert all(candidate.issues[0].startswith("Error: LLM call cancelled") for candidate in finished)
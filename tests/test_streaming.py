@@ -0,0 +1,76 @@
+from typing import Any, Iterator, List
+
+import pytest
+
+import src.llm_handler as llm_handler
+from src.code_parser import extract_python_code
+
+# Above CACHEABLE_MAX_TEMPERATURE, so responses are neither read from nor written to the cache
+UNCACHED_TEMPERATURE = 0.9
+
+
+class FakeStreamingChatModel:
+    """Chat model whose stream yields canned chunks and records how many were consumed."""
+
+    def __init__(self, chunks: List[str]):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+
+    def stream(self, messages: Any) -> Iterator[str]:
+        try:
+            for chunk in self.chunks:
+                self.consumed += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    def install(chunks: List[str]) -> FakeStreamingChatModel:
+        model = FakeStreamingChatModel(chunks)
+        monkeypatch.setattr(llm_handler, "_get_llm", lambda *args, **kwargs: (model, None))
+        return model
+    return install
+
+
+def _stream(**kwargs: Any) -> str:
+    return llm_handler.stream_llm_response(
+        "Write the code", "stub-offline", temperature=UNCACHED_TEMPERATURE, **kwargs
+    )
+
+
+def test_stops_after_first_closing_fence(fake_model):
+    model = fake_model([
+        "Here it is:\n```py", "thon\nimport math\n", "print(math.pi)\n", "```",
+        "\nThis explanation", " is never generated.\n", "```python\nprint(2)\n```\n",
+    ])
+
+    text = _stream(stop_at_first_block=True)
+
+    assert model.consumed == 4
+    assert model.closed
+    assert text == "Here it is:\n```python\nimport math\nprint(math.pi)\n```"
+    assert extract_python_code(text) == "import math\nprint(math.pi)"
+
+
+def test_non_python_block_does_not_open_a_python_block(fake_model):
+    model = fake_model([
+        "Install it first:\n```bash\n", "pip install requests\n", "```\n",
+        "```python\n", "import requests\n", "```\n", "Trailing text\n",
+    ])
+
+    text = _stream(stop_at_first_block=True)
+
+    assert model.consumed == 6
+    assert extract_python_code(text) == "import requests"
+
+
+def test_reads_whole_stream_by_default(fake_model):
+    model = fake_model(["```python\nimport math\n```\n", "Then:\n", "```python\nprint(math.pi)\n```\n"])
+
+    text = _stream()
+
+    assert model.consumed == 3
+    assert extract_python_code(text) == "import math\n\nprint(math.pi)"
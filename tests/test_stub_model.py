@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+import src.llm_handler as llm_handler
+from src.llm_client_pool import get_client_pool
+from src.llm_handler import get_llm_response
+
+
+@pytest.fixture
+def stub_script(tmp_path, monkeypatch):
+    path = tmp_path / "script.json"
+    path.write_text(json.dumps(["first", "second"]), encoding="utf-8")
+    monkeypatch.setenv("STUB_LLM_SCRIPT", str(path))
+    monkeypatch.setenv("STUB_LLM_LATENCY", "0")
+
+    def no_cache():
+        raise AssertionError("stub responses must not go through the response cache")
+
+    monkeypatch.setattr(llm_handler, "get_response_cache", no_cache)
+    return path
+
+
+def test_script_advances_across_calls_at_zero_temperature(stub_script):
+    responses = [get_llm_response("Same prompt", "stub-offline", temperature=0.0) for _ in range(3)]
+
+    assert responses == ["first", "second", "second"]
+
+
+def test_stub_clients_are_not_pooled(stub_script):
+    pooled = len(get_client_pool())
+
+    first, _ = llm_handler._get_llm("stub-offline", None, None, 0.0, 100)
+    second, _ = llm_handler._get_llm("stub-offline", None, None, 0.0, 100)
+
+    assert first is not second
+    assert len(get_client_pool()) == pooled
+    # The script position is not per client: a new client continues the sequence
+    assert [first.invoke([]).content, second.invoke([]).content] == ["first", "second"]
@@ -0,0 +1,68 @@
+import pytest
+
+import src.token_budget as token_budget
+from src.token_budget import (
+    PRIORITY_FILE_CONTEXT, PRIORITY_ISSUES, PRIORITY_REQUEST, PRIORITY_TEMPLATE, PromptSection,
+    count_tokens, fit_sections_to_budget, format_token_report, render_prompt_sections
+)
+
+
+@pytest.fixture(autouse=True)
+def approximate_counts(monkeypatch):
+    """Count with the character approximation (4 characters per token), whatever is installed."""
+    monkeypatch.setattr(token_budget, "_get_encoding", lambda model_name: None)
+
+
+def _sections():
+    return [
+        PromptSection("template", "t" * 40, PRIORITY_TEMPLATE, trimmable=False),
+        PromptSection("request", "r" * 40, PRIORITY_REQUEST),
+        PromptSection("file_context", "f" * 4_000, PRIORITY_FILE_CONTEXT),
+        PromptSection("issues", "i" * 400, PRIORITY_ISSUES),
+    ]
+
+
+def _total(sections) -> int:
+    return sum(count_tokens(section.text) for section in sections)
+
+
+def test_sections_within_budget_are_left_alone():
+    sections = _sections()
+
+    fitted = fit_sections_to_budget(sections, 2_000)
+
+    assert [s.text for s in fitted] == [s.text for s in sections]
+    assert fitted[0] is not sections[0]
+    assert fit_sections_to_budget(sections, None)[2].text == sections[2].text
+
+
+def test_lowest_priority_section_is_trimmed_first():
+    sections = _sections()
+
+    fitted = fit_sections_to_budget(sections, 200)
+
+    assert _total(fitted) <= 200
+    assert [s.text for s in fitted if s.name != "file_context"] == [s.text for s in sections if s.name != "file_context"]
+    file_context = fitted[2]
+    assert file_context.text.startswith("f" * 100)
+    assert "tokens trimmed to fit the model's context window" in file_context.text
+    assert file_context.trimmed_tokens > 900
+    # The input is not modified
+    assert sections[2].text == "f" * 4_000 and sections[2].trimmed_tokens == 0
+    assert format_token_report(fitted).endswith(f"(trimmed: file_context -{file_context.trimmed_tokens})")
+
+
+def test_trimming_moves_up_the_priorities_when_needed():
+    fitted = fit_sections_to_budget(_sections(), 60)
+
+    assert _total(fitted) <= 60
+    assert fitted[3].trimmed_tokens > 0  # issues, after the whole file context
+    assert fitted[1].trimmed_tokens == 0  # the request is worth more than the issues
+    assert render_prompt_sections(fitted).startswith("t" * 40 + "r" * 40)
+
+
+def test_non_trimmable_sections_are_kept_even_over_budget():
+    fitted = fit_sections_to_budget(_sections(), 5)
+
+    assert fitted[0].text == "t" * 40
+    assert all(section.trimmed_tokens > 0 for section in fitted[1:])
@@ -1,7 +1,9 @@
 import streamlit as st
 import sys
 import os
+import json
 import logging
+import uuid
 from datetime import datetime
 
 # Add the project root to Python path to enable imports
@@ -13,15 +15,23 @@ if project_root not in sys.path:
 from dotenv import load_dotenv
 load_dotenv(dotenv_path=os.path.join(project_root, 'config', '.env'))
 
-from src.llm_handler import get_llm_response
-from src.code_parser import extract_python_code
-from src.analysis.static_analyzer.static_analyzer import run_pylint, run_bandit, run_mypy
-from src.analysis.dynamic_analyzer.dynamic_analyzer_main import run_dynamic_analysis
+from src.llm_cache import get_response_cache
+from src.model_registry import get_model_spec, list_models
+from src.pipeline import MAX_ATTEMPTS, SPECULATIVE_CANDIDATES, PipelineConfig, run_generation_pipeline
 
-from src.context_handler import parse_files_to_context_string, create_initial_prompt, create_feedback_prompt
+from src.context_handler import DEFAULT_RETRIEVAL_TOKEN_BUDGET, parse_files_to_context_string
+from src.context_summarizer import DEFAULT_SUMMARY_CHAR_BUDGET
+from src.file_context_cache import get_file_context_cache
+from src.admission import AdmissionRejected, get_admission_controller
+from src.instrumentation import start_metrics_server
+from src.jobs import JOB_CANCELLED, JOB_FAILED, get_job_runner
 
-MAX_ATTEMPTS = 5
 MAX_FILES = 4 # we can adjust this later if more files are needed
+JOB_POLL_SECONDS = 1.0 # how often the progress of running jobs is refreshed
+
+# Stage timings in Prometheus format on http://127.0.0.1:$METRICS_PORT/metrics (started once per process)
+if os.getenv("METRICS_PORT"):
+    start_metrics_server(int(os.getenv("METRICS_PORT")))
 
 # --- Setup File Logging  ---
 LOG_DIR = "app_logs"
@@ -54,21 +64,81 @@ if 'openai_api_key' not in st.session_state:
     st.session_state.openai_api_key = os.getenv("OPENAI_API_KEY", "")
 if 'google_api_key' not in st.session_state:
     st.session_state.google_api_key = os.getenv("GOOGLE_API_KEY", "")
+if 'bypass_cache' not in st.session_state:
+    st.session_state.bypass_cache = False
+if 'stream_responses' not in st.session_state:
+    st.session_state.stream_responses = True
+if 'stop_at_first_block' not in st.session_state:
+    st.session_state.stop_at_first_block = False
+if 'speculative_mode' not in st.session_state:
+    st.session_state.speculative_mode = False
+if 'conversational_retries' not in st.session_state:
+    st.session_state.conversational_retries = True
+if 'speculative_candidates' not in st.session_state:
+    st.session_state.speculative_candidates = SPECULATIVE_CANDIDATES
+if 'summarize_data_files' not in st.session_state:
+    st.session_state.summarize_data_files = True
+if 'summary_char_budget' not in st.session_state:
+    st.session_state.summary_char_budget = DEFAULT_SUMMARY_CHAR_BUDGET
+if 'retrieve_relevant_excerpts' not in st.session_state:
+    st.session_state.retrieve_relevant_excerpts = True
+if 'retrieval_token_budget' not in st.session_state:
+    st.session_state.retrieval_token_budget = DEFAULT_RETRIEVAL_TOKEN_BUDGET
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'shown_job_ids' not in st.session_state:
+    st.session_state.shown_job_ids = set()
+if 'cancel_previous_requests' not in st.session_state:
+    st.session_state.cancel_previous_requests = True
+if 'record_trace' not in st.session_state:
+    st.session_state.record_trace = False
+if 'trace_json' not in st.session_state:
+    st.session_state.trace_json = None
 
 # --- Helper Functions  ---
 def add_log(message: str, level: str = "info"):
     ui_log_message = f"[{level.upper()}] {message}" if level != "info" else message
     st.session_state.log_messages.append(ui_log_message)
+    log_to_file(message, level)
+
+def log_to_file(message: str, level: str = "info"):
+    # Safe to call from job worker threads, unlike st.session_state
     log_method = getattr(file_logger, level.lower(), file_logger.info)
     log_method(message)
 
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress():
+    runner = get_job_runner()
+    # Polling keeps the session's jobs alive; they are cancelled once it stops
+    runner.touch_session(st.session_state.session_id)
+    jobs = runner.store.session_jobs(st.session_state.session_id)
+    for job in jobs:
+        if job.finished:
+            continue
+        attempt_text = f"attempt {job.attempt} of {job.max_attempts}" if job.attempt else job.status
+        progress_col, cancel_col = st.columns([5, 1])
+        with progress_col:
+            st.caption(f"⏳ {job.user_query[:80]} ({job.model_name}, {attempt_text}, {job.elapsed:.0f}s)")
+            st.progress(min(1.0, job.attempt / max(1, job.max_attempts)), text=job.status_message)
+        with cancel_col:
+            if st.button("Cancel", key=f"cancel_job_{job.job_id}"):
+                interrupted = runner.cancel(job.job_id)
+                log_to_file(f"Cancelled job {job.job_id}; interrupted: {', '.join(interrupted) or 'none in flight'}", "warning")
+    # Shared by every user: a long wait here is queueing behind other sessions
+    st.caption("Server load: " + " · ".join(
+        stats.describe() for stats in [runner.queue_stats()] + get_admission_controller().snapshot()
+    ))
+    if any(job.finished and job.job_id not in st.session_state.shown_job_ids for job in jobs):
+        st.rerun()
+
 # --- Sidebar for Configuration  ---
 with st.sidebar:
     st.header("Configuration")
+    available_models = list_models()
     st.session_state.selected_model = st.selectbox(
         "Choose LLM Model:",
-        ("gpt-4o-mini", "gpt-3.5-turbo", "gemini-1.5-flash-latest", "gemini-2.0-flash"),
-        index=["gpt-4o-mini", "gpt-3.5-turbo", "gemini-1.5-flash-latest", "gemini-2.0-flash"].index(st.session_state.selected_model)
+        available_models,
+        index=available_models.index(st.session_state.selected_model) if st.session_state.selected_model in available_models else 0
     )
     st.subheader("API Keys")
     if not st.session_state.openai_api_key:
@@ -86,6 +156,88 @@ with st.sidebar:
         if st.button("Clear Google Key"):
             st.session_state.google_api_key = ""
             st.rerun()
+
+    st.subheader("Generation")
+    st.session_state.stream_responses = st.checkbox(
+        "Stream responses",
+        value=st.session_state.stream_responses,
+        help="Receives the response as it is generated, so a cancelled request stops it at once."
+    )
+    if st.session_state.stream_responses:
+        st.session_state.stop_at_first_block = st.checkbox(
+            "Stop at the first code block",
+            value=st.session_state.stop_at_first_block,
+            help="Starts analysis as soon as the first code block is complete and skips the rest. Code split across several blocks is cut to the first one."
+        )
+    st.session_state.speculative_mode = st.checkbox(
+        "Speculative mode (parallel candidates)",
+        value=st.session_state.speculative_mode,
+        help="Generates several candidates at different temperatures per round and keeps the first one without blocking issues."
+    )
+    if st.session_state.speculative_mode:
+        st.session_state.speculative_candidates = st.slider(
+            "Candidates per round:", min_value=2, max_value=5,
+            value=st.session_state.speculative_candidates
+        )
+    else:
+        st.session_state.conversational_retries = st.checkbox(
+            "Conversational retries",
+            value=st.session_state.conversational_retries,
+            help="Retries continue the first conversation and send only the issues and a diff, instead of the whole request and file context again."
+        )
+    st.session_state.cancel_previous_requests = st.checkbox(
+        "Cancel running requests on Generate",
+        value=st.session_state.cancel_previous_requests,
+        help="A new request stops the LLM calls and analyzers of the requests still running."
+    )
+    st.session_state.record_trace = st.checkbox(
+        "Record a timing trace",
+        value=st.session_state.record_trace,
+        help="Times every stage of the request (prompt, LLM call, extraction, each analyzer) and offers it as a Chrome trace (chrome://tracing or Perfetto)."
+    )
+
+    st.subheader("File Context")
+    st.session_state.summarize_data_files = st.checkbox(
+        "Summarize CSV/Excel files",
+        value=st.session_state.summarize_data_files,
+        help="Sends schema, statistics and sample rows instead of every row. Large files stay within the model's context."
+    )
+    if st.session_state.summarize_data_files:
+        st.session_state.summary_char_budget = st.number_input(
+            "Summary size per file (characters):", min_value=1000, max_value=100_000, step=1000,
+            value=st.session_state.summary_char_budget
+        )
+    st.session_state.retrieve_relevant_excerpts = st.checkbox(
+        "Only include relevant parts of large text/code files",
+        value=st.session_state.retrieve_relevant_excerpts,
+        help="When .txt/.py attachments exceed the budget, they are chunked and only the chunks most relevant to the request are sent."
+    )
+    if st.session_state.retrieve_relevant_excerpts:
+        st.session_state.retrieval_token_budget = st.number_input(
+            "Text/code budget (tokens):", min_value=500, max_value=100_000, step=500,
+            value=st.session_state.retrieval_token_budget
+        )
+    file_cache_stats = get_file_context_cache().stats()
+    st.caption(
+        f"{file_cache_stats['entries']} parsed files cached ({file_cache_stats['bytes'] / 1e6:.1f} MB), "
+        f"hit rate {file_cache_stats['hit_rate']:.0%}"
+    )
+
+    st.subheader("Response Cache")
+    st.session_state.bypass_cache = st.checkbox(
+        "Bypass cached LLM responses",
+        value=st.session_state.bypass_cache,
+        help="Always call the LLM, and refresh the cached response with the new one."
+    )
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        cache_stats = response_cache.stats()
+        st.caption(
+            f"{cache_stats['entries']} cached responses, "
+            f"hit rate {cache_stats['hit_rate']:.0%} ({cache_stats['hits']} hits / {cache_stats['misses']} misses)"
+        )
+    else:
+        st.caption("Response cache disabled.")
             
     st.markdown("---")
     st.markdown("This app generates Python code and performs static analysis. Retries up to 2 times if issues are found.")
@@ -105,8 +257,8 @@ current_user_query = st.text_area(
 
 # --- NEWWWW: FILE UPLOADER ---
 uploaded_files = st.file_uploader(
-    f"Attach up to {MAX_FILES} files for context (CSV, XLSX, TXT, PY)",
-    type=['csv', 'xlsx', 'txt', 'py'],
+    f"Attach up to {MAX_FILES} files for context (CSV, XLSX, TXT, PY, Parquet, Arrow)",
+    type=['csv', 'xlsx', 'txt', 'py', 'parquet', 'pq', 'feather', 'arrow', 'ipc'],
     accept_multiple_files=True,
     key="file_uploader"
 )
@@ -119,121 +271,100 @@ if st.button("✨ Generate Code"):
     st.session_state.analysis_issues = []
     st.session_state.error_attempt_info = {}
     st.session_state.log_messages = [] 
+    st.session_state.trace_json = None
 
     add_log("--- New Code Generation Request ---")
     add_log(f"User Query: {st.session_state.user_query}")
     add_log(f"Selected Model: {st.session_state.selected_model}")
 
     # --- MODIFIED: VALIDATION AND CONTEXT PREPARATION ---
+    model_spec = get_model_spec(st.session_state.selected_model)
+    api_keys = {"openai": st.session_state.openai_api_key, "google": st.session_state.google_api_key}
     if len(uploaded_files) > MAX_FILES:
         st.error(f"You can upload a maximum of {MAX_FILES} files.")
         add_log(f"Error: User tried to upload {len(uploaded_files)} files.", level="error")
     elif not st.session_state.user_query.strip():
         st.warning("Please enter a code request.")
         add_log("Warning: Empty code request.", level="warning")
-    elif st.session_state.selected_model in ("gpt-4o-mini", "gpt-3.5-turbo") and not st.session_state.openai_api_key:
-        st.error(f"OpenAI API Key is required for {st.session_state.selected_model}.")
-        add_log(f"OpenAI API Key missing for {st.session_state.selected_model}.", level="error")
-    elif st.session_state.selected_model in ("gemini-1.5-flash-latest", "gemini-2.0-flash") and not st.session_state.google_api_key:
-        st.error(f"Google API Key is required for {st.session_state.selected_model}.")
-        add_log(f"Google API Key missing for {st.session_state.selected_model}.", level="error")
+    elif model_spec.api_key_label and not api_keys.get(model_spec.provider):
+        st.error(f"{model_spec.api_key_label} API Key is required for {st.session_state.selected_model}.")
+        add_log(f"{model_spec.api_key_label} API Key missing for {st.session_state.selected_model}.", level="error")
     else:
         # --- MODIFIED: USE OFTHE NEW CONTEXT HANDLER ---
-        file_context = parse_files_to_context_string(uploaded_files)
+        file_context = parse_files_to_context_string(
+            uploaded_files,
+            summarize=st.session_state.summarize_data_files,
+            char_budget=st.session_state.summary_char_budget,
+            query=st.session_state.user_query,
+            retrieval_token_budget=st.session_state.retrieval_token_budget if st.session_state.retrieve_relevant_excerpts else None,
+            model_name=st.session_state.selected_model
+        )
         if uploaded_files:
             file_names = [f.name for f in uploaded_files]
             add_log(f"Attached files for context: {', '.join(file_names)}")
         
-        current_llm_input = create_initial_prompt(st.session_state.user_query, file_context)
+        pipeline_config = PipelineConfig(
+            model_name=st.session_state.selected_model,
+            openai_api_key=st.session_state.openai_api_key,
+            google_api_key=st.session_state.google_api_key,
+            max_attempts=MAX_ATTEMPTS,
+            stream_responses=st.session_state.stream_responses,
+            stop_at_first_block=st.session_state.stop_at_first_block,
+            bypass_cache=st.session_state.bypass_cache,
+            speculative_candidates=st.session_state.speculative_candidates if st.session_state.speculative_mode else 0,
+            conversational_retries=st.session_state.conversational_retries
+        )
         
-        with st.spinner("👩‍💻 Generating and analyzing code... This may take a few moments."):
-            for attempt in range(1, MAX_ATTEMPTS + 1):
-                add_log(f"\n--- Attempt {attempt} of {MAX_ATTEMPTS} ---")
-                st.write(f"Attempt {attempt} of {MAX_ATTEMPTS}...")
-                
-                add_log(f"Prompt to LLM (Attempt {attempt}):\n{current_llm_input}")
-
-                llm_response_content = get_llm_response(
-                    user_query=current_llm_input,
-                    model_name=st.session_state.selected_model,
-                    openai_api_key=st.session_state.openai_api_key,
-                    google_api_key=st.session_state.google_api_key
-                )
-                add_log(f"LLM Raw Response (Attempt {attempt}):\n{llm_response_content}")
-
-                if llm_response_content.startswith("Error:"):
-                    st.session_state.analysis_issues = [llm_response_content]
-                    st.session_state.generated_code = "" 
-                    st.session_state.error_attempt_info = {"attempt": attempt, "max_attempts": MAX_ATTEMPTS}
-                    add_log(f"LLM call failed: {llm_response_content}", level="error")
-                    break 
+        if st.session_state.cancel_previous_requests:
+            for cancelled_id, interrupted in get_job_runner().cancel_session(
+                st.session_state.session_id, "superseded by a new request"
+            ).items():
+                add_log(f"Cancelled job {cancelled_id}; interrupted: {', '.join(interrupted) or 'none in flight'}", level="warning")
+                # A superseded request's partial result is not displayed over the new one
+                st.session_state.shown_job_ids.add(cancelled_id)
 
-                extracted_code = extract_python_code(llm_response_content)
-                st.session_state.generated_code = extracted_code 
-                
-                if extracted_code:
-                    add_log(f"Extracted Code (Attempt {attempt}):\n{extracted_code}")
-                else:
-                    add_log(f"No Python code block extracted from LLM response (Attempt {attempt}).", level="warning")
-
-                if not extracted_code:
-                    st.session_state.analysis_issues = ["LLM did not return a recognizable Python code block."]
-                    st.session_state.error_attempt_info = {"attempt": attempt, "max_attempts": MAX_ATTEMPTS}
-                    if attempt < MAX_ATTEMPTS:
-                        # --- MODIFIED: USE THE NEW FEEDBACK PROMPT ---
-                        # We don't need a special prompt here, the standard feedback prompt works.
-                        # We will just pass an appropriate error message.
-                        current_llm_input = create_feedback_prompt(
-                            original_user_query=st.session_state.user_query,
-                            file_context=file_context,
-                            failed_code="N/A - No code was returned.",
-                            analysis_issues=["Your response did not contain a valid Python code block. Please provide ONLY a Python code block enclosed in ```python ... ```."]
-                        )
-                        add_log("No code block found. Preparing retry with feedback.", level="warning")
-                        st.write("No code block found, retrying...")
-                        continue
-                    else:
-                        add_log("Failed to get code block after multiple attempts.", level="error")
-                        st.write("Failed to get code block after multiple attempts.")
-                        break 
-                
-                # --- ANALYSIS ---
-                pylint_issues = run_pylint(extracted_code)
-                bandit_issues = run_bandit(extracted_code)
-                mypy_issues = run_mypy(extracted_code)  
-                dynamic_issues = run_dynamic_analysis(extracted_code,"dynapyt", "comprehensive") 
-
-                add_log(f"Pylint Issues (Attempt {attempt}): " + ('\n- '.join(pylint_issues) if pylint_issues else "No issues found."))
-                add_log(f"Bandit Issues (Attempt {attempt}): " + ('\n- '.join(bandit_issues) if bandit_issues else "No issues found."))
-                add_log(f"MyPy Issues (Attempt {attempt}): " + ('\n- '.join(mypy_issues) if mypy_issues else "No issues found."))
-                add_log(f"Dynamic Analysis Issues (Attempt {attempt}): " + ('\n- '.join(dynamic_issues) if dynamic_issues else "No issues (placeholder)."))
+        # The pipeline runs on a background worker; reruns only poll its progress
+        try:
+            job_id = get_job_runner().submit(
+                st.session_state.session_id,
+                st.session_state.user_query,
+                file_context,
+                pipeline_config,
+                log=log_to_file,
+                trace=st.session_state.record_trace
+            )
+        except AdmissionRejected as e:
+            st.error(f"The server is busy ({e}). Please try again in a moment.")
+            add_log(f"Generation request rejected: {e}", level="error")
+        else:
+            add_log(f"Queued generation job {job_id}.")
+            st.rerun()
 
-                all_issues = pylint_issues + bandit_issues + mypy_issues + dynamic_issues
-                st.session_state.analysis_issues = all_issues
-                st.session_state.error_attempt_info = {"attempt": attempt, "max_attempts": MAX_ATTEMPTS}
+# --- Background Jobs ---
+session_jobs = get_job_runner().store.session_jobs(st.session_state.session_id)
+for job in session_jobs:
+    if not job.finished or job.job_id in st.session_state.shown_job_ids:
+        continue
+    # Jobs finish in any order; each one's result replaces the displayed one
+    st.session_state.shown_job_ids.add(job.job_id)
+    st.session_state.log_messages = job.log_messages
+    st.session_state.trace_json = json.dumps(job.trace) if job.trace else None
+    if job.status == JOB_FAILED:
+        st.session_state.generated_code = ""
+        st.session_state.analysis_issues = [f"Generation failed: {job.error}"]
+        st.session_state.error_attempt_info = {"attempt": job.attempt, "max_attempts": job.max_attempts}
+    elif job.status == JOB_CANCELLED and job.result is None:
+        st.session_state.generated_code = ""
+        st.session_state.analysis_issues = [job.status_message]
+        st.session_state.error_attempt_info = {}
+    else:
+        st.session_state.generated_code = job.result.generated_code
+        st.session_state.analysis_issues = job.result.analysis_issues
+        st.session_state.error_attempt_info = {"attempt": job.result.attempt, "max_attempts": job.result.max_attempts}
 
-                if not all_issues:
-                    add_log("Code generated successfully with no static analysis issues found!")
-                    st.write("Code generated successfully with no static analysis issues found!")
-                    break 
-                else:
-                    add_log(f"Found {len(all_issues)} issues. Details logged.", level="warning")
-                    st.write(f"Found {len(all_issues)} issues. Details below.")
-                    if attempt < MAX_ATTEMPTS:
-                        # --- MODIFIED: THE NEW FEEDBACK PROMPT ---
-                        current_llm_input = create_feedback_prompt(
-                            original_user_query=st.session_state.user_query,
-                            file_context=file_context,
-                            failed_code=extracted_code,
-                            analysis_issues=all_issues
-                        )
-                        add_log("Attempting to fix issues. New prompt prepared for LLM.")
-                        st.write("Attempting to fix issues...")
-                    else:
-                        add_log("Max retries reached. Displaying last attempt with issues.", level="warning")
-                        st.write("Max retries reached. Displaying last attempt with issues.")
-                        break 
-        st.rerun() 
+if any(not job.finished for job in session_jobs):
+    st.subheader("Running Requests")
+    show_job_progress()
 
 # --- Display Results ---
 if st.session_state.generated_code:
@@ -254,6 +385,14 @@ if st.session_state.analysis_issues:
 elif st.session_state.generated_code and not st.session_state.analysis_issues and st.session_state.user_query:
     st.success("✅ No static analysis issues found in the generated code!")
 
+if st.session_state.trace_json:
+    st.download_button(
+        "⏱️ Download timing trace (Chrome trace JSON)",
+        st.session_state.trace_json,
+        file_name="pycode_bot_trace.json",
+        mime="application/json"
+    )
+
 if st.session_state.log_messages:
     with st.expander("📜 View Process Log (In-Memory)", expanded=False):
         for log_entry in st.session_state.log_messages: